@@ -5,9 +5,42 @@ import numpy as np
 class BC:
     def __init__(self, index=0):
         self.index = index
+        self.precompute = False
+        self.table_dt = None
+        self.E_table = self.B_table = None
     def apply(self, E, B, t):
+        if self.table_dt is not None:
+            i = int(round(t / self.table_dt))
+            if i * self.table_dt == t and 0 <= i < self.E_table.shape[0]:
+                E[self.index] = self.E_table[i]
+                B[self.index] = self.B_table[i]
+                return
         E[self.index] = self.E_values(t)
         B[self.index] = self.B_values(t)
+    def tabulate(self, dt, NT):
+        """
+        Evaluates the boundary fields at all `NT` step times `i * dt` at once,
+        so that `apply` at those times and `step_values` only copy rows.
+        """
+        self.E_table, self.B_table = self.field_values(np.arange(NT) * dt)
+        self.table_dt = dt
+    def step_values(self, first, last, dt):
+        """
+        `field_values` at the step times `i * dt` for `first <= i < last`,
+        taken from the table if `tabulate` covered them.
+        """
+        if dt == self.table_dt and last <= self.E_table.shape[0]:
+            return self.E_table[first:last], self.B_table[first:last]
+        return self.field_values(np.arange(first, last) * dt)
+    def field_values(self, t):
+        """
+        Boundary values of the electric and magnetic fields at an array of
+        times `t`, each of shape `(t.size, 3)`.
+        """
+        t = np.asarray(t, dtype=float)
+        E = np.column_stack([np.broadcast_to(value, t.shape) for value in self.E_values(t)])
+        B = np.column_stack([np.broadcast_to(value, t.shape) for value in self.B_values(t)])
+        return E.astype(float), B.astype(float)
     def E_values(self, t):
         return 0, 0, 0
     def B_values(self, t):
@@ -52,6 +85,9 @@ class Laser(BC):
         Speed of light, in m/s
     epsilon_0 : float
         The physical constant
+    precompute : bool
+        If `True`, nonperiodic grids `tabulate` the fields for all their
+        steps when set up, and save the table alongside their histories.
     """
     def __init__(self, laser_intensity,
                  laser_wavelength,
@@ -62,8 +98,10 @@ class Laser(BC):
                  c=1,
                  epsilon_0=1,
                  bc_function = "pulse",
-                 index = 0,):
+                 index = 0,
+                 precompute = False,):
         super().__init__(index)
+        self.precompute = precompute
         self.laser_wavelength = laser_wavelength
         self.laser_phase = laser_phase
         self.laser_omega = 2 * np.pi * c / laser_wavelength
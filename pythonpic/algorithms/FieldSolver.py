@@ -36,47 +36,173 @@ def FourierLongitudinalSolver(rho, k, epsilon_0=1, neutralize=True):
     return field
 
 
+def real_fourier_factors(NG, dx, epsilon_0=1):
+    """
+    The `1/(ik epsilon_0)` factors of `RealFourierLongitudinalSolver` for the
+    `NG // 2 + 1` nonnegative wavenumbers of a real FFT. The zero mode's
+    factor is zero, neutralizing the grid.
+    """
+    k = 2 * np.pi * np.fft.rfftfreq(NG, dx)
+    factors = np.zeros(k.size, dtype=np.complex128)
+    factors[1:] = 1 / (1j * k[1:] * epsilon_0)
+    return factors
+
+
+def RealFourierLongitudinalSolver(rho, factors):
+    """solves the Poisson equation spectrally, like `FourierLongitudinalSolver`,
+    with real FFTs of half the size and precomputed `1/(ik epsilon_0)` factors
+    from `real_fourier_factors`.
+
+    The mean charge is always dropped; so is the Nyquist mode, whose field
+    would be imaginary, as `FourierLongitudinalSolver` does by taking the
+    real part.
+    """
+    return np.fft.irfft(np.fft.rfft(rho) * factors, n=rho.size)
+
+
+def DirectLongitudinalSolver(rho, dx, epsilon_0=1, neutralize=False):
+    """solves Gauss's law on a nonperiodic grid by direct integration
+
+    $$E(x) = E(0) + \int_0^x \rho/\epsilon_0 dx'$$
+
+    integrated with the trapezoidal rule, in O(NG) operations. The charge is
+    taken to be isolated, so that its field points away from it equally on
+    both ends: $E(0) = -E(L) = -Q / 2 \epsilon_0$, $Q$ being the total
+    charge. This is zero for a neutral plasma.
+
+    If `neutralize`, a uniform background cancelling the mean charge is
+    added first.
+    """
+    if neutralize:
+        rho = rho - rho.mean()
+    field = np.empty(rho.size)
+    field[0] = 0
+    np.cumsum(0.5 * (rho[1:] + rho[:-1]) * dx / epsilon_0, out=field[1:])
+    field -= 0.5 * field[-1]
+    return field
+
+
+poisson_solvers = ("fourier", "real_fourier", "direct")
+
+
 @numba.njit()
 def BunemanTransversalSolver(electric_field, magnetic_field, current_yz, dt, c, epsilon_0):
     """
+    Advances the transversal fields by a timestep along their characteristics,
+    `F = (E_y +- c B_z) / 2` moving forwards and backwards by a cell, and
+    likewise `G = (E_z +- c B_y) / 2`. The characteristics are formed on the
+    fly in a single in place pass over the grid: walking forwards, only the
+    forward moving ones of the previous cell need keeping from before its
+    update, and the backward moving ones of the next cell are still intact.
 
     Parameters
     ----------
     electric_field : ndarray
-        the transversal part
+        Electric field, including guard cells, of shape `(NG + 2, 3)`. The
+        transversal part is updated in place.
     magnetic_field : ndarray
-        the transversal part
-    current_yz :
-    dt :
-    c :
-    epsilon_0 :
-
-    Returns
-    -------
-
+        Magnetic field, likewise.
+    current_yz : ndarray
+        Transversal current, of shape `(NG + 4, 2)`.
+    dt : float
+        Timestep, equal to `dx / c`.
+    c : float
+    epsilon_0 : float
     """
-    # dt = dx/c
-    Fplus = 0.5 * (electric_field[:, 1] + c * magnetic_field[:, 2])
-    Fminus = 0.5 * (electric_field[:, 1] - c * magnetic_field[:, 2])
-    Gplus = 0.5 * (electric_field[:, 2] + c * magnetic_field[:, 1])
-    Gminus = 0.5 * (electric_field[:, 2] - c * magnetic_field[:, 1])
-
-    # propagate to front
-    Fplus[1:] = Fplus[:-1] - 0.5 * dt * (current_yz[2:-1, 0]) / epsilon_0
-    Gplus[1:] = Gplus[:-1] - 0.5 * dt * (current_yz[2:-1, 1]) / epsilon_0
-    # propagate to back
-    Fminus[:-1] = Fminus[1:] - 0.5 * dt * (current_yz[1:-2, 0]) / epsilon_0
-    Gminus[:-1] = Gminus[1:] - 0.5 * dt * (current_yz[1:-2, 1]) / epsilon_0
-
-    electric_field[:, 1] = Fplus + Fminus
-    electric_field[:, 2] = Gplus + Gminus
-    magnetic_field[:, 1] = (Gplus - Gminus) / c
-    magnetic_field[:, 2] = (Fplus - Fminus) / c
+    N = electric_field.shape[0]
+    coefficient = 0.5 * dt
+    # forward moving characteristics of the previous cell, before its update
+    previous_Fplus = 0.0
+    previous_Gplus = 0.0
+    for k in range(N):
+        Fplus = 0.5 * (electric_field[k, 1] + c * magnetic_field[k, 2])
+        Gplus = 0.5 * (electric_field[k, 2] + c * magnetic_field[k, 1])
+        old_Fplus, old_Gplus = Fplus, Gplus
+        # propagate to front
+        if k > 0:
+            Fplus = previous_Fplus - coefficient * (current_yz[k + 1, 0]) / epsilon_0
+            Gplus = previous_Gplus - coefficient * (current_yz[k + 1, 1]) / epsilon_0
+        # propagate to back
+        if k < N - 1:
+            Fminus = 0.5 * (electric_field[k + 1, 1] - c * magnetic_field[k + 1, 2]) \
+                - coefficient * (current_yz[k + 1, 0]) / epsilon_0
+            Gminus = 0.5 * (electric_field[k + 1, 2] - c * magnetic_field[k + 1, 1]) \
+                - coefficient * (current_yz[k + 1, 1]) / epsilon_0
+        else:
+            Fminus = 0.5 * (electric_field[k, 1] - c * magnetic_field[k, 2])
+            Gminus = 0.5 * (electric_field[k, 2] - c * magnetic_field[k, 1])
+        previous_Fplus, previous_Gplus = old_Fplus, old_Gplus
+
+        electric_field[k, 1] = Fplus + Fminus
+        electric_field[k, 2] = Gplus + Gminus
+        magnetic_field[k, 1] = (Gplus - Gminus) / c
+        magnetic_field[k, 2] = (Fplus - Fminus) / c
 
 @numba.njit()
 def BunemanLongitudinalSolver(electric_field, current_x, dt, epsilon_0):
     electric_field[:, 0] -= dt / epsilon_0 * current_x[:-1]
 
+
+def psatd_factors(NG, dx, dt, c):
+    """
+    The factors of `PSATDTransversalSolver` for the `NG // 2 + 1` nonnegative
+    wavenumbers `k` of a real FFT: `cos(theta)`, `-i sin(theta)`,
+    `sin(theta) / ck` and `i (1 - cos(theta)) / ck`, with `theta = c k dt`.
+    The last two tend to `dt` and zero for the zero mode.
+    """
+    k = 2 * np.pi * np.fft.rfftfreq(NG, dx)
+    theta = c * k * dt
+    cos, sin = np.cos(theta), np.sin(theta)
+    source_E = np.full(k.size, dt, dtype=np.float64)
+    source_B = np.zeros(k.size, dtype=np.complex128)
+    source_E[1:] = sin[1:] / (c * k[1:])
+    source_B[1:] = 1j * (1 - cos[1:]) / (c * k[1:])
+    return cos, -1j * sin, source_E, source_B
+
+
+def PSATDTransversalSolver(electric_field, magnetic_field, current_yz, c, epsilon_0, factors):
+    """advances the transversal fields on a periodic grid by a timestep
+    spectrally (pseudo-spectral analytical time domain)
+
+    With the conventions of `BunemanTransversalSolver`, both transversal
+    pairs, `E_y, c B_z` and `E_z, c B_y`, obey (in fourier space)
+    $$\partial_t E = -ick cB - J/\epsilon_0$$
+    $$\partial_t cB = -ick E$$
+    which, holding the current constant through the timestep, integrate to
+    $$E' = \cos\theta E - i\sin\theta cB - \frac{\sin\theta}{ck} J/\epsilon_0$$
+    $$cB' = -i\sin\theta E + \cos\theta cB + i\frac{1 - \cos\theta}{ck} J/\epsilon_0$$
+    with $\theta = ck\Delta t$. This is exact for every mode, so there is no
+    numerical dispersion and any timestep is stable. For $\Delta t = \Delta x/c$
+    vacuum fields move by exactly a cell, as with `BunemanTransversalSolver`.
+
+    The guard cells are left alone.
+
+    Parameters
+    ----------
+    electric_field : ndarray
+        Electric field, including guard cells, of shape `(NG + 2, 3)`. The
+        transversal part is updated in place.
+    magnetic_field : ndarray
+        Magnetic field, likewise.
+    current_yz : ndarray
+        Transversal current, of shape `(NG + 4, 2)`.
+    c : float
+    epsilon_0 : float
+    factors : tuple
+        As returned by `psatd_factors` for the grid and timestep.
+    """
+    cos, minus_i_sin, source_E, source_B = (factor[:, np.newaxis] for factor in factors)
+    NG = electric_field.shape[0] - 2
+    # columns y, z of the electric field pair up with z, y of the magnetic one
+    E = np.fft.rfft(electric_field[1:-1, 1:], axis=0)
+    cB = c * np.fft.rfft(magnetic_field[1:-1, :0:-1], axis=0)
+    J = np.fft.rfft(current_yz[2:-2], axis=0) / epsilon_0
+    electric_field[1:-1, 1:] = np.fft.irfft(cos * E + minus_i_sin * cB - source_E * J, n=NG, axis=0)
+    magnetic_field[1:-1, :0:-1] = np.fft.irfft(minus_i_sin * E + cos * cB + source_B * J, n=NG, axis=0) / c
+
+
+field_solvers = ("buneman", "psatd")
+
 class Solver:
     def __init__(self, solve_algorithm, initialiation_algorithm):
         self.solve = solve_algorithm
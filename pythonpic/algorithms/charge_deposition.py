@@ -0,0 +1,80 @@
+# coding=utf-8
+"""Compiled linear charge deposition
+
+`charge_deposition` is what `Grid.gather_density` computes with `np.bincount`,
+one particle at a time. `cell_charge_deposition` takes particles already split
+into cell indices and fractions of cells, as cached by `Species.cell_indices`.
+`parallel_cell_charge_deposition` splits those particles into chunks, deposits
+each chunk into its own private copy of the grid and then sums the copies in
+chunk order, as `current_deposition.parallel_particle_current_deposition`
+does for current.
+"""
+from numba import njit, prange
+
+
+@njit()
+def _deposit_cell_charge(charge_density, logical_coordinate, charge_to_right, q):
+    charge_density[logical_coordinate + 1] += charge_to_right * q
+    charge_density[logical_coordinate] += (1 - charge_to_right) * q
+
+
+@njit()
+def _deposit_particle_charge(charge_density, x, dx, q):
+    x_in_cells = x / dx
+    logical_coordinate = int(x_in_cells)
+    _deposit_cell_charge(charge_density, logical_coordinate, x_in_cells - logical_coordinate, q)
+
+
+@njit()
+def charge_deposition(charge_density, x, dx, q):
+    """
+    Deposits charge `q` of particles at `x` onto `charge_density` by linear weighting.
+
+    Parameters
+    ----------
+    charge_density : `numpy.ndarray`
+        Grid charge density, of shape `(NG+1,)`, added to in place.
+    x : `numpy.ndarray`
+        Particle positions.
+    dx : float
+        Grid cell size.
+    q : float
+        Charge of a single particle.
+    """
+    for i in range(x.size):
+        _deposit_particle_charge(charge_density, x[i], dx, q)
+
+
+@njit()
+def cell_charge_deposition(charge_density, cell, cell_fraction, q):
+    """
+    `charge_deposition` for particles given by the index of their cell and
+    their position within it, in units of cell size.
+    """
+    for i in range(cell.size):
+        _deposit_cell_charge(charge_density, cell[i], cell_fraction[i], q)
+
+
+@njit(parallel=True)
+def parallel_cell_charge_deposition(charge_density, cell, cell_fraction, q, private_charge_density):
+    """
+    `cell_charge_deposition` on several threads.
+
+    Parameters
+    ----------
+    charge_density, cell, cell_fraction, q
+        As in `cell_charge_deposition`.
+    private_charge_density : `numpy.ndarray`
+        Scratch space of shape `(n_chunks, NG+1)`. The particles are split into
+        `n_chunks` fixed ranges, so results depend on `n_chunks` but not on the
+        number of threads.
+    """
+    n_chunks = private_charge_density.shape[0]
+    N = cell.size
+    for chunk in prange(n_chunks):
+        private_charge_density[chunk] = 0
+        start, end = chunk * N // n_chunks, (chunk + 1) * N // n_chunks
+        cell_charge_deposition(private_charge_density[chunk], cell[start:end], cell_fraction[start:end], q)
+    for k in prange(charge_density.size):
+        for chunk in range(n_chunks):
+            charge_density[k] += private_charge_density[chunk, k]
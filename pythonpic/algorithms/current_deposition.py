@@ -1,6 +1,9 @@
 # coding=utf-8
+import numba
 import numpy as np
 
+from .charge_deposition import _deposit_particle_charge, _deposit_cell_charge
+
 def current_deposition(j_x, j_yz, velocity, x_particles, dx, dt, q):
     epsilon = dx * 1e-10
     time = np.ones_like(x_particles) * dt
@@ -69,3 +72,251 @@ def current_deposition(j_x, j_yz, velocity, x_particles, dx, dt, q):
         x_particles = s[switches_cells]
         velocity = velocity[switches_cells]
         active = np.ones_like(x_particles, dtype=bool)
+
+
+@numba.njit()
+def _deposit_particle_current(j_x, j_yz, x, vx, vy, vz, dx, dt, q):
+    """
+    Deposits the current of a single particle, walking through the same
+    sub-segments between cell edges and centers as `current_deposition`.
+    """
+    logical_coordinate = int(x // dx)
+    _deposit_cell_particle_current(j_x, j_yz, logical_coordinate, x / dx - logical_coordinate, vx, vy, vz,
+                                   dx, dt, q)
+
+
+@numba.njit()
+def _deposit_cell_particle_current(j_x, j_yz, logical_coordinate, cell_fraction, vx, vy, vz, dx, dt, q):
+    """
+    `_deposit_particle_current` for a particle whose cell index and position
+    within the cell, in units of cell size, are already known.
+    """
+    epsilon = dx * 1e-10
+    if vx == 0 and vy == 0 and vz == 0:
+        return
+    x = (logical_coordinate + cell_fraction) * dx
+    time = dt
+    while True:
+        particle_in_left_half = cell_fraction < 0.5
+        if vx == 0:
+            t1 = np.inf
+            s = x
+        elif particle_in_left_half and vx < 0:
+            t1 = - (x - logical_coordinate * dx) / vx
+            s = logical_coordinate * dx - epsilon
+        elif particle_in_left_half:
+            t1 = ((logical_coordinate + 0.5) * dx - x) / vx
+            s = (logical_coordinate + 0.5) * dx + epsilon
+        elif vx > 0:
+            t1 = ((logical_coordinate + 1) * dx - x) / vx
+            s = (logical_coordinate + 1) * dx + epsilon
+        else:
+            t1 = -(x - (logical_coordinate + 0.5) * dx) / vx
+            s = (logical_coordinate + 0.5) * dx - epsilon
+
+        time_overflow = time - t1
+        switches_cells = time_overflow > 0
+        time_in_this_iteration = t1 if switches_cells else time
+        if vx == 0:
+            time_in_this_iteration = dt
+
+        if particle_in_left_half:
+            logical_coordinate_long = logical_coordinate
+            logical_coordinate_trans = logical_coordinate - 1
+            sign = 1
+        else:
+            logical_coordinate_long = logical_coordinate + 1
+            logical_coordinate_trans = logical_coordinate + 1
+            sign = -1
+        distance_to_current_cell_center = (logical_coordinate + 0.5) * dx - x
+        s0 = 1 - sign * distance_to_current_cell_center / dx
+        change_in_coverage = sign * vx * time_in_this_iteration / dx
+        s1 = s0 + change_in_coverage
+        w = 0.5 * (s0 + s1)
+
+        j_contribution_x = vx * q / dt * time_in_this_iteration
+        j_contribution_y = vy * q / dt * time_in_this_iteration
+        j_contribution_z = vz * q / dt * time_in_this_iteration
+        j_x[logical_coordinate_long + 1] += j_contribution_x
+        j_yz[logical_coordinate + 2, 0] += w * j_contribution_y
+        j_yz[logical_coordinate + 2, 1] += w * j_contribution_z
+        j_yz[logical_coordinate_trans + 2, 0] += (1 - w) * j_contribution_y
+        j_yz[logical_coordinate_trans + 2, 1] += (1 - w) * j_contribution_z
+
+        if not switches_cells:
+            return
+        time = time_overflow
+        x = s
+        logical_coordinate = int(x // dx)
+        cell_fraction = x / dx - logical_coordinate
+
+
+@numba.njit()
+def _particle_velocity(velocity, gamma, momentum, i):
+    """
+    Velocity of particle `i`. If `momentum`, `velocity` holds momenta
+    `u = gamma v`, divided here by the cached Lorentz factors `gamma`.
+    """
+    if momentum:
+        particle_gamma = gamma[i]
+        return velocity[i, 0] / particle_gamma, velocity[i, 1] / particle_gamma, velocity[i, 2] / particle_gamma
+    return velocity[i, 0], velocity[i, 1], velocity[i, 2]
+
+
+@numba.njit()
+def particle_current_deposition(j_x, j_yz, velocity, gamma, momentum, x_particles, dx, dt, q):
+    """
+    Compiled equivalent of `current_deposition`, walking through each
+    particle's sub-segments in turn instead of masking all particles at once.
+
+    `velocity` holds momenta `u = gamma v` if `momentum`, with `gamma` their
+    cached Lorentz factors; otherwise `gamma` is unused.
+    """
+    for i in range(x_particles.size):
+        vx, vy, vz = _particle_velocity(velocity, gamma, momentum, i)
+        _deposit_particle_current(j_x, j_yz, x_particles[i], vx, vy, vz, dx, dt, q)
+
+
+@numba.njit(parallel=True)
+def parallel_particle_current_deposition(j_x, j_yz, velocity, gamma, momentum, x_particles, dx, dt, q,
+                                         private_j_x, private_j_yz):
+    """
+    `particle_current_deposition` on several threads. The particles are split
+    into as many fixed ranges as there are private grids in `private_j_x` and
+    `private_j_yz`, each range is deposited into its own grid and the grids
+    are then summed in order, so results don't depend on the number of threads.
+    """
+    n_chunks = private_j_x.shape[0]
+    N = x_particles.size
+    for chunk in numba.prange(n_chunks):
+        private_j_x[chunk] = 0
+        private_j_yz[chunk] = 0
+        for i in range(chunk * N // n_chunks, (chunk + 1) * N // n_chunks):
+            vx, vy, vz = _particle_velocity(velocity, gamma, momentum, i)
+            _deposit_particle_current(private_j_x[chunk], private_j_yz[chunk], x_particles[i], vx, vy, vz, dx, dt, q)
+    for k in numba.prange(j_x.size):
+        for chunk in range(n_chunks):
+            j_x[k] += private_j_x[chunk, k]
+    for k in numba.prange(j_yz.shape[0]):
+        for chunk in range(n_chunks):
+            j_yz[k, 0] += private_j_yz[chunk, k, 0]
+            j_yz[k, 1] += private_j_yz[chunk, k, 1]
+
+
+@numba.njit()
+def charge_current_deposition(charge_density, j_x, j_yz, velocity, x_particles, dx, dt, q):
+    """
+    `charge_deposition` and `particle_current_deposition` in a single pass
+    over the particles.
+    """
+    for i in range(x_particles.size):
+        x = x_particles[i]
+        _deposit_particle_charge(charge_density, x, dx, q)
+        _deposit_particle_current(j_x, j_yz, x, velocity[i, 0], velocity[i, 1], velocity[i, 2], dx, dt, q)
+
+
+@numba.njit()
+def cell_charge_current_deposition(charge_density, j_x, j_yz, velocity, gamma, momentum, cell, cell_fraction,
+                                   dx, dt, q):
+    """
+    `charge_current_deposition` for particles whose cell indices and positions
+    within the cells, in units of cell size, are already known, as cached by
+    `Species.cell_indices`. `velocity`, `gamma` and `momentum` are as in
+    `particle_current_deposition`.
+    """
+    for i in range(cell.size):
+        _deposit_cell_charge(charge_density, cell[i], cell_fraction[i], q)
+        vx, vy, vz = _particle_velocity(velocity, gamma, momentum, i)
+        _deposit_cell_particle_current(j_x, j_yz, cell[i], cell_fraction[i], vx, vy, vz, dx, dt, q)
+
+
+@numba.njit(parallel=True)
+def parallel_cell_charge_current_deposition(charge_density, j_x, j_yz, velocity, gamma, momentum, cell,
+                                            cell_fraction, dx, dt, q, private_charge_density, private_j_x,
+                                            private_j_yz):
+    """
+    `cell_charge_current_deposition` on several threads, with private grids as
+    in `parallel_particle_current_deposition`.
+    """
+    n_chunks = private_j_x.shape[0]
+    N = cell.size
+    for chunk in numba.prange(n_chunks):
+        private_charge_density[chunk] = 0
+        private_j_x[chunk] = 0
+        private_j_yz[chunk] = 0
+        start, end = chunk * N // n_chunks, (chunk + 1) * N // n_chunks
+        cell_charge_current_deposition(private_charge_density[chunk], private_j_x[chunk], private_j_yz[chunk],
+                                       velocity[start:end], gamma[start:end], momentum, cell[start:end],
+                                       cell_fraction[start:end], dx, dt, q)
+    for k in numba.prange(charge_density.size):
+        for chunk in range(n_chunks):
+            charge_density[k] += private_charge_density[chunk, k]
+    for k in numba.prange(j_x.size):
+        for chunk in range(n_chunks):
+            j_x[k] += private_j_x[chunk, k]
+    for k in numba.prange(j_yz.shape[0]):
+        for chunk in range(n_chunks):
+            j_yz[k, 0] += private_j_yz[chunk, k, 0]
+            j_yz[k, 1] += private_j_yz[chunk, k, 1]
+
+
+@numba.njit()
+def species_charge_current_deposition(charge_density, j_x, j_yz, velocity, x_particles, species_index, q, dx, dt):
+    """
+    `charge_current_deposition` for particles of several species, the `i`-th
+    of which has charge `q[species_index[i]]`.
+    """
+    for i in range(x_particles.size):
+        x = x_particles[i]
+        particle_q = q[species_index[i]]
+        _deposit_particle_charge(charge_density, x, dx, particle_q)
+        _deposit_particle_current(j_x, j_yz, x, velocity[i, 0], velocity[i, 1], velocity[i, 2], dx, dt, particle_q)
+
+
+@numba.njit(parallel=True)
+def parallel_species_charge_current_deposition(charge_density, j_x, j_yz, velocity, x_particles, species_index, q,
+                                               dx, dt, private_charge_density, private_j_x, private_j_yz):
+    """
+    `species_charge_current_deposition` on several threads, with private grids
+    as in `parallel_particle_current_deposition`.
+    """
+    n_chunks = private_j_x.shape[0]
+    N = x_particles.size
+    for chunk in numba.prange(n_chunks):
+        private_charge_density[chunk] = 0
+        private_j_x[chunk] = 0
+        private_j_yz[chunk] = 0
+        start, end = chunk * N // n_chunks, (chunk + 1) * N // n_chunks
+        species_charge_current_deposition(private_charge_density[chunk], private_j_x[chunk], private_j_yz[chunk],
+                                          velocity[start:end], x_particles[start:end], species_index[start:end],
+                                          q, dx, dt)
+    for k in numba.prange(charge_density.size):
+        for chunk in range(n_chunks):
+            charge_density[k] += private_charge_density[chunk, k]
+    for k in numba.prange(j_x.size):
+        for chunk in range(n_chunks):
+            j_x[k] += private_j_x[chunk, k]
+    for k in numba.prange(j_yz.shape[0]):
+        for chunk in range(n_chunks):
+            j_yz[k, 0] += private_j_yz[chunk, k, 0]
+            j_yz[k, 1] += private_j_yz[chunk, k, 1]
+
+
+@numba.njit()
+def periodic_current_guards(j_x, j_yz):
+    """Folds current deposited in the guard cells onto the other end of a periodic grid."""
+    j_yz[-4:-2] += j_yz[:2]
+    j_yz[2:4] += j_yz[-2:]
+    j_x[-3] += j_x[0]
+    j_x[0] = 0
+    j_x[1:3] += j_x[-2:]
+    j_x[-2:] = 0
+
+
+@numba.njit()
+def nonperiodic_current_guards(j_x, j_yz):
+    """Discards current deposited in the guard cells of a nonperiodic grid."""
+    j_yz[:2] = 0
+    j_yz[-2:] = 0
+    j_x[0] = 0
+    j_x[-2:] = 0
@@ -2,6 +2,39 @@
 import numpy as np
 from numba import njit
 
+@njit()
+def interpolate_fields(left, right_fraction, electric_field, magnetic_field, NG, periodic):
+    """gathers both fields to a single particle sitting `right_fraction` of the
+    way into cell `left`
+
+    the per-particle version of `PeriodicInterpolateField` and
+    `AperiodicInterpolateField`, used inside the compiled pushers
+    """
+    left_fraction = 1 - right_fraction
+    left += 1
+    if periodic:
+        right = left % NG + 1
+    else:
+        right = left + 1
+    return (left_fraction * electric_field[left, 0] + right_fraction * electric_field[right, 0],
+            left_fraction * electric_field[left, 1] + right_fraction * electric_field[right, 1],
+            left_fraction * electric_field[left, 2] + right_fraction * electric_field[right, 2],
+            left_fraction * magnetic_field[left, 0] + right_fraction * magnetic_field[right, 0],
+            left_fraction * magnetic_field[left, 1] + right_fraction * magnetic_field[right, 1],
+            left_fraction * magnetic_field[left, 2] + right_fraction * magnetic_field[right, 2])
+
+@njit()
+def interpolate_longitudinal_field(left, right_fraction, electric_field, NG, periodic):
+    """gathers only the longitudinal electric field to a single particle, as
+    `interpolate_fields` does for all components, for electrostatic pushes
+    """
+    left += 1
+    if periodic:
+        right = left % NG + 1
+    else:
+        right = left + 1
+    return (1 - right_fraction) * electric_field[left, 0] + right_fraction * electric_field[right, 0]
+
 @njit()
 def PeriodicInterpolateField(x_particles, scalar_field, dx: float):
     """gathers field from grid to particles
@@ -0,0 +1,68 @@
+# coding=utf-8
+"""Digital filtering of deposited charge and current
+
+A binomial pass replaces every value with `(1, 2, 1) / 4` weighted averages
+of it and its neighbours. Its transfer function is `cos^2(k dx / 2)`, so `N`
+passes damp the grid scale noise of deposition while leaving long
+wavelengths nearly untouched. A compensator, the three point stencil
+`(-N/4, 1 + N/2, -N/4)`, then cancels the `k^2` term of the attenuation,
+making the passband flatter (C. K. Birdsall and A. B. Langdon, Plasma
+Physics via Computer Simulation, appendix C).
+"""
+from numba import njit
+
+
+@njit()
+def three_point_pass(array, first, last, periodic, side_weight):
+    """
+    Applies the stencil `(side_weight, 1 - 2 side_weight, side_weight)` in
+    place to `array[first:last]`.
+
+    Parameters
+    ----------
+    array : `numpy.ndarray`
+        One dimensional array, filtered in place.
+    first, last : int
+        Range of `array` to filter.
+    periodic : bool
+        If `True`, the range wraps around; otherwise values outside of it
+        count as zero.
+    side_weight : float
+    """
+    center_weight = 1 - 2 * side_weight
+    if periodic:
+        previous = array[last - 1]
+        wrapped = array[first]
+    else:
+        previous = 0.0
+        wrapped = 0.0
+    for k in range(first, last):
+        current = array[k]
+        following = array[k + 1] if k + 1 < last else wrapped
+        array[k] = side_weight * (previous + following) + center_weight * current
+        previous = current
+
+
+@njit()
+def binomial_filter(array, first, last, periodic, passes, compensate):
+    """
+    Applies `passes` binomial passes and optionally the compensator in place
+    to `array[first:last]`. See `three_point_pass`.
+    """
+    for i in range(passes):
+        three_point_pass(array, first, last, periodic, 0.25)
+    if compensate and passes > 0:
+        three_point_pass(array, first, last, periodic, -0.25 * passes)
+
+
+@njit()
+def filter_sources(charge_density, current_density_x, current_density_yz, periodic, passes, compensate):
+    """
+    Filters the grid charge and current densities, leaving their guard cells
+    alone. See `binomial_filter`.
+    """
+    NG = charge_density.size - 1
+    binomial_filter(charge_density, 0, NG, periodic, passes, compensate)
+    binomial_filter(current_density_x, 1, NG + 1, periodic, passes, compensate)
+    binomial_filter(current_density_yz[:, 0], 2, NG + 2, periodic, passes, compensate)
+    binomial_filter(current_density_yz[:, 1], 2, NG + 2, periodic, passes, compensate)
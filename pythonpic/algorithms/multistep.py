@@ -0,0 +1,130 @@
+# coding=utf-8
+"""Several consecutive simulation iterations in a single compiled routine
+
+`run_steps` does what `Simulation.iteration` does - field boundary
+conditions, velocity push, charge and current deposition, field solve,
+position push and particle boundary conditions - for a range of iterations,
+without returning to Python in between. The per-iteration grid and species
+diagnostics are written to buffers, which `Simulation` copies to the history
+arrays once the routine returns.
+"""
+import numpy as np
+from numba import njit
+
+from .current_deposition import charge_current_deposition, periodic_current_guards, nonperiodic_current_guards
+from .filters import filter_sources
+from .FieldSolver import BunemanLongitudinalSolver, BunemanTransversalSolver
+from .particle_push import velocity_moments
+
+
+@njit()
+def run_steps(gather_velocity_kick, position_push,
+              list_x, list_v, N_alive, eff_q, eff_m, species_dt, list_chunk_sums, gamma,
+              electric_field, magnetic_field, charge_density, current_density_x, current_density_yz,
+              dx, dt, c, epsilon_0, L, periodic, bc_index, bc_electric_field, bc_magnetic_field,
+              filter_passes, filter_compensation,
+              charge_density_history, current_density_history, electric_field_history, magnetic_field_history,
+              laser_energy_history, N_alive_history, velocity_moments_history, kinetic_energy_history):
+    """
+    Runs as many iterations as the histories are long.
+
+    Parameters
+    ----------
+    gather_velocity_kick : function
+        Compiled fused gather and velocity push, shared by all species,
+        e.g. `Pusher.gather_velocity_kick`.
+    position_push : function
+        Compiled position push, e.g. `particle_push.position_push`.
+    list_x, list_v : `numba.typed.List`
+        Per species position and velocity arrays. Only the first `N_alive`
+        particles are alive; those lost at nonperiodic boundaries are
+        compacted away in place.
+    N_alive : `numpy.ndarray`
+        Number of alive particles per species, updated in place.
+    eff_q, eff_m, species_dt : `numpy.ndarray`
+        Per species effective charges, masses and timesteps.
+    list_chunk_sums : `numba.typed.List`
+        Per species scratch arrays for the pushers' chunk sums.
+    gamma : `numpy.ndarray`
+        Empty array standing in for the cached Lorentz factors.
+    electric_field, magnetic_field, charge_density, current_density_x, current_density_yz : `numpy.ndarray`
+        The grid arrays, including guard cells, updated in place.
+    dx, dt, c, epsilon_0, L : float
+        Grid cell size, timestep, speed of light, permittivity and grid length.
+    periodic : bool
+    bc_index : int
+        Grid index at which field boundary conditions are applied.
+    bc_electric_field, bc_magnetic_field : `numpy.ndarray`
+        Boundary field values for every iteration, of shape `(NT, 3)`.
+        Not applied on periodic grids.
+    filter_passes : int
+    filter_compensation : bool
+        Filtering of the deposited charge and current, see `Grid.filter_sources`.
+    charge_density_history, current_density_history, electric_field_history, magnetic_field_history,\
+    laser_energy_history : `numpy.ndarray`
+        Grid diagnostics for every iteration, as in `Grid.save_field_values`.
+    N_alive_history, velocity_moments_history, kinetic_energy_history : `numpy.ndarray`
+        Species diagnostics for every iteration, of shapes `(NT, N_species)`,
+        `(NT, N_species, 3, 3)` and `(NT, N_species)`, as in
+        `Species.save_particle_values`.
+    """
+    N_species = len(list_x)
+    NT = laser_energy_history.size
+    for i in range(NT):
+        # Grid.save_field_values
+        charge_density_history[i] = charge_density[:-1]
+        current_density_history[i, :, 0] = current_density_x[1:-2]
+        current_density_history[i, :, 1:] = current_density_yz[2:-2]
+        electric_field_history[i] = electric_field[1:-1]
+        magnetic_field_history[i] = magnetic_field[1:-1]
+        laser_energy_history[i] = np.sqrt(electric_field[bc_index, 1] ** 2 + electric_field[bc_index, 2] ** 2)
+
+        if not periodic:
+            electric_field[bc_index] = bc_electric_field[i]
+            magnetic_field[bc_index] = bc_magnetic_field[i]
+
+        for s in range(N_species):
+            N = N_alive[s]
+            kinetic_energy_history[i, s] = gather_velocity_kick(list_x[s][:N], list_v[s][:N], gamma,
+                                                                electric_field, magnetic_field, dx, periodic, c,
+                                                                eff_q[s], species_dt[s], eff_m[s],
+                                                                list_chunk_sums[s])
+
+        charge_density[:] = 0
+        current_density_x[:] = 0
+        current_density_yz[:] = 0
+        for s in range(N_species):
+            N = N_alive[s]
+            charge_current_deposition(charge_density, current_density_x, current_density_yz,
+                                      list_v[s][:N], list_x[s][:N], dx, dt, eff_q[s])
+        if periodic:
+            periodic_current_guards(current_density_x, current_density_yz)
+        else:
+            charge_density[0] += charge_density[-1]
+            nonperiodic_current_guards(current_density_x, current_density_yz)
+        if filter_passes:
+            filter_sources(charge_density, current_density_x, current_density_yz, periodic, filter_passes,
+                           filter_compensation)
+
+        BunemanLongitudinalSolver(electric_field, current_density_x, dt, epsilon_0)
+        BunemanTransversalSolver(electric_field, magnetic_field, current_density_yz, dt, c, epsilon_0)
+
+        for s in range(N_species):
+            N = N_alive[s]
+            x = list_x[s]
+            v = list_v[s]
+            position_push(x[:N], v[:N], species_dt[s])
+            N_alive_history[i, s] = N
+            if N > 0:
+                velocity_moments_history[i, s] = velocity_moments(list_chunk_sums[s], N)
+            if periodic:
+                for p in range(N):
+                    x[p] %= L
+            else:
+                alive = 0
+                for p in range(N):
+                    if 0 <= x[p] < L:
+                        x[alive] = x[p]
+                        v[alive] = v[p]
+                        alive += 1
+                N_alive[s] = alive
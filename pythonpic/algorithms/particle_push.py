@@ -1,160 +1,776 @@
 # coding=utf-8
-"""mathematical algorithms for the particle pusher, Leapfrog and Boris"""
+"""mathematical algorithms for the particle pusher, Leapfrog and Boris
+
+Velocity pushers are `Pusher` objects, available by name from `pushers`:
+
+* `"rela_boris"` - the relativistic Boris pusher, the default,
+* `"vay"` - J.-L. Vay, Phys. Plasmas 15, 056701 (2008), which gets the
+  E x B drift right for relativistic particles,
+* `"higuera_cary"` - A. V. Higuera and J. R. Cary, Phys. Plasmas 24, 052104
+  (2017), volume preserving and also correct on E x B drift,
+* `"boris"` - the nonrelativistic Boris pusher.
+
+The compiled per-particle kernels come in two flavours: a serial one and a
+`parallel_` one built from the same source with `numba.prange`. The parallel
+ones are used by `Species` with `parallel=True` and run on as many threads as
+numba is allowed to use (`NUMBA_NUM_THREADS`, or `Simulation(threads=...)`).
+
+Particles never interact inside a push, so velocities and positions come out
+bitwise identical in both flavours. The only reduction, the kinetic energy,
+is summed over `N_CHUNKS` fixed particle ranges and then over the chunks in
+order, so it doesn't depend on the thread count either. Runs are therefore
+bitwise reproducible regardless of `parallel` and `threads`.
+
+Alongside the energy, the pushers sum up the pushed velocities and their
+squares per chunk, so that `velocity_moments` can give the species'
+velocity diagnostics without another pass over the particles.
+
+Electrostatic grids (`Grid(electrostatic=True)`) have no magnetic or
+transversal electric field, so every pusher also comes in `electrostatic_`
+flavours, which gather only `E_x` and kick only `v_x` (or `u_x`). All the
+pushers reduce to the same kick in a longitudinal electric field.
+
+Relativistic pushers also come in `momentum_` flavours for species that keep
+`u = gamma v` as their state (`Species(momentum=True)`). Those skip the
+conversion from and back to velocity around every kick and cache `gamma`
+for the position push, the current deposition and the diagnostics.
+"""
 import numpy as np
-from numba import jit, njit
+from numba import njit, prange
+
+from .field_interpolation import interpolate_fields, interpolate_longitudinal_field
+
+N_CHUNKS = 256
+# per chunk: kinetic energy, shift (velocity of its first particle), sums of velocity - shift and of its square,
+# largest squared speed
+N_CHUNK_SUMS = 11
+
+
+@njit()
+def _add_to_chunk_sums(sums, first, energy, vx, vy, vz):
+    """
+    Adds a particle's kinetic energy and velocity to the running `sums` of its
+    chunk, a tuple laid out like a row of `chunk_sums`. Velocities are summed
+    relative to the velocity of the `first` particle of the chunk, which keeps
+    the sums of squares from cancelling catastrophically for the variance.
+    """
+    if first:
+        sums = (0., vx, vy, vz, 0., 0., 0., 0., 0., 0., 0.)
+    energy_sum, shift_x, shift_y, shift_z, sum_x, sum_y, sum_z, square_x, square_y, square_z, max_speed2 = sums
+    dvx = vx - shift_x
+    dvy = vy - shift_y
+    dvz = vz - shift_z
+    return (energy_sum + energy, shift_x, shift_y, shift_z,
+            sum_x + dvx, sum_y + dvy, sum_z + dvz,
+            square_x + dvx * dvx, square_y + dvy * dvy, square_z + dvz * dvz,
+            max(max_speed2, vx * vx + vy * vy + vz * vz))
+
+
+@njit()
+def _store_chunk_sums(chunk_sums, chunk, sums):
+    for k in range(N_CHUNK_SUMS):
+        chunk_sums[chunk, k] = sums[k]
 
-@jit()
-def boris_velocity_kick(v, eff_q, E, B, dt, eff_m):
+
+@njit()
+def velocity_moments(chunk_sums, N):
     """
-    The velocity update portion of the Boris pusher. Updates the velocity in place so as to conserve memory.
+    Combines the per-chunk sums left by a push of `N` particles into velocity moments.
 
     Parameters
     ----------
-    v : `numpy.ndarray`
-        Array of velocities, of shape `(N, 3)`, `N` being the number of macroparticles
-    eff_q : `float`
-        The effective charge of the particles (total charge in the macroparticle)
-    E : `numpy.ndarray`
-        Interpolated or calculated values of the electric field. Shape `(N, 3)`.
-    B : `numpy.ndarray`
-        Interpolated or calculated values of the magnetic field. Shape `(N, 3)`.
-    dt : `float`
-        Timestep duration.
-    eff_m : `float`
-        The effective mass of the particles (total mass in the macroparticle)
+    chunk_sums : `numpy.ndarray`
+        Sums over particle chunks, of shape `(N_CHUNKS, N_CHUNK_SUMS)`.
+    N : `int`
+        Number of particles pushed.
 
     Returns
     -------
-    float
-        The kinetic energy of the particles being pushed.
-
+    `numpy.ndarray`
+        Mean velocity, mean squared velocity and velocity standard deviation, as rows of shape `(3, 3)`.
     """
-    # calculate u
-    # gamma = 1 / ()
-    # u = v /
-    vminus = v + eff_q * E / eff_m * dt * 0.5
+    moments = np.zeros((3, 3))
+    for chunk in range(N_CHUNKS):
+        n = (chunk + 1) * N // N_CHUNKS - chunk * N // N_CHUNKS
+        for k in range(3):
+            moments[0, k] += n * chunk_sums[chunk, 1 + k] + chunk_sums[chunk, 4 + k]
+    moments[0] /= N
+    # parallel variance algorithm of Chan et al.
+    for chunk in range(N_CHUNKS):
+        n = (chunk + 1) * N // N_CHUNKS - chunk * N // N_CHUNKS
+        if n == 0:
+            continue
+        for k in range(3):
+            chunk_sum = chunk_sums[chunk, 4 + k]
+            chunk_mean = chunk_sums[chunk, 1 + k] + chunk_sum / n
+            moments[2, k] += chunk_sums[chunk, 7 + k] - chunk_sum ** 2 / n + n * (chunk_mean - moments[0, k]) ** 2
+    moments[2] /= N
+    moments[1] = moments[2] + moments[0] ** 2
+    moments[2] = np.sqrt(moments[2])
+    return moments
 
-    # rotate to add magnetic field
-    t = B * eff_q / eff_m * dt * 0.5
-    s = 2 * t / (1 + (t * t).sum(axis=1, keepdims=True))
 
-    vprime = vminus + np.cross(vminus, t)
-    vplus = vminus + np.cross(vprime, s)
-    v_new = vplus + eff_q * E / eff_m * dt * 0.5
+@njit()
+def max_speed(chunk_sums):
+    """The largest particle speed in the sums left by a push."""
+    return np.sqrt(chunk_sums[:, N_CHUNK_SUMS - 1].max())
 
-    energy = (v_new * v * (0.5 * eff_m)).sum()
-    v[:] = v_new
-    return energy
 
-@jit("f8(f8[:,:],f8,f8,f8[:,:],f8[:,:],f8,f8)")
-def rela_boris_velocity_kick(v, c, eff_q, E, B, dt, eff_m):
+def _velocity_moment_sums(v, gamma, momentum, c, chunk_sums):
     """
-    The velocity update portion of the Boris pusher. Updates the velocity in place so as to conserve memory.
+    Fills `chunk_sums` as a push would, without pushing. Energies are `gamma - 1`.
 
     Parameters
     ----------
     v : `numpy.ndarray`
-        Array of velocities, of shape `(N, 3)`, `N` being the number of macroparticles
+        Array of velocities, or momenta `u = gamma v` if `momentum`, of shape `(N, 3)`
+    gamma : `numpy.ndarray`
+        Cached Lorentz factors of shape `(N,)`. Unused for velocities.
+    momentum : `bool`
+        Whether `v` holds momenta.
     c : `float`
         The speed of light
-    eff_q : `float`
-        The effective charge of the particles (total charge in the macroparticle)
-    E : `numpy.ndarray`
-        Interpolated or calculated values of the electric field. Shape `(N, 3)`.
-    B : `numpy.ndarray`
-        Interpolated or calculated values of the magnetic field. Shape `(N, 3)`.
-    dt : `float`
-        Timestep duration.
-    eff_m : `float`
-        The effective mass of the particles (total mass in the macroparticle)
+    chunk_sums : `numpy.ndarray`
+        Output sums over particle chunks, of shape `(N_CHUNKS, N_CHUNK_SUMS)`.
+    """
+    N = v.shape[0]
+    c2 = c ** 2
+    for chunk in prange(N_CHUNKS):
+        start = chunk * N // N_CHUNKS
+        sums = (0., 0., 0., 0., 0., 0., 0., 0., 0., 0., 0.)
+        for i in range(start, (chunk + 1) * N // N_CHUNKS):
+            if momentum:
+                particle_gamma = gamma[i]
+                vx, vy, vz = v[i, 0] / particle_gamma, v[i, 1] / particle_gamma, v[i, 2] / particle_gamma
+            else:
+                vx, vy, vz = v[i, 0], v[i, 1], v[i, 2]
+                particle_gamma = 1 / np.sqrt(1 - (vx ** 2 + vy ** 2 + vz ** 2) / c2)
+            sums = _add_to_chunk_sums(sums, i == start, particle_gamma - 1, vx, vy, vz)
+        _store_chunk_sums(chunk_sums, chunk, sums)
 
-    Returns
-    -------
-    float
-        The kinetic energy of the particles being pushed.
+velocity_moment_sums = njit()(_velocity_moment_sums)
+parallel_velocity_moment_sums = njit(parallel=True)(_velocity_moment_sums)
 
-    """
-    # calculate u
-    v /= np.sqrt(1 - (v ** 2).sum(axis=1, keepdims=True) / c ** 2)  # below eq 22 LPIC
-    half_force = (eff_q * 0.5 / eff_m * dt) * E  # eq. 21 LPIC # array of shape (N_particles, 3)
-    # add first half of electric force
 
-    # calculate uminus: initial velocity with added half impulse
-    v += half_force
+@njit()
+def boris_kick(vx, vy, vz, gamma, Ex, Ey, Ez, Bx, By, Bz, coefficient, c2):
+    """Nonrelativistic Boris kick of a single particle; returns its new velocity and kinetic energy in units of
+    `m c^2`. `gamma` is ignored."""
+    vminus_x = vx + coefficient * Ex
+    vminus_y = vy + coefficient * Ey
+    vminus_z = vz + coefficient * Ez
+
+    # rotate to add magnetic field
+    tx = coefficient * Bx
+    ty = coefficient * By
+    tz = coefficient * Bz
+    vprime_x = vminus_x + vminus_y * tz - vminus_z * ty
+    vprime_y = vminus_y + vminus_z * tx - vminus_x * tz
+    vprime_z = vminus_z + vminus_x * ty - vminus_y * tx
+    s_factor = 2 / (1 + tx ** 2 + ty ** 2 + tz ** 2)
+    sx = tx * s_factor
+    sy = ty * s_factor
+    sz = tz * s_factor
+    vplus_x = vminus_x + vprime_y * sz - vprime_z * sy + coefficient * Ex
+    vplus_y = vminus_y + vprime_z * sx - vprime_x * sz + coefficient * Ey
+    vplus_z = vminus_z + vprime_x * sy - vprime_y * sx + coefficient * Ez
+
+    energy = 0.5 * (vplus_x * vx + vplus_y * vy + vplus_z * vz) / c2
+    return vplus_x, vplus_y, vplus_z, energy
+
+@njit()
+def rela_boris_kick(ux, uy, uz, gamma, Ex, Ey, Ez, Bx, By, Bz, coefficient, c2):
+    """Relativistic Boris kick of a single particle's momentum `u = gamma v`; returns the new `u` and `gamma`."""
+    # add first half of electric force, eq. 21 LPIC
+    ux += coefficient * Ex
+    uy += coefficient * Ey
+    uz += coefficient * Ez
 
     # rotate to add magnetic field
     # this effectively takes relativistic mass into account
-    t = B * eff_q * dt / (2 * eff_m * np.sqrt(1 + (v ** 2).sum(axis=1, keepdims=True) / c ** 2))
+    gamma = np.sqrt(1 + (ux ** 2 + uy ** 2 + uz ** 2) / c2)
+    tx = coefficient * Bx / gamma
+    ty = coefficient * By / gamma
+    tz = coefficient * Bz / gamma
     # u' = u- + u- x t
-    uprime = v + np.cross(v, t)
+    uprime_x = ux + uy * tz - uz * ty
+    uprime_y = uy + uz * tx - ux * tz
+    uprime_z = uz + ux * ty - uy * tx
     # rotate second time, by s = 2t/(1+t*t)
-    t *= 2
-    t /= 1 + (t * t).sum(axis=1, keepdims=True)
-    # u+ = u- + u' x s
-    v += np.cross(uprime, t)
+    s_factor = 2 / (1 + tx ** 2 + ty ** 2 + tz ** 2)
+    sx = tx * s_factor
+    sy = ty * s_factor
+    sz = tz * s_factor
+    # u+ = u- + u' x s, then add second half of electric force
+    ux += uprime_y * sz - uprime_z * sy + coefficient * Ex
+    uy += uprime_z * sx - uprime_x * sz + coefficient * Ey
+    uz += uprime_x * sy - uprime_y * sx + coefficient * Ez
+
+    gamma = np.sqrt(1 + (ux ** 2 + uy ** 2 + uz ** 2) / c2)
+    return ux, uy, uz, gamma
+
+@njit()
+def _implicit_gamma_rotation(ux, uy, uz, tx, ty, tz, c2):
+    """
+    Solves for the final Lorentz factor as in Vay (2008), eqs. 11-12, then
+    rotates `u` by `t = tau / gamma`: `s (u + (u . t) t + u x t)`.
+    Shared by the Vay and Higuera-Cary pushers. Returns the rotated u, the
+    final gamma and `t`.
+    """
+    tau2 = tx ** 2 + ty ** 2 + tz ** 2
+    ustar = (ux * tx + uy * ty + uz * tz) / c2 ** 0.5
+    sigma = 1 + (ux ** 2 + uy ** 2 + uz ** 2) / c2 - tau2
+    gamma = np.sqrt(0.5 * (sigma + np.sqrt(sigma ** 2 + 4 * (tau2 + ustar ** 2))))
+    tx /= gamma
+    ty /= gamma
+    tz /= gamma
+    s = 1 / (1 + tx ** 2 + ty ** 2 + tz ** 2)
+    u_dot_t = ux * tx + uy * ty + uz * tz
+    rx = s * (ux + u_dot_t * tx + uy * tz - uz * ty)
+    ry = s * (uy + u_dot_t * ty + uz * tx - ux * tz)
+    rz = s * (uz + u_dot_t * tz + ux * ty - uy * tx)
+    return rx, ry, rz, tx, ty, tz
+
+@njit()
+def vay_kick(ux, uy, uz, gamma, Ex, Ey, Ez, Bx, By, Bz, coefficient, c2):
+    """Vay (2008) kick of a single particle's momentum `u = gamma v`; returns the new `u` and `gamma`."""
+    # full electric and half magnetic kick with the old velocity, eq. 9
+    ux, uy, uz = (ux + coefficient * (2 * Ex + (uy * Bz - uz * By) / gamma),
+                  uy + coefficient * (2 * Ey + (uz * Bx - ux * Bz) / gamma),
+                  uz + coefficient * (2 * Ez + (ux * By - uy * Bx) / gamma))
+    # implicit magnetic half kick with the new velocity, eqs. 10-13
+    ux, uy, uz, tx, ty, tz = _implicit_gamma_rotation(ux, uy, uz,
+                                                      coefficient * Bx, coefficient * By, coefficient * Bz,
+                                                      c2)
+
+    gamma = np.sqrt(1 + (ux ** 2 + uy ** 2 + uz ** 2) / c2)
+    return ux, uy, uz, gamma
 
-    # add second half of electric force
-    v += half_force
+@njit()
+def higuera_cary_kick(ux, uy, uz, gamma, Ex, Ey, Ez, Bx, By, Bz, coefficient, c2):
+    """Higuera-Cary (2017) kick of a single particle's momentum `u = gamma v`; returns the new `u` and `gamma`."""
+    # first half of electric force
+    ux += coefficient * Ex
+    uy += coefficient * Ey
+    uz += coefficient * Ez
+    # rotation with gamma taken at the time-centered velocity
+    uplus_x, uplus_y, uplus_z, tx, ty, tz = _implicit_gamma_rotation(ux, uy, uz,
+                                                                     coefficient * Bx, coefficient * By,
+                                                                     coefficient * Bz, c2)
+    # second half of electric force and rest of the rotation
+    ux = uplus_x + coefficient * Ex + uplus_y * tz - uplus_z * ty
+    uy = uplus_y + coefficient * Ey + uplus_z * tx - uplus_x * tz
+    uz = uplus_z + coefficient * Ez + uplus_x * ty - uplus_y * tx
 
-    final_gamma = np.sqrt(1 + ((v ** 2).sum(axis=1, keepdims=True) / c ** 2))
-    v /= final_gamma
-    total_velocity = final_gamma - 1
-    return total_velocity.sum() * eff_m * c ** 2
+    gamma = np.sqrt(1 + (ux ** 2 + uy ** 2 + uz ** 2) / c2)
+    return ux, uy, uz, gamma
 
-def boris_push(species, E: np.ndarray, dt: float, B: np.ndarray):
+@njit()
+def electrostatic_kick(ux, uy, uz, gamma, Ex, Ey, Ez, Bx, By, Bz, coefficient, c2):
+    """Relativistic kick of a single particle's momentum `u = gamma v` by the longitudinal electric field `Ex`
+    alone, which is what all the relativistic kicks come down to without other fields. The other field components
+    are ignored. Returns the new `u` and `gamma`."""
+    ux += 2 * coefficient * Ex
+    gamma = np.sqrt(1 + (ux ** 2 + uy ** 2 + uz ** 2) / c2)
+    return ux, uy, uz, gamma
+
+@njit()
+def electrostatic_boris_kick(vx, vy, vz, gamma, Ex, Ey, Ez, Bx, By, Bz, coefficient, c2):
+    """Nonrelativistic version of `electrostatic_kick`; returns the new velocity and kinetic energy in units of
+    `m c^2`, like `boris_kick`."""
+    vplus_x = vx + 2 * coefficient * Ex
+    energy = 0.5 * (vplus_x * vx + vy * vy + vz * vz) / c2
+    return vplus_x, vy, vz, energy
+
+def _particle_update(kick, relativistic, momentum):
+    """
+    Compiles the in-place update of a single particle's state around `kick`.
+
+    The update is called as `update(state, gamma, i, Ex, Ey, Ez, Bx, By, Bz, coefficient, c2)`
+    and returns the particle's kinetic energy in units of `m c^2` and its new
+    velocity. With
+    `momentum`, `state` holds `u = gamma v` and `gamma` the cached Lorentz
+    factors, both updated. Otherwise `state` holds velocities, `gamma` is not
+    touched and relativistic kicks convert to and from `u` around the kick.
     """
-    Implements the relativistic Boris pusher.
-    Mostly a wrapper function for the compiled version in `rela_boris_velocity_kick`.
+    if momentum:
+        @njit()
+        def update(u, gamma, i, Ex, Ey, Ez, Bx, By, Bz, coefficient, c2):
+            u[i, 0], u[i, 1], u[i, 2], new_gamma = kick(u[i, 0], u[i, 1], u[i, 2], gamma[i],
+                                                        Ex, Ey, Ez, Bx, By, Bz, coefficient, c2)
+            gamma[i] = new_gamma
+            return new_gamma - 1, u[i, 0] / new_gamma, u[i, 1] / new_gamma, u[i, 2] / new_gamma
+    elif relativistic:
+        @njit()
+        def update(v, gamma, i, Ex, Ey, Ez, Bx, By, Bz, coefficient, c2):
+            vx, vy, vz = v[i, 0], v[i, 1], v[i, 2]
+            old_gamma = 1 / np.sqrt(1 - (vx ** 2 + vy ** 2 + vz ** 2) / c2)  # below eq 22 LPIC
+            ux, uy, uz, new_gamma = kick(vx * old_gamma, vy * old_gamma, vz * old_gamma, old_gamma,
+                                         Ex, Ey, Ez, Bx, By, Bz, coefficient, c2)
+            vx, vy, vz = ux / new_gamma, uy / new_gamma, uz / new_gamma
+            v[i, 0], v[i, 1], v[i, 2] = vx, vy, vz
+            return new_gamma - 1, vx, vy, vz
+    else:
+        @njit()
+        def update(v, gamma, i, Ex, Ey, Ez, Bx, By, Bz, coefficient, c2):
+            vx, vy, vz, energy = kick(v[i, 0], v[i, 1], v[i, 2], 1.,
+                                      Ex, Ey, Ez, Bx, By, Bz, coefficient, c2)
+            v[i, 0], v[i, 1], v[i, 2] = vx, vy, vz
+            return energy, vx, vy, vz
+    return update
+
+def _velocity_kick_kernel(update, parallel):
+    """Compiles an array velocity update around the single particle `update`."""
+    @njit(parallel=parallel)
+    def velocity_kick(v, gamma, c, eff_q, E, B, dt, eff_m, chunk_sums):
+        """
+        The velocity update portion of the pusher. Updates the velocity in place so as to conserve memory.
+
+        Parameters
+        ----------
+        v : `numpy.ndarray`
+            Array of velocities, of shape `(N, 3)`, `N` being the number of macroparticles,
+            or of momenta `u = gamma v` for kernels compiled for the momentum state.
+        gamma : `numpy.ndarray`
+            Cached Lorentz factors of shape `(N,)`, updated along with `u`. Unused for velocities.
+        c : `float`
+            The speed of light
+        eff_q : `float`
+            The effective charge of the particles (total charge in the macroparticle)
+        E : `numpy.ndarray`
+            Interpolated or calculated values of the electric field. Shape `(N, 3)` or `(1, 3)`.
+        B : `numpy.ndarray`
+            Interpolated or calculated values of the magnetic field. Shape `(N, 3)` or `(1, 3)`.
+        dt : `float`
+            Timestep duration.
+        eff_m : `float`
+            The effective mass of the particles (total mass in the macroparticle)
+        chunk_sums : `numpy.ndarray`
+            Output partial sums of energy and velocity moments, of shape `(N_CHUNKS, N_CHUNK_SUMS)`.
+
+        Returns
+        -------
+        float
+            The kinetic energy of the particles being pushed.
 
-    Note that velocity is updated in-place to conserve memory!
+        """
+        coefficient = eff_q * 0.5 / eff_m * dt
+        c2 = c ** 2
+        N = v.shape[0]
+        uniform_E = E.shape[0] == 1
+        uniform_B = B.shape[0] == 1
+        for chunk in prange(N_CHUNKS):
+            start = chunk * N // N_CHUNKS
+            sums = (0., 0., 0., 0., 0., 0., 0., 0., 0., 0., 0.)
+            for i in range(start, (chunk + 1) * N // N_CHUNKS):
+                iE = 0 if uniform_E else i
+                iB = 0 if uniform_B else i
+                energy, vx, vy, vz = update(v, gamma, i,
+                                            E[iE, 0], E[iE, 1], E[iE, 2],
+                                            B[iB, 0], B[iB, 1], B[iB, 2],
+                                            coefficient, c2)
+                sums = _add_to_chunk_sums(sums, i == start, energy, vx, vy, vz)
+            _store_chunk_sums(chunk_sums, chunk, sums)
+        return chunk_sums[:, 0].sum() * eff_m * c2
+    return velocity_kick
+
+def _gather_velocity_kick_kernel(update, parallel):
+    """Compiles a velocity update fused with the field gather around the single particle `update`."""
+    @njit(parallel=parallel)
+    def gather_velocity_kick(x, v, gamma, electric_field, magnetic_field, dx, periodic, c, eff_q, dt, eff_m,
+                             chunk_sums):
+        """
+        The velocity update portion of the pusher, fused with the linear
+        field gather from the grid. Updates the velocity in place.
+
+        Each particle interpolates its own E and B from the grid arrays and is
+        pushed in the same loop iteration, so no `(N, 3)` field arrays are
+        created along the way.
+
+        Parameters
+        ----------
+        x : `numpy.ndarray`
+            Array of positions, of shape `(N,)`
+        v : `numpy.ndarray`
+            Array of velocities, of shape `(N, 3)`, `N` being the number of macroparticles,
+            or of momenta `u = gamma v` for kernels compiled for the momentum state.
+        gamma : `numpy.ndarray`
+            Cached Lorentz factors of shape `(N,)`, updated along with `u`. Unused for velocities.
+        electric_field : `numpy.ndarray`
+            Electric field on the grid, including guard cells. Shape `(NG + 2, 3)`.
+        magnetic_field : `numpy.ndarray`
+            Magnetic field on the grid, including guard cells. Shape `(NG + 2, 3)`.
+        dx : `float`
+            Grid cell size.
+        periodic : `bool`
+            Whether the rightmost cell wraps around to the first one.
+        c : `float`
+            The speed of light
+        eff_q : `float`
+            The effective charge of the particles (total charge in the macroparticle)
+        dt : `float`
+            Timestep duration.
+        eff_m : `float`
+            The effective mass of the particles (total mass in the macroparticle)
+        chunk_sums : `numpy.ndarray`
+            Output partial sums of energy and velocity moments, of shape `(N_CHUNKS, N_CHUNK_SUMS)`.
+
+        Returns
+        -------
+        float
+            The kinetic energy of the particles being pushed.
+        """
+        NG = electric_field.shape[0] - 2
+        coefficient = eff_q * 0.5 / eff_m * dt
+        c2 = c ** 2
+        N = x.size
+        for chunk in prange(N_CHUNKS):
+            start = chunk * N // N_CHUNKS
+            sums = (0., 0., 0., 0., 0., 0., 0., 0., 0., 0., 0.)
+            for i in range(start, (chunk + 1) * N // N_CHUNKS):
+                x_in_cells = x[i] / dx
+                left = int(x_in_cells)
+                Ex, Ey, Ez, Bx, By, Bz = interpolate_fields(left, x_in_cells - left,
+                                                            electric_field, magnetic_field, NG, periodic)
+                energy, vx, vy, vz = update(v, gamma, i, Ex, Ey, Ez, Bx, By, Bz, coefficient, c2)
+                sums = _add_to_chunk_sums(sums, i == start, energy, vx, vy, vz)
+            _store_chunk_sums(chunk_sums, chunk, sums)
+        return chunk_sums[:, 0].sum() * eff_m * c2
+    return gather_velocity_kick
+
+def _cell_gather_velocity_kick_kernel(update, parallel):
+    """Like `_gather_velocity_kick_kernel`, for positions stored as cell indices and fractions."""
+    @njit(parallel=parallel)
+    def cell_gather_velocity_kick(cell, cell_fraction, v, gamma, electric_field, magnetic_field, periodic, c, eff_q, dt,
+                                  eff_m, chunk_sums):
+        """
+        The velocity update portion of the pusher, fused with the linear
+        field gather from the grid, for particles whose positions are kept
+        as the index of their cell and their fractional position within it.
+
+        Parameters
+        ----------
+        cell : `numpy.ndarray`
+            Integer array of particle cell indices, of shape `(N,)`
+        cell_fraction : `numpy.ndarray`
+            Array of positions within the cells, in units of cell size, of shape `(N,)`
+        v : `numpy.ndarray`
+            Array of velocities, or momenta, of shape `(N, 3)`, `N` being the number of macroparticles
+
+        The remaining parameters and return value are as in `gather_velocity_kick`.
+        """
+        NG = electric_field.shape[0] - 2
+        coefficient = eff_q * 0.5 / eff_m * dt
+        c2 = c ** 2
+        N = cell.size
+        for chunk in prange(N_CHUNKS):
+            start = chunk * N // N_CHUNKS
+            sums = (0., 0., 0., 0., 0., 0., 0., 0., 0., 0., 0.)
+            for i in range(start, (chunk + 1) * N // N_CHUNKS):
+                Ex, Ey, Ez, Bx, By, Bz = interpolate_fields(cell[i], cell_fraction[i],
+                                                            electric_field, magnetic_field, NG, periodic)
+                energy, vx, vy, vz = update(v, gamma, i, Ex, Ey, Ez, Bx, By, Bz, coefficient, c2)
+                sums = _add_to_chunk_sums(sums, i == start, energy, vx, vy, vz)
+            _store_chunk_sums(chunk_sums, chunk, sums)
+        return chunk_sums[:, 0].sum() * eff_m * c2
+    return cell_gather_velocity_kick
+
+def _electrostatic_gather_velocity_kick_kernel(update, parallel):
+    """Like `_cell_gather_velocity_kick_kernel`, gathering only the longitudinal electric field."""
+    @njit(parallel=parallel)
+    def electrostatic_cell_gather_velocity_kick(cell, cell_fraction, v, gamma, electric_field, periodic, c, eff_q,
+                                                dt, eff_m, chunk_sums):
+        """
+        The velocity update portion of the pusher for electrostatic grids,
+        fused with the linear gather of `E_x` alone, for particles given by
+        their cell indices and positions within the cells. `update` must be
+        built around an electrostatic kick, as the other field components are
+        passed as zero.
+
+        The parameters and return value are as in `cell_gather_velocity_kick`,
+        without the magnetic field.
+        """
+        NG = electric_field.shape[0] - 2
+        coefficient = eff_q * 0.5 / eff_m * dt
+        c2 = c ** 2
+        N = cell.size
+        for chunk in prange(N_CHUNKS):
+            start = chunk * N // N_CHUNKS
+            sums = (0., 0., 0., 0., 0., 0., 0., 0., 0., 0., 0.)
+            for i in range(start, (chunk + 1) * N // N_CHUNKS):
+                Ex = interpolate_longitudinal_field(cell[i], cell_fraction[i], electric_field, NG, periodic)
+                energy, vx, vy, vz = update(v, gamma, i, Ex, 0., 0., 0., 0., 0., coefficient, c2)
+                sums = _add_to_chunk_sums(sums, i == start, energy, vx, vy, vz)
+            _store_chunk_sums(chunk_sums, chunk, sums)
+        return chunk_sums[:, 0].sum() * eff_m * c2
+    return electrostatic_cell_gather_velocity_kick
+
+class Pusher:
+    """
+    A particle velocity pusher, built around a compiled single particle kick.
+
+    The kick is called as `kick(ux, uy, uz, gamma, Ex, Ey, Ez, Bx, By, Bz, coefficient, c2)`,
+    with `coefficient = q dt / 2 m` and `c2` the squared speed of light.
+    Relativistic kicks take the particle's momentum `u = gamma v` and its
+    Lorentz factor and return the new `u` and `gamma`. Nonrelativistic kicks
+    take and return the velocity, ignore `gamma` and return the kinetic
+    energy in units of `m c^2` in its place.
+
+    The array and the gather-fused kernels, serial and parallel, are compiled
+    from it with identical in-place signatures, for species storing their
+    velocities and, for relativistic kicks, for species storing momenta
+    (`momentum_` kernels). `electrostatic_` gather-fused kernels are compiled
+    from `electrostatic_kick` or `electrostatic_boris_kick` instead.
 
     Parameters
     ----------
-    species : `pythonpic.classes.Species`
-    E : `numpy.ndarray`
-        Interpolated or calculated values of the electric field. Shape `(N, 3)`.
-    dt : float
-        Timestep duration
-    B : `numpy.ndarray`
-        Interpolated or calculated values of the magnetic field. Shape `(N, 3)`.
-    Returns
-    -------
-    `numpy.ndarray`
-        Updated positions, shape `(N, )`.
-    `numpy.ndarray`
-        Updated velocity, shape `(N, 3)`.
-    `float`
-        Total kinetic energy of the particles.
+    kick : function
+        numba-compiled single particle kick.
+    relativistic : bool
+        Whether the kick is valid at relativistic velocities.
     """
-    energy = boris_velocity_kick(species.v, species.eff_q,
-                                 E, B, dt, species.eff_m)
-    return energy
-def rela_boris_push(species, E: np.ndarray, dt: float, B: np.ndarray):
+    def __init__(self, kick, relativistic=True):
+        self.kick = kick
+        self.relativistic = relativistic
+        self.kernels = {}
+        for momentum in ((False, True) if relativistic else (False,)):
+            update = _particle_update(kick, relativistic, momentum)
+            electrostatic_update = _particle_update(electrostatic_kick if relativistic else electrostatic_boris_kick,
+                                                    relativistic, momentum)
+            prefix = "momentum_" if momentum else ""
+            for parallel in (False, True):
+                name = ("parallel_" if parallel else "") + prefix
+                setattr(self, name + "velocity_kick", _velocity_kick_kernel(update, parallel))
+                setattr(self, name + "gather_velocity_kick", _gather_velocity_kick_kernel(update, parallel))
+                setattr(self, name + "cell_gather_velocity_kick", _cell_gather_velocity_kick_kernel(update,
+                                                                                                    parallel))
+                setattr(self, name + "electrostatic_cell_gather_velocity_kick",
+                        _electrostatic_gather_velocity_kick_kernel(electrostatic_update, parallel))
+                for kernel in ("velocity_kick", "gather_velocity_kick", "cell_gather_velocity_kick",
+                               "electrostatic_cell_gather_velocity_kick"):
+                    self.kernels[parallel, momentum, kernel] = getattr(self, name + kernel)
+
+    def kernel(self, species, name):
+        """The flavour of kernel `name`, e.g. `"gather_velocity_kick"`, suiting the species' settings."""
+        return self.kernels[species.parallel, species.momentum, name]
+
+    def push(self, species, E: np.ndarray, dt: float, B: np.ndarray):
+        """
+        Pushes the species' velocities with given fields.
+        Mostly a wrapper function for the compiled `velocity_kick`.
+
+        Note that velocity is updated in-place to conserve memory!
+
+        Parameters
+        ----------
+        species : `pythonpic.classes.Species`
+        E : `numpy.ndarray`
+            Interpolated or calculated values of the electric field. Shape `(N, 3)`.
+        dt : float
+            Timestep duration
+        B : `numpy.ndarray`
+            Interpolated or calculated values of the magnetic field. Shape `(N, 3)`.
+        Returns
+        -------
+        `float`
+            Total kinetic energy of the particles.
+        """
+        kick = self.kernel(species, "velocity_kick")
+        energy = kick(species.velocity_state, species.gamma_cache, species.c, species.eff_q,
+                      E, B, dt, species.eff_m, species.chunk_sums)
+        return energy
+
+    def gather_push(self, species, electric_field: np.ndarray, dt: float, magnetic_field: np.ndarray):
+        """
+        Pushes the species' velocities with the field gather done on the fly
+        from grid field arrays.
+        Mostly a wrapper function for the compiled `cell_gather_velocity_kick`,
+        fed with the species' `cell_indices`, which deposition reuses, or
+        of its `electrostatic_` flavour on electrostatic grids.
+        Grids with higher order particle shapes gather the fields beforehand,
+        with `Grid.interpolate_fields`.
+
+        Note that velocity is updated in-place to conserve memory!
+
+        Parameters
+        ----------
+        species : `pythonpic.classes.Species`
+        electric_field : `numpy.ndarray`
+            Electric field on the species' grid, including guard cells. Shape `(NG + 2, 3)`.
+        dt : float
+            Timestep duration
+        magnetic_field : `numpy.ndarray`
+            Magnetic field on the species' grid, including guard cells. Shape `(NG + 2, 3)`.
+        Returns
+        -------
+        `float`
+            Total kinetic energy of the particles.
+        """
+        grid = species.grid
+        if grid.shape_order > 1:
+            E, B = grid.interpolate_fields(species.x, electric_field, magnetic_field)
+            return self.push(species, E, dt, B)
+        cell, cell_fraction = species.cell_indices()
+        if grid.electrostatic:
+            kick = self.kernel(species, "electrostatic_cell_gather_velocity_kick")
+            return kick(cell, cell_fraction, species.velocity_state, species.gamma_cache, electric_field,
+                        bool(grid.periodic), species.c, species.eff_q, dt, species.eff_m, species.chunk_sums)
+        kick = self.kernel(species, "cell_gather_velocity_kick")
+        return kick(cell, cell_fraction, species.velocity_state, species.gamma_cache,
+                    electric_field, magnetic_field,
+                    bool(grid.periodic), species.c,
+                    species.eff_q, dt, species.eff_m, species.chunk_sums)
+
+pushers = {"boris": Pusher(boris_kick, relativistic=False),
+           "rela_boris": Pusher(rela_boris_kick),
+           "vay": Pusher(vay_kick),
+           "higuera_cary": Pusher(higuera_cary_kick),
+           }
+
+boris_velocity_kick = pushers["boris"].velocity_kick
+boris_push = pushers["boris"].push
+rela_boris_velocity_kick = pushers["rela_boris"].velocity_kick
+rela_boris_push = pushers["rela_boris"].push
+
+@njit()
+def species_gather_velocity_kick(gather_velocity_kick, x, v, offsets, gamma, E, B, dx, periodic, c, eff_q, dt, eff_m,
+                                 chunk_sums, energies):
     """
-    Implements the relativistic Boris pusher.
-    Mostly a wrapper function for the compiled version in `rela_boris_velocity_kick`.
+    Runs a compiled `gather_velocity_kick` over particles of several species
+    stored one after another, species `s` taking up `offsets[s]:offsets[s+1]`.
 
-    Note that velocity is updated in-place to conserve memory!
+    Parameters
+    ----------
+    gather_velocity_kick : function
+        Compiled fused gather and velocity push, e.g. `Pusher.gather_velocity_kick`.
+    x, v : `numpy.ndarray`
+        Positions and velocities of all particles.
+    offsets : `numpy.ndarray`
+        Index of the first particle of each species, and the total number of particles.
+    gamma : `numpy.ndarray`
+        Empty array standing in for the cached Lorentz factors.
+    E, B, dx, periodic, c, dt
+        As in `gather_velocity_kick`.
+    eff_q, eff_m : `numpy.ndarray`
+        Per species effective charges and masses.
+    chunk_sums : `numpy.ndarray`
+        Per species chunk sums, of shape `(N_species, N_CHUNKS, N_CHUNK_SUMS)`.
+    energies : `numpy.ndarray`
+        Per species kinetic energies, written in place.
+    """
+    for s in range(eff_q.size):
+        start, end = offsets[s], offsets[s + 1]
+        energies[s] = gather_velocity_kick(x[start:end], v[start:end], gamma, E, B, dx, periodic, c, eff_q[s], dt,
+                                           eff_m[s], chunk_sums[s])
+
+
+def _position_push(x, v, dt):
+    """
+    Leapfrog position update, in place.
 
     Parameters
     ----------
-    species : `pythonpic.classes.Species`
-    E : `numpy.ndarray`
-        Interpolated or calculated values of the electric field. Shape `(N, 3)`.
-    dt : float
-        Timestep duration
-    B : `numpy.ndarray`
-        Interpolated or calculated values of the magnetic field. Shape `(N, 3)`.
-    Returns
-    -------
-    `numpy.ndarray`
-        Updated positions, shape `(N, )`.
-    `numpy.ndarray`
-        Updated velocity, shape `(N, 3)`.
-    `float`
-        Total kinetic energy of the particles.
+    x : `numpy.ndarray`
+        Array of positions, of shape `(N,)`
+    v : `numpy.ndarray`
+        Array of velocities, of shape `(N, 3)`
+    dt : `float`
+        Timestep duration.
+    """
+    for i in prange(x.size):
+        x[i] += v[i, 0] * dt
+
+position_push = njit()(_position_push)
+parallel_position_push = njit(parallel=True)(_position_push)
+
+
+def _cell_indices(x, dx, wrap_length, cell, cell_fraction):
+    """
+    Splits positions into the index of the cell they're in and the fraction
+    of the cell to their left, as the fused field gather does.
+
+    Parameters
+    ----------
+    x : `numpy.ndarray`
+        Array of positions, of shape `(N,)`
+    dx : `float`
+        Grid cell size.
+    wrap_length : `float`
+        If positive, positions are first wrapped into `[0, wrap_length)` in place.
+    cell : `numpy.ndarray`
+        Output integer array of cell indices, of shape `(N,)`
+    cell_fraction : `numpy.ndarray`
+        Output array of positions within the cells, in units of cell size, of shape `(N,)`
+    """
+    for i in prange(x.size):
+        if wrap_length > 0:
+            x[i] %= wrap_length
+        x_in_cells = x[i] / dx
+        left = int(x_in_cells)
+        cell[i] = left
+        cell_fraction[i] = x_in_cells - left
+
+cell_indices = njit()(_cell_indices)
+parallel_cell_indices = njit(parallel=True)(_cell_indices)
+
+
+def _cell_position_push(cell, cell_fraction, v, dt_over_dx):
+    """
+    Leapfrog position update, in place, for positions stored as cell indices
+    and fractional positions within the cells.
+
+    Parameters
+    ----------
+    cell : `numpy.ndarray`
+        Integer array of particle cell indices, of shape `(N,)`
+    cell_fraction : `numpy.ndarray`
+        Array of positions within the cells, in units of cell size, of shape `(N,)`
+    v : `numpy.ndarray`
+        Array of velocities, of shape `(N, 3)`
+    dt_over_dx : `float`
+        Timestep duration divided by the cell size.
+    """
+    for i in prange(cell.size):
+        fraction = cell_fraction[i] + v[i, 0] * dt_over_dx
+        cells_moved = np.floor(fraction)
+        cell[i] += int(cells_moved)
+        cell_fraction[i] = fraction - cells_moved
+
+cell_position_push = njit()(_cell_position_push)
+parallel_cell_position_push = njit(parallel=True)(_cell_position_push)
+
+
+def _momentum_position_push(x, u, gamma, dt):
+    """
+    Leapfrog position update, in place, from momenta `u = gamma v` and their cached Lorentz factors.
+
+    Parameters
+    ----------
+    x : `numpy.ndarray`
+        Array of positions, of shape `(N,)`
+    u : `numpy.ndarray`
+        Array of momenta per unit mass, of shape `(N, 3)`
+    gamma : `numpy.ndarray`
+        Array of Lorentz factors, of shape `(N,)`
+    dt : `float`
+        Timestep duration.
+    """
+    for i in prange(x.size):
+        x[i] += u[i, 0] / gamma[i] * dt
+
+momentum_position_push = njit()(_momentum_position_push)
+parallel_momentum_position_push = njit(parallel=True)(_momentum_position_push)
+
+
+def _momentum_cell_position_push(cell, cell_fraction, u, gamma, dt_over_dx):
+    """
+    Like `_cell_position_push`, from momenta `u = gamma v` and their cached Lorentz factors.
     """
-    energy = rela_boris_velocity_kick(species.v, species.c, species.eff_q,
-                                      E, B, dt, species.eff_m)
-    return energy
+    for i in prange(cell.size):
+        fraction = cell_fraction[i] + u[i, 0] / gamma[i] * dt_over_dx
+        cells_moved = np.floor(fraction)
+        cell[i] += int(cells_moved)
+        cell_fraction[i] = fraction - cells_moved
 
+momentum_cell_position_push = njit()(_momentum_cell_position_push)
+parallel_momentum_cell_position_push = njit(parallel=True)(_momentum_cell_position_push)
@@ -0,0 +1,202 @@
+# coding=utf-8
+"""Higher order B-spline particle shapes for deposition and field gather
+
+Particles are linear (cloud in cell) by default. `Grid(shape=...)` can select
+any of `shapes`:
+
+* `"linear"` - first order B-spline, handled by the specialized routines in
+  `charge_deposition`, `current_deposition` and `field_interpolation`,
+* `"quadratic"` - second order B-spline,
+* `"cubic"` - third order B-spline.
+
+For a shape of order `p`, charge is weighted onto the grid nodes, and fields
+are gathered from them, with the same B-spline `S_p`. The transversal current
+is weighted onto the cell centers with `S_p` averaged over the particle's
+path through the timestep, and the longitudinal current onto the nodes with
+`S_{p-1}` integrated along the path. The latter is the exact charge conserving
+current for the Buneman longitudinal update, just like the linear deposition
+in `current_deposition` is for `p = 1`.
+
+Paths are split at every node and cell center. The shapes are polynomials of
+degree at most 3 in between, so averaging them over each piece with two point
+Gauss-Legendre quadrature is exact.
+"""
+import numpy as np
+from numba import njit
+
+from .current_deposition import _particle_velocity
+
+shapes = {"linear": 1,
+          "quadratic": 2,
+          "cubic": 3,
+          }
+
+GAUSS_OFFSET = 0.5 / np.sqrt(3)
+
+
+@njit()
+def shape_weights(x_in_cells, order):
+    """
+    B-spline weights of a particle at `x_in_cells` (in units of the grid step)
+    on the nodes `0, 1, 2...`.
+
+    Parameters
+    ----------
+    x_in_cells : float
+        Particle position, in grid steps from node 0.
+    order : int
+        B-spline order, from 0 (nearest grid point) to 3 (cubic).
+
+    Returns
+    -------
+    first : int
+        Index of the first node with nonzero weight.
+    w0, w1, w2, w3 : float
+        Weights on nodes `first` to `first + 3`. Those beyond `first + order`
+        are zero.
+    """
+    if order == 0:
+        return int(np.floor(x_in_cells + 0.5)), 1.0, 0.0, 0.0, 0.0
+    elif order == 1:
+        first = int(np.floor(x_in_cells))
+        f = x_in_cells - first
+        return first, 1 - f, f, 0.0, 0.0
+    elif order == 2:
+        nearest = int(np.floor(x_in_cells + 0.5))
+        d = x_in_cells - nearest
+        return nearest - 1, 0.5 * (0.5 - d) ** 2, 0.75 - d * d, 0.5 * (0.5 + d) ** 2, 0.0
+    else:
+        left = int(np.floor(x_in_cells))
+        f = x_in_cells - left
+        g = 1 - f
+        return left - 1, g * g * g / 6, (4 - 6 * f * f + 3 * f * f * f) / 6, (4 - 6 * g * g + 3 * g * g * g) / 6, \
+            f * f * f / 6
+
+
+@njit()
+def _node_index(node, NG, periodic, first_index, last_index):
+    """
+    Array index of grid node `node` for an array whose node 0 sits at
+    `first_index`, or -1 if a nonperiodic grid has no such node up to
+    `last_index`. Periodic grids wrap nodes onto `0...NG-1`.
+    """
+    if periodic:
+        return node % NG + first_index
+    index = node + first_index
+    if 0 <= index <= last_index:
+        return index
+    return -1
+
+
+@njit()
+def _add_weights(array, x_in_cells, order, value, NG, periodic, first_index, last_index):
+    first, w0, w1, w2, w3 = shape_weights(x_in_cells, order)
+    weights = (w0, w1, w2, w3)
+    for k in range(order + 1):
+        index = _node_index(first + k, NG, periodic, first_index, last_index)
+        if index >= 0:
+            array[index] += weights[k] * value
+
+
+@njit()
+def _add_weights_yz(array, x_in_cells, order, value_y, value_z, NG, periodic, first_index, last_index):
+    first, w0, w1, w2, w3 = shape_weights(x_in_cells, order)
+    weights = (w0, w1, w2, w3)
+    for k in range(order + 1):
+        index = _node_index(first + k, NG, periodic, first_index, last_index)
+        if index >= 0:
+            array[index, 0] += weights[k] * value_y
+            array[index, 1] += weights[k] * value_z
+
+
+@njit()
+def shape_charge_deposition(charge_density, x, dx, q, periodic, order):
+    """
+    Deposits charge `q` of particles at `x` onto `charge_density`, of shape
+    `(NG+1,)`, with B-splines of the given order. Periodic grids wrap charge
+    onto the first `NG` nodes; nonperiodic ones drop what falls outside of
+    `charge_density`.
+    """
+    NG = charge_density.size - 1
+    for i in range(x.size):
+        _add_weights(charge_density, x[i] / dx, order, q, NG, periodic, 0, NG)
+
+
+@njit()
+def shape_current_deposition(j_x, j_yz, velocity, gamma, momentum, x, dx, dt, q, periodic, order):
+    """
+    Deposits the current of particles at `x` moving at `velocity` over
+    timestep `dt`, with B-splines of the given order.
+
+    Parameters
+    ----------
+    j_x : `numpy.ndarray`
+        Longitudinal current on the nodes, of shape `(NG+3,)`, with node 0 at index 1.
+    j_yz : `numpy.ndarray`
+        Transversal current on the cell centers, of shape `(NG+4, 2)`, with
+        the center of cell 0 at index 2.
+    velocity, x : `numpy.ndarray`
+        Particle velocities, or momenta `u = gamma v` if `momentum`, and positions.
+    gamma : `numpy.ndarray`
+        Cached Lorentz factors of shape `(N,)`. Unused for velocities.
+    momentum : bool
+        Whether `velocity` holds momenta.
+    dx, dt, q : float
+        Grid step, timestep and particle charge.
+    periodic : bool
+        Periodic grids wrap current onto the grid; nonperiodic ones only
+        keep it on its `NG` nodes and cell centers.
+    order : int
+        B-spline order of the particle shape.
+    """
+    NG = j_x.size - 3
+    for i in range(x.size):
+        vx, vy, vz = _particle_velocity(velocity, gamma, momentum, i)
+        start = x[i] / dx
+        if vx == 0:
+            if vy != 0 or vz != 0:
+                _add_weights_yz(j_yz, start - 0.5, order, q * vy, q * vz, NG, periodic, 2, NG + 1)
+            continue
+        end = start + vx * dt / dx
+        direction = 1 if end > start else -1
+        current_x = q * dx / dt
+        segment_start = start
+        while segment_start != end:
+            if direction > 0:
+                segment_end = min((np.floor(2 * segment_start) + 1) / 2, end)
+            else:
+                segment_end = max((np.ceil(2 * segment_start) - 1) / 2, end)
+            length = segment_end - segment_start
+            fraction = length / (end - start)
+            middle = 0.5 * (segment_start + segment_end)
+            offset = GAUSS_OFFSET * length
+            for gauss_point in (middle - offset, middle + offset):
+                _add_weights(j_x, gauss_point, order - 1, 0.5 * current_x * length, NG, periodic, 1, NG)
+                _add_weights_yz(j_yz, gauss_point - 0.5, order, 0.5 * q * vy * fraction, 0.5 * q * vz * fraction,
+                                NG, periodic, 2, NG + 1)
+            segment_start = segment_end
+
+
+@njit()
+def shape_interpolate_fields(x, electric_field, magnetic_field, dx, periodic, order, E, B):
+    """
+    Gathers fields from the nodes to particles at `x` with B-splines of the
+    given order, writing them to `E` and `B`, of shape `(N, 3)`.
+
+    `electric_field` and `magnetic_field` include guard cells, with node 0 at
+    index 1. On nonperiodic grids, nodes beyond the guard cells don't
+    contribute.
+    """
+    NG = electric_field.shape[0] - 2
+    for i in range(x.size):
+        first, w0, w1, w2, w3 = shape_weights(x[i] / dx, order)
+        weights = (w0, w1, w2, w3)
+        for d in range(3):
+            E[i, d] = 0
+            B[i, d] = 0
+        for k in range(order + 1):
+            index = _node_index(first + k, NG, periodic, 1, NG + 1)
+            if index >= 0:
+                for d in range(3):
+                    E[i, d] += weights[k] * electric_field[index, d]
+                    B[i, d] += weights[k] * magnetic_field[index, d]
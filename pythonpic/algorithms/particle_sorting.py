@@ -0,0 +1,64 @@
+# coding=utf-8
+"""Sorting particles by cell
+
+Deposition scatters to, and the field gather reads from, the grid cells of
+the particles in storage order. Thermal motion scrambles that order within a
+few hundred steps, so these accesses end up jumping around the grid. A
+counting sort by cell, every few steps, keeps particles that share cells
+next to each other in memory.
+
+The sort is stable, so particles within a cell keep their relative order and
+runs are reproducible.
+"""
+from numba import njit
+
+
+@njit()
+def counting_sort_permutation(cell, n_cells, counts, permutation):
+    """
+    Finds the stable permutation ordering particles by cell.
+
+    Parameters
+    ----------
+    cell : `numpy.ndarray`
+        Integer array of particle cell indices, of shape `(N,)`. Indices
+        outside of `[0, n_cells)` are sorted as the nearest cell.
+    n_cells : int
+    counts : `numpy.ndarray`
+        Integer scratch array of shape `(n_cells + 1,)`.
+    permutation : `numpy.ndarray`
+        Output integer array of shape `(N,)`. After sorting, particle `i` is
+        the one that was at `permutation[i]`.
+    """
+    counts[:] = 0
+    for i in range(cell.size):
+        counts[min(max(cell[i], 0), n_cells - 1) + 1] += 1
+    for k in range(n_cells):
+        counts[k + 1] += counts[k]
+    for i in range(cell.size):
+        k = min(max(cell[i], 0), n_cells - 1)
+        permutation[counts[k]] = i
+        counts[k] += 1
+
+
+@njit()
+def apply_permutation(array, permutation, scratch):
+    """
+    Reorders the rows of `array`, of shape `(N, M)`, in place, so that row
+    `i` becomes the former row `permutation[i]`.
+
+    Parameters
+    ----------
+    array : `numpy.ndarray`
+    permutation : `numpy.ndarray`
+        As returned by `counting_sort_permutation`.
+    scratch : `numpy.ndarray`
+        Scratch array of the same dtype as `array` and at least as many rows
+        and columns.
+    """
+    for i in range(permutation.size):
+        for d in range(array.shape[1]):
+            scratch[i, d] = array[permutation[i], d]
+    for i in range(permutation.size):
+        for d in range(array.shape[1]):
+            array[i, d] = scratch[i, d]
@@ -1,4 +1,5 @@
 # coding=utf-8
 from .grid import PeriodicGrid, NonperiodicGrid, PeriodicTestGrid, NonperiodicTestGrid
+from .particle_container import ParticleContainer
 from .simulation import Simulation, load_simulation
 from .species import Species, Particle, TestSpecies
@@ -1,5 +1,6 @@
 """The spatial grid"""
 # coding=utf-8
+import numba
 import numpy as np
 import h5py
 import scipy.fftpack as fft
@@ -7,12 +8,26 @@ from scipy.integrate import cumtrapz, trapz
 
 from ..helper_functions import physics
 from ..algorithms import FieldSolver, BoundaryCondition, \
-    field_interpolation
-from ..algorithms.current_deposition import current_deposition
+    field_interpolation, filters
+from ..algorithms.charge_deposition import parallel_cell_charge_deposition
+from ..algorithms.current_deposition import particle_current_deposition, parallel_particle_current_deposition, \
+    cell_charge_current_deposition, parallel_cell_charge_current_deposition, periodic_current_guards, \
+    nonperiodic_current_guards
+from ..algorithms.particle_shapes import shapes, shape_charge_deposition, shape_current_deposition, \
+    shape_interpolate_fields
 from ..algorithms.FieldSolver import (BunemanLongitudinalSolver,
                                       BunemanTransversalSolver,
-                                      FourierLongitudinalSolver)
-
+                                      PSATDTransversalSolver,
+                                      FourierLongitudinalSolver,
+                                      RealFourierLongitudinalSolver,
+                                      DirectLongitudinalSolver,
+                                      real_fourier_factors,
+                                      psatd_factors,
+                                      poisson_solvers,
+                                      field_solvers)
+
+# number of private grid copies for deterministic parallel deposition
+N_DEPOSITION_CHUNKS = 64
 
 class Grid:
     """
@@ -34,17 +49,67 @@ class Grid:
     epsilon_0 : float
         electric permittivity of vacuum
     bc : `BoundaryCondition`
+    deterministic_deposition : bool
+        Species with `parallel=True` deposit charge and current on several
+        threads, each into a private copy of the grid arrays, and the copies
+        are then summed. If `True`, particles are split into
+        `N_DEPOSITION_CHUNKS` fixed ranges summed in order, so results don't
+        depend on the number of threads. If `False`, there is one copy per
+        thread, which is less to clear and sum, but rounding then depends on
+        the thread count.
+    shape : str
+        Particle shape for deposition and field gather, one of
+        `pythonpic.algorithms.particle_shapes.shapes`. Higher order shapes
+        are smoother and less noisy, but cost more per particle and are
+        deposited and gathered serially.
+    filter_passes : int
+        Number of binomial filter passes applied to the deposited charge and
+        current before the field solve. See `pythonpic.algorithms.filters`.
+    filter_compensation : bool
+        Whether to follow the binomial passes with a compensator, which keeps
+        long wavelengths closer to unfiltered.
+    poisson_solver : str, optional
+        Solver of Gauss's law used by `poisson_solve`, one of
+        `pythonpic.algorithms.FieldSolver.poisson_solvers`: `"fourier"`,
+        `"real_fourier"`, with the `1/(ik epsilon_0)` factors cached on the
+        grid, or `"direct"`, integrating the charge across a nonperiodic
+        grid. By default, periodic grids use `"real_fourier"` and
+        nonperiodic ones `"direct"`.
+    electrostatic : bool
+        Set to `True` for purely longitudinal simulations. Only charge is
+        deposited, the field is solved from it with `poisson_solve` every
+        step, and particles are pushed by `E_x` alone (see
+        `pythonpic.algorithms.particle_push`). Transversal fields and
+        currents are never touched.
+    field_solver : str
+        Solver of the transversal fields, one of
+        `pythonpic.algorithms.FieldSolver.field_solvers`: `"buneman"`, along
+        characteristics, or `"psatd"`, spectral and exact for any timestep,
+        on periodic grids only.
+    dt : float, optional
+        Timestep of an electrostatic grid or one with the `"psatd"` field
+        solver. The Buneman solver relies on `dx / c`, which is also the
+        default.
     """
 
     def __init__(self, T: float, L: float, NG: int, c: float = 1,
-                 epsilon_0: float = 1, bc=BoundaryCondition.BC()):
+                 epsilon_0: float = 1, bc=BoundaryCondition.BC(), deterministic_deposition: bool = True,
+                 shape: str = "linear", filter_passes: int = 0, filter_compensation: bool = False,
+                 poisson_solver: str = None, electrostatic: bool = False, field_solver: str = "buneman",
+                 dt: float = None):
 
         self.c = c
         self.epsilon_0 = epsilon_0
         self.x, self.dx = np.linspace(0, L, NG, retstep=True, endpoint=False, dtype=np.float64)
         self.x_interpolation = np.arange(NG+2)*self.dx - self.dx
 
-        self.dt = self.dx / c
+        if field_solver not in field_solvers:
+            raise ValueError(f"Unknown field solver {field_solver}, expected one of {field_solvers}.")
+        if dt is not None and not electrostatic and field_solver == "buneman":
+            raise ValueError("The Buneman field solver needs a timestep of dx / c.")
+        self.electrostatic = bool(electrostatic)
+        self.field_solver = field_solver
+        self.dt = self.dx / c if dt is None else dt
         self.T = T
         self.NT = physics.calculate_number_timesteps(T, self.dt)
         self.epsilon_0 = epsilon_0
@@ -52,8 +117,12 @@ class Grid:
         self.charge_density = np.zeros(NG + 1, dtype=np.float64)
         self.current_density_x = np.zeros((NG + 3), dtype=np.float64)
         self.current_density_yz = np.zeros((NG + 4, 2), dtype=np.float64)
-        self.electric_field = np.zeros((NG + 2, 3), dtype=np.float64)
-        self.magnetic_field = np.zeros((NG + 2, 3), dtype=np.float64)
+        # both fields share each grid row of one buffer, so the gather reads
+        # them together and `field_function` interpolates it without a copy;
+        # the solvers update the views in place
+        self.fields = np.zeros((NG + 2, 6), dtype=np.float64)
+        self.electric_field = self.fields[:, :3]
+        self.magnetic_field = self.fields[:, 3:]
 
         self.L = L
         self.NG = NG
@@ -61,6 +130,18 @@ class Grid:
         self.bc = bc
         self.k = 2 * np.pi * fft.fftfreq(self.NG, self.dx)
         self.k[0] = 0.0001
+        self.real_fourier_factors = real_fourier_factors(NG, self.dx, epsilon_0)
+        if poisson_solver is not None and poisson_solver not in poisson_solvers:
+            raise ValueError(f"Unknown Poisson solver {poisson_solver}, expected one of {poisson_solvers}.")
+        self.poisson_solver = poisson_solver
+        self.psatd_factors = psatd_factors(NG, self.dx, self.dt, c) if field_solver == "psatd" else None
+
+        self.deterministic_deposition = deterministic_deposition
+        self.shape = shape
+        self.shape_order = shapes[shape]
+        self.filter_passes = int(filter_passes)
+        self.filter_compensation = bool(filter_compensation)
+        self._private_grids = {}
 
         self.list_species = []
         self.postprocessed = False
@@ -83,6 +164,9 @@ class Grid:
         self.magnetic_field_history = group.create_dataset(name="Bfield", dtype=float, shape=(self.NT, self.NG, 3))
         self.laser_energy_history = group.create_dataset(name="laser", dtype=float, shape=(self.NT,))
         group.create_dataset(name="x", dtype=float, data=self.x)
+        if self.bc.E_table is not None:
+            group.create_dataset(name="laser_E", data=self.bc.E_table)
+            group.create_dataset(name="laser_B", data=self.bc.B_table)
 
         h5py_dictionary = {'NGrid':                 self.NG,
                            'L':                     self.L,
@@ -94,8 +178,15 @@ class Grid:
                            'T':                     self.T,
                            'periodic':              self.periodic,
                            'postprocessed':         self.postprocessed,
-                           'postprocessed_fourier': self.postprocessed_fourier
+                           'postprocessed_fourier': self.postprocessed_fourier,
+                           'shape':                 self.shape,
+                           'filter_passes':         self.filter_passes,
+                           'filter_compensation':   self.filter_compensation,
+                           'electrostatic':         self.electrostatic,
+                           'field_solver':          self.field_solver,
                            }
+        if self.poisson_solver is not None:
+            h5py_dictionary['poisson_solver'] = self.poisson_solver
         for key, value in h5py_dictionary.items():
             group.attrs[key] = value
 
@@ -168,39 +259,81 @@ class Grid:
         pass
 
     def apply_particle_bc(self, species):
-        species.x %= self.L
+        """
+        Wraps particles of the species around the grid, then sorts them by
+        cell if due (see `Species.sort_interval`).
+        """
+        if species.single_precision:
+            species.cell %= self.NG
+        else:
+            species.update_cell_indices(wrap_length=self.L)
+        species.sort_if_due()
 
 
     def init_solve(self, neutralize=False):
         """
-        Performs the initial, spectral iteration of the field solver.
+        Performs the initial iteration of the field solver, getting the
+        longitudinal field from Gauss's law with `poisson_solve`.
         See `FieldSolver` for details.
         """
-        self.electric_field[1:-1, 0] = FourierLongitudinalSolver(
-            self.charge_density[:-1], self.k, epsilon_0=self.epsilon_0, neutralize=neutralize
-            )
+        self.poisson_solve(neutralize)
+        if self.electrostatic:
+            return
+        self.transversal_solve()
 
-        BunemanTransversalSolver(self.electric_field,
-                                 self.magnetic_field,
-                                 self.current_density_yz, self.dt,
-                                 self.c, self.epsilon_0)
 
+    def poisson_solve(self, neutralize=False):
+        """
+        Sets the longitudinal electric field from the charge density with the
+        grid's `poisson_solver`.
+
+        Parameters
+        ----------
+        neutralize : bool
+            Whether to drop the mean charge. The Fourier solvers always do.
+        """
+        solver = self.poisson_solver
+        if solver is None:
+            solver = "real_fourier" if self.periodic else "direct"
+        rho = self.charge_density[:-1]
+        if solver == "real_fourier":
+            field = RealFourierLongitudinalSolver(rho, self.real_fourier_factors)
+        elif solver == "direct":
+            field = DirectLongitudinalSolver(rho, self.dx, self.epsilon_0, neutralize)
+        else:
+            field = FourierLongitudinalSolver(rho, self.k, epsilon_0=self.epsilon_0, neutralize=neutralize)
+        self.electric_field[1:-1, 0] = field
 
     def solve(self):
         """
         Performs an iteration of the field solver. This is based on the
         rotation equations. See `FieldSolver` for details.
+        Electrostatic grids solve `poisson_solve` instead.
         Returns
         -------
 
         """
+        if self.electrostatic:
+            self.poisson_solve()
+            return
         BunemanLongitudinalSolver(self.electric_field, self.current_density_x,
                                   self.dt,
                                   self.epsilon_0,)
-        BunemanTransversalSolver(self.electric_field,
-                                 self.magnetic_field,
-                                 self.current_density_yz, self.dt,
-                                 self.c, self.epsilon_0)
+        self.transversal_solve()
+
+    def transversal_solve(self):
+        """
+        Advances the transversal fields by a timestep with the grid's
+        `field_solver`.
+        """
+        if self.field_solver == "psatd":
+            PSATDTransversalSolver(self.electric_field, self.magnetic_field, self.current_density_yz,
+                                   self.c, self.epsilon_0, self.psatd_factors)
+        else:
+            BunemanTransversalSolver(self.electric_field,
+                                     self.magnetic_field,
+                                     self.current_density_yz, self.dt,
+                                     self.c, self.epsilon_0)
 
     def direct_energy_calculation(self):
         r"""
@@ -212,9 +345,37 @@ class Grid:
         """
         return self.epsilon_0 * (self.electric_field ** 2).sum() * 0.5
 
+    def private_grids(self, name):
+        """
+        Private copies of grid array `name` for parallel deposition.
+
+        Parameters
+        ----------
+        name : str
+            `"charge_density"`, `"current_density_x"` or `"current_density_yz"`.
+
+        Returns
+        -------
+        numpy.ndarray
+            Scratch array of shape `(n_chunks,) + shape of the grid array`.
+        """
+        n_chunks = N_DEPOSITION_CHUNKS if self.deterministic_deposition else numba.get_num_threads()
+        private = self._private_grids.get(name)
+        if private is None or private.shape[0] != n_chunks:
+            private = self._private_grids[name] = np.empty((n_chunks,) + getattr(self, name).shape)
+        return private
+
     def gather_density(self, species):
-        logical_coordinates = (species.x / self.dx).astype(int)
-        charge_to_right = species.x / self.dx - logical_coordinates
+        if self.shape_order > 1:
+            density = np.zeros(self.NG + 1)
+            shape_charge_deposition(density, species.x, self.dx, 1.0, bool(self.periodic), self.shape_order)
+            return density
+        logical_coordinates, charge_to_right = species.cell_indices()
+        if species.parallel:
+            density = np.zeros(self.NG + 1)
+            parallel_cell_charge_deposition(density, logical_coordinates, charge_to_right, 1.0,
+                                            self.private_grids("charge_density"))
+            return density
         charge_to_left = 1 - charge_to_right
         charge_hist_to_right = np.bincount(logical_coordinates+1, charge_to_right, minlength=self.NG+1)
         charge_hist_to_left = np.bincount(logical_coordinates, charge_to_left,
@@ -243,6 +404,9 @@ class Grid:
         """
         Gathers transversal and longitudinal current onto the Eulerian grid.
 
+        Subcycled species deposit their current over the whole subcycle when
+        they are pushed and keep contributing it until their next push.
+
         Parameters
         ----------
         list_species : list
@@ -251,10 +415,118 @@ class Grid:
         self.current_density_x[...] = 0.0
         self.current_density_yz[...] = 0.0
         for species in list_species:
-            current_deposition(self.current_density_x,
-                               self.current_density_yz,
-                               species.v, species.x,
-                               self.dx, self.dt, species.eff_q)
+            if species.subcycling == 1:
+                self.deposit_current(species, self.current_density_x, self.current_density_yz, self.dt)
+            else:
+                if species.pushed:
+                    species.current_density_x[...] = 0.0
+                    species.current_density_yz[...] = 0.0
+                    self.deposit_current(species, species.current_density_x, species.current_density_yz,
+                                         self.dt * species.subcycling)
+                self.current_density_x += species.current_density_x
+                self.current_density_yz += species.current_density_yz
+
+    def deposit_current(self, species, j_x, j_yz, dt):
+        """
+        Deposits the current of a species over timestep `dt` onto `j_x` and `j_yz`,
+        on several threads if the species is `parallel`.
+        """
+        if self.shape_order > 1:
+            shape_current_deposition(j_x, j_yz, species.velocity_state, species.gamma_cache, species.momentum,
+                                     species.x, self.dx, dt, species.eff_q, bool(self.periodic), self.shape_order)
+        elif species.parallel:
+            parallel_particle_current_deposition(j_x, j_yz, species.velocity_state, species.gamma_cache,
+                                                 species.momentum, species.x, self.dx, dt, species.eff_q,
+                                                 self.private_grids("current_density_x"),
+                                                 self.private_grids("current_density_yz"))
+        else:
+            particle_current_deposition(j_x, j_yz, species.velocity_state, species.gamma_cache, species.momentum,
+                                        species.x, self.dx, dt, species.eff_q)
+
+    def deposit(self, list_species):
+        """
+        Gathers charge and current onto the Eulerian grid in a single pass over
+        each species' particles, with the same results as `gather_charge`
+        followed by `gather_current`, up to rounding, then filters them if
+        the grid has `filter_passes`.
+
+        Electrostatic grids only gather charge, from all species at their
+        current positions.
+
+        Parameters
+        ----------
+        list_species : list
+            A list of species to gather charge and current from.
+        """
+        if self.electrostatic:
+            self.gather_charge(list_species)
+            if self.periodic:
+                # node NG is node 0 again
+                self.charge_density[0] += self.charge_density[-1]
+                self.charge_density[-1] = 0
+            self.filter_sources()
+            return
+        self.charge_density[...] = 0.0
+        self.current_density_x[...] = 0.0
+        self.current_density_yz[...] = 0.0
+        for species in list_species:
+            if species.subcycling == 1:
+                self.deposit_charge_current(species, self.current_density_x, self.current_density_yz, self.dt)
+            else:
+                if species.pushed:
+                    species.current_density_x[...] = 0.0
+                    species.current_density_yz[...] = 0.0
+                    self.deposit_charge_current(species, species.current_density_x, species.current_density_yz,
+                                                self.dt * species.subcycling)
+                else:
+                    # unfolded, as the guard cells are handled for all species at once
+                    self.charge_density += Grid.gather_density(self, species) * species.eff_q
+                self.current_density_x += species.current_density_x
+                self.current_density_yz += species.current_density_yz
+        self.fold_guard_cells()
+        self.filter_sources()
+
+    def filter_sources(self):
+        """
+        Filters the deposited charge and current with the grid's
+        `filter_passes` binomial passes and compensator, if any.
+        """
+        if self.filter_passes:
+            filters.filter_sources(self.charge_density, self.current_density_x, self.current_density_yz,
+                                   bool(self.periodic), self.filter_passes, self.filter_compensation)
+
+    def fold_guard_cells(self):
+        """
+        Handles charge and current deposited into the guard cells, after
+        `deposit`. Periodic grids wrap it around, nonperiodic ones drop it.
+        """
+
+    def deposit_charge_current(self, species, j_x, j_yz, dt):
+        """
+        Deposits the charge of a species onto the grid and its current over
+        timestep `dt` onto `j_x` and `j_yz`, on several threads if the species
+        is `parallel`. Linear shapes reuse the species' `cell_indices` from the
+        field gather.
+        """
+        if self.shape_order > 1:
+            x = species.x
+            shape_charge_deposition(self.charge_density, x, self.dx, species.eff_q, bool(self.periodic),
+                                    self.shape_order)
+            shape_current_deposition(j_x, j_yz, species.velocity_state, species.gamma_cache, species.momentum,
+                                     x, self.dx, dt, species.eff_q, bool(self.periodic), self.shape_order)
+        else:
+            cell, cell_fraction = species.cell_indices()
+            if species.parallel:
+                parallel_cell_charge_current_deposition(self.charge_density, j_x, j_yz, species.velocity_state,
+                                                        species.gamma_cache, species.momentum, cell,
+                                                        cell_fraction, self.dx, dt, species.eff_q,
+                                                        self.private_grids("charge_density"),
+                                                        self.private_grids("current_density_x"),
+                                                        self.private_grids("current_density_yz"))
+            else:
+                cell_charge_current_deposition(self.charge_density, j_x, j_yz, species.velocity_state,
+                                               species.gamma_cache, species.momentum, cell,
+                                               cell_fraction, self.dx, dt, species.eff_q)
 
     def field_function(self, xp):
         """
@@ -271,10 +543,33 @@ class Grid:
 
 
         """
-        result = self.interpolator(xp, np.hstack((self.electric_field,
-                                                  self.magnetic_field)), self.dx)
+        if self.shape_order > 1:
+            return self.interpolate_fields(xp, self.electric_field, self.magnetic_field)
+        result = self.interpolator(xp, self.fields, self.dx)
         return result[:, :3], result[:, 3:]
 
+    def interpolate_fields(self, xp, electric_field, magnetic_field):
+        """
+        Gathers given grid fields to particle locations with the grid's
+        particle shape.
+
+        Parameters
+        ----------
+        xp : `numpy.ndarray`
+            Particle positions.
+        electric_field, magnetic_field : `numpy.ndarray`
+            Fields on the grid, including guard cells. Shape `(NG + 2, 3)`.
+
+        Returns
+        -------
+        E, B : `numpy.ndarray`
+        """
+        E = np.empty((xp.size, 3))
+        B = np.empty((xp.size, 3))
+        shape_interpolate_fields(xp, electric_field, magnetic_field, self.dx, bool(self.periodic),
+                                 self.shape_order, E, B)
+        return E, B
+
     def save_field_values(self, i):
         """
         Update the i-th set of historical grid quantity values - charge,
@@ -334,12 +629,10 @@ class PeriodicGrid(Grid):
 
     def gather_current(self, list_species):
         super().gather_current(list_species)
-        self.current_density_yz[-4:-2] += self.current_density_yz[:2]
-        self.current_density_yz[2:4] += self.current_density_yz[-2:]
-        self.current_density_x[-3] += self.current_density_x[0]
-        self.current_density_x[0] = 0
-        self.current_density_x[1:3] += self.current_density_x[-2:]
-        self.current_density_x[-2:] = 0
+        periodic_current_guards(self.current_density_x, self.current_density_yz)
+
+    def fold_guard_cells(self):
+        periodic_current_guards(self.current_density_x, self.current_density_yz)
 
     def __repr__(self):
         return "Periodic" + super().__repr__();
@@ -353,6 +646,12 @@ class NonperiodicGrid(Grid):
     Object representing a non-periodic Eulerian grid on which charges, currents
     and fields are computed and stored.
 
+    Its ends absorb outgoing transversal waves exactly, without any
+    absorbing layer: at `dt = dx / c`, the Buneman solver carries each
+    characteristic reaching the last guard cell out of the grid, and nothing
+    enters from beyond it but what the boundary condition injects at the
+    first one.
+
     Parameters
     ----------
     T : float
@@ -370,6 +669,10 @@ class NonperiodicGrid(Grid):
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
+        if self.field_solver == "psatd":
+            raise ValueError("The PSATD field solver needs a periodic grid.")
+        if self.bc.precompute:
+            self.bc.tabulate(self.dt, self.NT)
         self.interpolator = field_interpolation.AperiodicInterpolateField
         self.periodic = False
 
@@ -387,13 +690,29 @@ class NonperiodicGrid(Grid):
 
     def apply_particle_bc(self, species):
         """
-        Applies non-periodic (destructive) boundary conditions to Species
+        Applies non-periodic (destructive) boundary conditions to Species,
+        then sorts its particles by cell if due (see `Species.sort_interval`).
+        The particle arrays are only filtered, and the velocity moments summed
+        in the last push only discarded, if some particles left the grid.
         """
-        alive = (0 <= species.x) & (species.x < self.L)
-        if species.N_alive:
-            species.x = species.x[alive]
-            species.v = species.v[alive]
+        if species.single_precision:
+            alive = (0 <= species.cell) & (species.cell < self.NG)
+        else:
+            alive = (0 <= species.x) & (species.x < self.L)
+        if not alive.all():
+            if species.single_precision:
+                species.cell = species.cell[alive]
+                species.cell_fraction = species.cell_fraction[alive]
+            else:
+                species.x = species.x[alive]
+            if species.momentum:
+                species.u = species.u[alive]
+                species.gamma_cache = species.gamma_cache[alive]
+            else:
+                species.v = species.v[alive]
+            species.chunk_sums_current = False
         species.N_alive = alive.sum()
+        species.sort_if_due()
 
     def gather_density(self, species):
         result = super().gather_density(species)
@@ -402,10 +721,11 @@ class NonperiodicGrid(Grid):
 
     def gather_current(self, list_species):
         super().gather_current(list_species)
-        self.current_density_yz[:2] = 0
-        self.current_density_yz[-2:] = 0
-        self.current_density_x[0] = 0
-        self.current_density_x[-2:] = 0
+        nonperiodic_current_guards(self.current_density_x, self.current_density_yz)
+
+    def fold_guard_cells(self):
+        self.charge_density[0] += self.charge_density[-1]
+        nonperiodic_current_guards(self.current_density_x, self.current_density_yz)
 
 class PeriodicTestGrid(PeriodicGrid):
     def __init__(self, *args, **kwargs):
@@ -501,13 +821,22 @@ def load_grid(file):
     T = grid_data.attrs['T']
     periodic = grid_data.attrs['periodic']
     postprocessed = grid_data.attrs['postprocessed']
+    shape = grid_data.attrs.get('shape', "linear")
+    filter_passes = grid_data.attrs.get('filter_passes', 0)
+    filter_compensation = grid_data.attrs.get('filter_compensation', False)
+    poisson_solver = grid_data.attrs.get('poisson_solver', None)
+    electrostatic = bool(grid_data.attrs.get('electrostatic', False))
+    field_solver = grid_data.attrs.get('field_solver', "buneman")
 
     x = grid_data['x']
     if periodic:
         grid_type = PeriodicGrid
     else:
         grid_type = NonperiodicGrid
-    grid = grid_type(T=T, L=L, NG=NG, c=c, epsilon_0=epsilon_0)
+    grid = grid_type(T=T, L=L, NG=NG, c=c, epsilon_0=epsilon_0, shape=shape,
+                     filter_passes=filter_passes, filter_compensation=filter_compensation,
+                     poisson_solver=poisson_solver, electrostatic=electrostatic, field_solver=field_solver,
+                     dt=dt if electrostatic or field_solver == "psatd" else None)
     grid.postprocessed = postprocessed
     grid.file = file
     assert grid.dx == dx
@@ -519,6 +848,9 @@ def load_grid(file):
     grid.electric_field_history = grid_data['Efield']
     grid.magnetic_field_history = grid_data['Bfield']
     grid.laser_energy_history = grid_data['laser']
+    if 'laser_E' in grid_data:
+        grid.laser_electric_field_history = grid_data['laser_E']
+        grid.laser_magnetic_field_history = grid_data['laser_B']
 
     if not postprocessed:
         grid.postprocess()
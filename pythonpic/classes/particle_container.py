@@ -0,0 +1,136 @@
+"""All particles of a simulation in shared arrays"""
+# coding=utf-8
+import numpy as np
+
+from ..algorithms.current_deposition import species_charge_current_deposition, \
+    parallel_species_charge_current_deposition
+from ..algorithms.particle_push import species_gather_velocity_kick, parallel_position_push, N_CHUNKS, N_CHUNK_SUMS
+
+
+class ParticleContainer:
+    """
+    Stores the particles of several species one species after another in
+    shared position and velocity arrays, so that each stage of an iteration
+    runs as a single compiled call for all of them instead of one per species.
+
+    The species keep views of their own particles as `x` and `v`, and their
+    energy and chunk sums, so their diagnostics work as usual.
+
+    Use through `Simulation(merge_species=True)`, which checks that the
+    species can be merged (see `Simulation.compiled_kernels`).
+
+    Parameters
+    ----------
+    list_species : list
+        Species to merge, already initialized.
+    grid : Grid
+    gather_velocity_kick : function
+        Compiled fused gather and velocity push shared by all species.
+    position_push : function
+        Compiled position push shared by all species.
+
+    Attributes
+    ----------
+    x, v : `numpy.ndarray`
+        Positions and velocities of all alive particles.
+    species_index : `numpy.ndarray`
+        Index in `list_species` of each particle's species.
+    offsets : `numpy.ndarray`
+        Index of the first particle of each species, then the total number of
+        particles.
+    eff_q, eff_m : `numpy.ndarray`
+        Per species effective charges and masses.
+    """
+
+    def __init__(self, list_species, grid, gather_velocity_kick, position_push):
+        self.list_species = list_species
+        self.grid = grid
+        self.gather_velocity_kick = gather_velocity_kick
+        self.position_push_kernel = position_push
+        self.parallel = position_push is parallel_position_push
+        self.dt = grid.dt
+        self.c = grid.c
+
+        self.x = np.concatenate([species.x for species in list_species]).astype(np.float64)
+        self.v = np.concatenate([species.v for species in list_species]).astype(np.float64)
+        counts = [species.x.size for species in list_species]
+        self.species_index = np.repeat(np.arange(len(list_species), dtype=np.int32), counts)
+        self.offsets = np.zeros(len(list_species) + 1, dtype=np.int64)
+        self.offsets[1:] = np.cumsum(counts)
+        self.eff_q = np.array([species.eff_q for species in list_species], dtype=np.float64)
+        self.eff_m = np.array([species.eff_m for species in list_species], dtype=np.float64)
+        self.chunk_sums = np.zeros((len(list_species), N_CHUNKS, N_CHUNK_SUMS), dtype=np.float64)
+        self.energies = np.array([species.energy for species in list_species], dtype=np.float64)
+        self.gamma_cache = np.empty(0)
+        self.update_species(pushed=False)
+
+    def update_species(self, pushed=True):
+        """
+        Points each species at its own particles, energy and chunk sums.
+
+        Parameters
+        ----------
+        pushed : bool
+            Whether the chunk sums are left by a push of the current particles.
+        """
+        for s, species in enumerate(self.list_species):
+            start, end = self.offsets[s], self.offsets[s + 1]
+            species.x = self.x[start:end]
+            species.v = self.v[start:end]
+            species.N_alive = end - start
+            species.chunk_sums = self.chunk_sums[s]
+            species.chunk_sums_current = pushed
+            species.energy = self.energies[s]
+
+    def velocity_push(self):
+        """Pushes the velocities of all particles through a timestep, with fields gathered from the grid."""
+        grid = self.grid
+        species_gather_velocity_kick(self.gather_velocity_kick, self.x, self.v, self.offsets, self.gamma_cache,
+                                     grid.electric_field, grid.magnetic_field, grid.dx, bool(grid.periodic),
+                                     self.c, self.eff_q, self.dt, self.eff_m, self.chunk_sums, self.energies)
+        for s, species in enumerate(self.list_species):
+            species.energy = self.energies[s]
+            species.chunk_sums_current = True
+
+    def deposit(self):
+        """Gathers charge and current of all particles onto the grid in a single pass. See `Grid.deposit`."""
+        grid = self.grid
+        grid.charge_density[...] = 0.0
+        grid.current_density_x[...] = 0.0
+        grid.current_density_yz[...] = 0.0
+        if self.parallel:
+            parallel_species_charge_current_deposition(grid.charge_density, grid.current_density_x,
+                                                       grid.current_density_yz, self.v, self.x, self.species_index,
+                                                       self.eff_q, grid.dx, grid.dt,
+                                                       grid.private_grids("charge_density"),
+                                                       grid.private_grids("current_density_x"),
+                                                       grid.private_grids("current_density_yz"))
+        else:
+            species_charge_current_deposition(grid.charge_density, grid.current_density_x, grid.current_density_yz,
+                                              self.v, self.x, self.species_index, self.eff_q, grid.dx, grid.dt)
+        grid.fold_guard_cells()
+        grid.filter_sources()
+
+    def position_push(self):
+        """Pushes the positions of all particles through a timestep."""
+        self.position_push_kernel(self.x, self.v, self.dt)
+        for species in self.list_species:
+            species.cell_cache_current = False
+
+    def apply_particle_bc(self):
+        """
+        Applies the grid's particle boundary conditions to all particles:
+        wraps them around a periodic grid, or removes those that left a
+        nonperiodic one.
+        """
+        if self.grid.periodic:
+            self.x %= self.grid.L
+            return
+        alive = (0 <= self.x) & (self.x < self.grid.L)
+        if alive.all():
+            return
+        self.x = self.x[alive]
+        self.v = self.v[alive]
+        self.species_index = self.species_index[alive]
+        self.offsets[1:] = np.cumsum(np.bincount(self.species_index, minlength=len(self.list_species)))
+        self.update_species(pushed=False)
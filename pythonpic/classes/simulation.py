@@ -4,12 +4,16 @@ import os
 import time
 
 import h5py
+import numba
 import numpy as np
 import matplotlib.pyplot as plt
 
 from .grid import Grid, load_grid
+from .particle_container import ParticleContainer
 from .species import load_species
-from ..helper_functions.helpers import report_progress, git_version, config_filename
+from ..algorithms import multistep
+from ..algorithms.particle_push import position_push, parallel_position_push
+from ..helper_functions.helpers import report_progress, git_version, config_filename, is_this_saved_iteration
 from ..visualization import animation, static_plots
 
 
@@ -28,10 +32,22 @@ class Simulation:
     git_ver : str
     filename : str
     title : str
+    threads : int
+        If given, push and deposit all species on this many threads (see
+        `Species` with `parallel=True`). Pushes stay bitwise identical to a
+        serial run; deposition differs from it by rounding, but doesn't depend
+        on the thread count unless the grid has `deterministic_deposition=False`.
+        Counts above the `NUMBA_NUM_THREADS` environment variable, which
+        caps the threads numba can launch, are lowered to it.
+    merge_species : bool
+        If `True`, store all particles in a single `ParticleContainer` after
+        initialization, so that each stage of an iteration runs once for all
+        species rather than once per species. The species must meet the
+        requirements of `compiled_kernels`.
     """
     def __init__(self, grid: Grid, list_species=None, run_date=current_time, git_version=git_version(),
                  filename=current_time_filename, category_type=None, config_version=None, title="",
-                 considered_large=False):
+                 considered_large=False, threads=None, merge_species=False):
         self.NT = grid.NT
         self.dt = grid.dt
         self.t = np.arange(self.NT) * self.dt
@@ -50,6 +66,15 @@ class Simulation:
         self.runtime = None
         self.considered_large = considered_large
 
+        if threads is not None:
+            threads = min(threads, numba.config.NUMBA_NUM_THREADS)
+            numba.set_num_threads(threads)
+            for species in self.list_species:
+                species.parallel = True
+        self.threads = threads
+        self.merge_species = merge_species
+        self.particles = None
+
     def postprocess(self):
         if not self.postprocessed:
             self.grid.postprocess()
@@ -69,15 +94,28 @@ class Simulation:
         1. gathers charge from particles to grid
         2. solves Poisson equation to get initial field
         3. initializes pusher via a step back
+
+        Particles are first put within the grid by its boundary conditions.
+        Electrostatic grids then solve for the initial field first and push
+        the velocities back by half a step in it, leaving positions alone.
         """
         self.grid.apply_bc(0)
         for species in self.list_species:
-            species.velocity_push(self.grid.field_function, -0.5)
-        self.grid.gather_charge(self.list_species)
-        self.grid.gather_current(self.list_species)
-        for species in self.list_species:
-            species.position_push()
             self.grid.apply_particle_bc(species)
+        if self.grid.electrostatic:
+            self.grid.deposit(self.list_species)
+            self.grid.solve()
+            for species in self.list_species:
+                species.velocity_push(time_multiplier=-0.5)
+        else:
+            for species in self.list_species:
+                species.velocity_push(time_multiplier=-0.5)
+            self.grid.deposit(self.list_species)
+            for species in self.list_species:
+                species.position_push()
+                self.grid.apply_particle_bc(species)
+        if self.merge_species:
+            self.particles = ParticleContainer(self.list_species, self.grid, *self.compiled_kernels())
         return self
 
     def iteration(self, i: int):
@@ -93,10 +131,21 @@ class Simulation:
         """
         self.grid.save_field_values(i)  # CHECK: is this the right place, or after loop?
         self.grid.apply_bc(i)
+        if self.grid.electrostatic:
+            self.electrostatic_iteration(i, save=True)
+            return
+        if self.particles is not None:
+            self.particles.velocity_push()
+            self.particles.deposit()
+            self.grid.solve()
+            self.particles.position_push()
+            for species in self.list_species:
+                species.save_particle_values(i)
+            self.particles.apply_particle_bc()
+            return
         for species in self.list_species:
-            species.velocity_push(self.grid.field_function) # TODO should be inplace?
-        self.grid.gather_charge(self.list_species)
-        self.grid.gather_current(self.list_species)
+            species.velocity_push()
+        self.grid.deposit(self.list_species)
         self.grid.solve()
         for species in self.list_species:
             species.position_push()
@@ -115,16 +164,197 @@ class Simulation:
 
         """
         self.grid.apply_bc(i)
+        if self.grid.electrostatic:
+            self.electrostatic_iteration(i, save=False)
+            return
+        if self.particles is not None:
+            self.particles.velocity_push()
+            self.particles.deposit()
+            self.grid.solve()
+            self.particles.position_push()
+            self.particles.apply_particle_bc()
+            return
         for species in self.list_species:
-            species.velocity_push(self.grid.field_function) # TODO should be inplace?
-        self.grid.gather_charge(self.list_species)
-        self.grid.gather_current(self.list_species)
+            species.velocity_push()
+        self.grid.deposit(self.list_species)
         self.grid.solve()
         for species in self.list_species:
             species.position_push()
             self.grid.apply_particle_bc(species)
 
-    def run(self, init=True):
+    def electrostatic_iteration(self, i: int, save=True):
+        """
+        The particle and field updates of an iteration on an electrostatic
+        grid: the particles are pushed through the step, then their charge is
+        gathered at the new positions and the field solved from it.
+
+        Parameters
+        ----------
+        i : int
+            iteration number
+        save : bool
+            Whether to save particle values.
+        """
+        for species in self.list_species:
+            species.velocity_push()
+            species.position_push()
+            if save:
+                species.save_particle_values(i)
+            self.grid.apply_particle_bc(species)
+        self.grid.deposit(self.list_species)
+        self.grid.solve()
+
+    def compiled_kernels(self):
+        """
+        Checks that the simulation can run compiled iterations, or merge its
+        species into a `ParticleContainer`, and picks the kernels for them. The grid must be electromagnetic and use
+        linear particle shapes, and all
+        species must be pushed by the same kernel, from velocities in double
+        precision, without subcycling or switching to the nonrelativistic
+        pusher.
+
+        Returns
+        -------
+        gather_velocity_kick, position_push : function
+            Compiled kernels for `pythonpic.algorithms.multistep.run_steps`.
+        """
+        if not self.list_species:
+            raise ValueError("Compiled iterations and merged species need at least one species.")
+        if self.grid.shape_order != 1:
+            raise ValueError("Compiled iterations and merged species only support linear particle shapes.")
+        if self.grid.electrostatic:
+            raise ValueError("Compiled iterations and merged species only support electromagnetic grids.")
+        kernels = set()
+        for species in self.list_species:
+            if (species.subcycling > 1 or species.single_precision or species.momentum
+                    or species.nonrelativistic_threshold is not None):
+                raise ValueError(f"Species {species.name} uses subcycling, single precision, momentum state or "
+                                 f"the automatic nonrelativistic pusher, which compiled iterations and merged species "
+                                 f"don't support.")
+            kernels.add((species.pusher.kernel(species, "gather_velocity_kick"),
+                         parallel_position_push if species.parallel else position_push))
+        if len(kernels) > 1:
+            raise ValueError("Compiled iterations and merged species need all species to share the pusher and the "
+                             "parallel setting.")
+        return kernels.pop()
+
+    def compiled_iterations(self, first: int, last: int, save=True):
+        """
+        Runs iterations `first` up to `last` inside a single compiled routine,
+        `pythonpic.algorithms.multistep.run_steps`, with the same results as
+        `iteration` (or `iteration_lite`, without `save`) up to rounding.
+
+        Parameters
+        ----------
+        first : int
+            First iteration number
+        last : int
+            Iteration number to stop before
+        save : bool
+            Whether to save grid and species histories.
+        """
+        grid = self.grid
+        gather_velocity_kick, push = self.compiled_kernels()
+        if grid.field_solver != "buneman":
+            raise ValueError("Compiled iterations only support the Buneman field solver.")
+        NT = last - first
+        N_species = len(self.list_species)
+        if grid.periodic:
+            bc_electric_field = bc_magnetic_field = np.zeros((NT, 3))
+        else:
+            bc_electric_field, bc_magnetic_field = grid.bc.step_values(first, last, self.dt)
+
+        list_x = numba.typed.List([np.ascontiguousarray(species.x, dtype=float) for species in self.list_species])
+        list_v = numba.typed.List([np.ascontiguousarray(species.v, dtype=float) for species in self.list_species])
+        list_chunk_sums = numba.typed.List([species.chunk_sums for species in self.list_species])
+        N_alive = np.array([species.x.size for species in self.list_species], dtype=np.int64)
+        eff_q = np.array([species.eff_q for species in self.list_species], dtype=float)
+        eff_m = np.array([species.eff_m for species in self.list_species], dtype=float)
+        species_dt = np.array([species.dt for species in self.list_species], dtype=float)
+
+        charge_density_history = np.zeros((NT, grid.NG))
+        current_density_history = np.zeros((NT, grid.NG, 3))
+        electric_field_history = np.zeros((NT, grid.NG, 3))
+        magnetic_field_history = np.zeros((NT, grid.NG, 3))
+        laser_energy_history = np.zeros(NT)
+        N_alive_history = np.zeros((NT, N_species), dtype=np.int64)
+        velocity_moments_history = np.zeros((NT, N_species, 3, 3))
+        kinetic_energy_history = np.zeros((NT, N_species))
+
+        multistep.run_steps(gather_velocity_kick, push,
+                            list_x, list_v, N_alive, eff_q, eff_m, species_dt, list_chunk_sums,
+                            self.list_species[0].gamma_cache,
+                            grid.electric_field, grid.magnetic_field, grid.charge_density,
+                            grid.current_density_x, grid.current_density_yz,
+                            grid.dx, grid.dt, grid.c, grid.epsilon_0, grid.L, bool(grid.periodic), grid.bc.index,
+                            bc_electric_field, bc_magnetic_field, grid.filter_passes, grid.filter_compensation,
+                            charge_density_history, current_density_history, electric_field_history,
+                            magnetic_field_history, laser_energy_history,
+                            N_alive_history, velocity_moments_history, kinetic_energy_history)
+
+        for s, species in enumerate(self.list_species):
+            species.x = list_x[s][:N_alive[s]]
+            species.v = list_v[s][:N_alive[s]]
+            if not grid.periodic:
+                species.N_alive = N_alive[s]
+            if NT:
+                species.energy = kinetic_energy_history[-1, s]
+        if self.particles is not None:
+            self.particles = ParticleContainer(self.list_species, grid, gather_velocity_kick, push)
+
+        if save:
+            grid.charge_density_history[first:last] = charge_density_history
+            grid.current_density_history[first:last] = current_density_history
+            grid.electric_field_history[first:last] = electric_field_history
+            grid.magnetic_field_history[first:last] = magnetic_field_history
+            grid.laser_energy_history[first:last] = laser_energy_history
+            for s, species in enumerate(self.list_species):
+                species.density_history[first:last] = np.broadcast_to(species.gathered_density[:-1],
+                                                                      (NT, grid.NG))
+                species.N_alive_history[first:last] = N_alive_history[:, s]
+                species.velocity_mean_history[first:last] = velocity_moments_history[:, s, 0]
+                species.velocity_squared_mean_history[first:last] = velocity_moments_history[:, s, 1]
+                species.velocity_std_history[first:last] = velocity_moments_history[:, s, 2]
+                species.kinetic_energy_history[first:last] = kinetic_energy_history[:, s]
+
+    def run_iterations(self, compiled_steps=None, save=True, start_time=None):
+        """
+        Runs all iterations of the simulation.
+
+        Parameters
+        ----------
+        compiled_steps : int, optional
+            If given, run up to this many iterations at a time in
+            `compiled_iterations`, returning to Python in between. Iterations
+            saving individual particle data still run through `iteration`.
+        save : bool
+            Whether to save grid and species histories.
+        start_time : float, optional
+            Start time for progress reports on large simulations.
+        """
+        step = self.iteration if save else self.iteration_lite
+        if compiled_steps is None:
+            for i in range(self.NT):
+                if self.considered_large and i % (self.NT // 100) == 0:
+                    report_progress(i, self.NT, start_time)
+                step(i)
+            return
+        self.compiled_kernels()
+        individual_saves = [species.save_every_n_iterations for species in self.list_species
+                            if save and species.individual_diagnostics]
+        i = 0
+        while i < self.NT:
+            if self.considered_large:
+                report_progress(i, self.NT, start_time)
+            if any(is_this_saved_iteration(i, every_n) for every_n in individual_saves):
+                step(i)
+                i += 1
+                continue
+            last = min([i + compiled_steps, self.NT] + [(i // every_n + 1) * every_n for every_n in individual_saves])
+            self.compiled_iterations(i, last, save)
+            i = last
+
+    def run(self, init=True, compiled_steps=None):
         """
         Run n iterations of the simulation, saving data as it goes.
 
@@ -135,6 +365,9 @@ class Simulation:
         init : bool
             Whether or not to initialize the simulation (particle placement, grid interaction).
             Not necessary, for example, in some tests.
+        compiled_steps : int, optional
+            If given, run up to this many iterations at a time inside a single
+            compiled routine. See `run_iterations`.
 
         Returns
         -------
@@ -151,10 +384,7 @@ class Simulation:
             if init:
                 self.grid_species_initialization()
             start_time = time.time()
-            for i in range(self.NT):
-                if self.considered_large and i % (self.NT // 100) == 0:
-                    report_progress(i, self.NT, start_time)
-                self.iteration(i)
+            self.run_iterations(compiled_steps, start_time=start_time)
             self.runtime = time.time() - start_time
             return self
         except KeyboardInterrupt:
@@ -163,7 +393,7 @@ class Simulation:
             os.remove(self.filename)
             exit()
 
-    def run_lite(self):
+    def run_lite(self, compiled_steps=None):
         """
         Run n iterations of the simulation, saving data as it goes.
 
@@ -171,9 +401,9 @@ class Simulation:
 
         Parameters
         ----------
-        init : bool
-            Whether or not to initialize the simulation (particle placement, grid interaction).
-            Not necessary, for example, in some tests.
+        compiled_steps : int, optional
+            If given, run up to this many iterations at a time inside a single
+            compiled routine. See `run_iterations`.
 
         Returns
         -------
@@ -182,8 +412,7 @@ class Simulation:
         """
         self.grid_species_initialization()
         start_time = time.time()
-        for i in range(self.NT):
-            self.iteration_lite(i)
+        self.run_iterations(compiled_steps, save=False)
         self.runtime = time.time() - start_time
         return self.runtime
 
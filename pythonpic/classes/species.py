@@ -6,7 +6,11 @@ from ..helper_functions.helpers import calculate_particle_snapshots, calculate_p
     is_this_saved_iteration, convert_global_to_particle_iter
 from ..helper_functions.physics import gamma_from_v
 from ..algorithms import density_profiles
-from ..algorithms.particle_push import rela_boris_push
+from ..algorithms.particle_push import pushers, position_push, parallel_position_push, cell_position_push, \
+    parallel_cell_position_push, momentum_position_push, parallel_momentum_position_push, \
+    momentum_cell_position_push, parallel_momentum_cell_position_push, velocity_moments, velocity_moment_sums, \
+    parallel_velocity_moment_sums, max_speed, cell_indices, parallel_cell_indices, N_CHUNKS, N_CHUNK_SUMS
+from ..algorithms.particle_sorting import counting_sort_permutation, apply_permutation
 from scipy.stats import maxwell
 
 MAX_SAVED_PARTICLES = int(1e4)
@@ -57,12 +61,53 @@ class Species:
         name of group
     scaling : float
         number of particles represented by each macroparticle
-    pusher : function
     individual_diagnostics : bool
         Set to `True` to save particle position and velocity
+    parallel : bool
+        Set to `True` to push particles and deposit their charge and current
+        on multiple threads. See `pythonpic.algorithms.particle_push` and
+        `Grid` on thread count and reproducibility.
+    subcycling : int
+        Push (and deposit current from) this species only every `subcycling`
+        iterations, with `subcycling` times the timestep and fields averaged
+        over the skipped iterations. Its current is held in between. Meant
+        for heavy species such as ions.
+    pusher : str
+        Name of the velocity pusher, one of `pythonpic.algorithms.particle_push.pushers`.
+    dtype : numpy.dtype
+        Precision of particle storage. With `np.float32`, velocities are kept
+        in single precision and positions as the index of the particle's
+        cell plus a single precision fraction of the cell, so that they don't
+        lose resolution far from the origin. `x` then returns double precision
+        positions computed from those. Grid quantities stay double precision.
+    momentum : bool
+        Set to `True` to keep momenta per unit mass, `u = gamma v`, as the
+        particle state, along with their Lorentz factors, instead of
+        velocities. This saves converting between the two on every push.
+        Needs a relativistic pusher. `v` is then calculated from `u` on access
+        and can't be modified in place, only assigned.
+    nonrelativistic_threshold : float, optional
+        If given, the species is pushed with the nonrelativistic Boris pusher
+        instead of `pusher` while all its particles are slower than this
+        fraction of the speed of light, switching back once any gets faster.
+        Leave a margin, as particles may be accelerated for up to
+        `nonrelativistic_check_interval` pushes before the switch back.
+    nonrelativistic_check_interval : int
+        Number of pushes between checks of the particle speeds against
+        `nonrelativistic_threshold`. The largest speed comes out of the push,
+        so checks are cheap.
+    sort_interval : int
+        If positive, the particles are sorted by cell every `sort_interval`
+        position pushes, when the grid applies its particle boundary
+        conditions, to keep the memory accesses of deposition and field
+        gather local in large runs. See `pythonpic.algorithms.particle_sorting`.
+        Sorting reorders particles, so it can't be combined with
+        `individual_diagnostics`. Compiled and merged steps don't sort.
     """
     def __init__(self, q, m, N, grid, name="particles", scaling=1,
-                 individual_diagnostics=False):
+                 individual_diagnostics=False, parallel=False, subcycling=1,
+                 pusher="rela_boris", dtype=np.float64, momentum=False,
+                 nonrelativistic_threshold=None, nonrelativistic_check_interval=1, sort_interval=0):
         self.q = q
         self.m = m
         self.N = int(N)
@@ -79,14 +124,55 @@ class Species:
 
         self.save_every_n_iterations = calculate_particle_iter_step(grid.NT)
         self.saved_iterations = calculate_particle_snapshots(grid.NT)
+        self.dtype = np.dtype(dtype)
+        self.single_precision = self.dtype == np.float32
+        self.pusher_name = pusher
+        self.pusher = pushers[pusher]
+        self.momentum = momentum
+        if momentum and not self.pusher.relativistic:
+            raise ValueError(f"Momentum state needs a relativistic pusher, not {pusher}.")
+        if momentum and nonrelativistic_threshold is not None:
+            raise ValueError("Momentum state can't switch to the nonrelativistic pusher.")
+        self.relativistic_pusher = self.pusher
+        self.nonrelativistic_threshold = nonrelativistic_threshold
+        self.nonrelativistic_check_interval = int(nonrelativistic_check_interval)
+        self.pushes_since_check = 0
+        if sort_interval and individual_diagnostics:
+            raise ValueError("Sorting particles would mix up their individual diagnostics.")
+        self.sort_interval = int(sort_interval)
+        self.pushes_since_sort = 0
+        self.sort_permutation = np.zeros(0, dtype=np.int64)
+        self.sort_counts = np.zeros(grid.NG + 1, dtype=np.int64)
+        self.sort_buffers = {}
+        # cell indices and fractions of double precision positions, shared by the gather and deposition
+        self.cached_cell = np.zeros(0, dtype=np.int32)
+        self.cached_cell_fraction = np.zeros(0, dtype=np.float64)
         self.x = np.zeros(N, dtype=np.float64)
-        self.v = np.zeros((N, 3), dtype=np.float64)
+        if momentum:
+            self.u = np.zeros((N, 3), dtype=self.dtype)
+            self.gamma_cache = np.ones(N, dtype=self.dtype)
+        else:
+            self._v = np.zeros((N, 3), dtype=self.dtype)
+            self.gamma_cache = np.ones(0, dtype=self.dtype)
         self.gathered_density = np.zeros(self.grid.NG+1, dtype=np.float64)
+        # partial sums of energy and velocity moments left by the compiled pushers, reused between pushes
+        self.chunk_sums = np.zeros((N_CHUNKS, N_CHUNK_SUMS), dtype=np.float64)
+        self.chunk_sums_current = False
         self.energy = self.kinetic_energy
         self.alive = np.ones(N, dtype=bool)
         self.name = name
         self.save_every_n_particle, self.saved_particles = n_saved_particles(self.N, MAX_SAVED_PARTICLES)
 
+        self.parallel = parallel
+        self.subcycling = int(subcycling)
+        self.pushed = True
+        if self.subcycling > 1:
+            self.subcycled_steps = 0
+            self.subcycle_electric_field = np.zeros_like(grid.electric_field)
+            self.subcycle_magnetic_field = np.zeros_like(grid.magnetic_field)
+            self.current_density_x = np.zeros_like(grid.current_density_x)
+            self.current_density_yz = np.zeros_like(grid.current_density_yz)
+
         self.individual_diagnostics = individual_diagnostics
         if individual_diagnostics:
             self.position_history = np.zeros((self.saved_iterations, self.saved_particles), dtype=float)
@@ -129,8 +215,124 @@ class Species:
         group.attrs['q'] = self.q
         group.attrs['m'] = self.m
         group.attrs['scaling'] = self.scaling
+        group.attrs['subcycling'] = self.subcycling
+        group.attrs['pusher'] = self.pusher_name
+        group.attrs['dtype'] = self.dtype.name
+        group.attrs['momentum'] = self.momentum
+        if self.nonrelativistic_threshold is not None:
+            group.attrs['nonrelativistic_threshold'] = self.nonrelativistic_threshold
+        group.attrs['sort_interval'] = self.sort_interval
         group.attrs['postprocessed'] = self.postprocessed
 
+    @property
+    def x(self):
+        """
+        Particle positions.
+
+        In single precision, these are calculated from `cell` and
+        `cell_fraction`, so modifying the returned array in place has no effect.
+        In double precision, modifying them in place leaves `cell_indices`
+        stale; assign `x` instead.
+
+        Returns
+        -------
+        x: numpy.ndarray
+        """
+        if self.single_precision:
+            return (self.cell + self.cell_fraction) * self.grid.dx
+        return self._x
+
+    @x.setter
+    def x(self, x):
+        if self.single_precision:
+            x_in_cells = np.asarray(x, dtype=np.float64) / self.grid.dx
+            cell = np.floor(x_in_cells)
+            self.cell_fraction = (x_in_cells - cell).astype(np.float32)
+            self.cell = cell.astype(np.int32)
+            # rounding may put particles on the right edge of their cells
+            on_edge = self.cell_fraction >= 1
+            self.cell[on_edge] += 1
+            self.cell_fraction[on_edge] -= 1
+        else:
+            self._x = x
+            self.cell_cache_current = False
+
+    def cell_indices(self):
+        """
+        Index of the cell of each particle and the particle's position within
+        it, in units of cell size.
+
+        Single precision species store their positions this way. In double
+        precision, they are computed from `x` on first use after the positions
+        change and cached, so that the field gather and the deposition of a
+        timestep share them.
+
+        Returns
+        -------
+        cell : numpy.ndarray
+        cell_fraction : numpy.ndarray
+        """
+        if self.single_precision:
+            return self.cell, self.cell_fraction
+        if not self.cell_cache_current:
+            self.update_cell_indices()
+        return self.cached_cell, self.cached_cell_fraction
+
+    def update_cell_indices(self, wrap_length=0.0):
+        """
+        Fills the `cell_indices` cache of a double precision species from `x`.
+
+        Parameters
+        ----------
+        wrap_length : float
+            If positive, `x` is first wrapped into `[0, wrap_length)` in place,
+            in the same pass.
+        """
+        if self.cached_cell.size != self._x.size:
+            self.cached_cell = np.empty(self._x.size, dtype=np.int32)
+            self.cached_cell_fraction = np.empty(self._x.size, dtype=np.float64)
+        kernel = parallel_cell_indices if self.parallel else cell_indices
+        kernel(self._x, self.grid.dx, wrap_length, self.cached_cell, self.cached_cell_fraction)
+        self.cell_cache_current = True
+
+    @property
+    def v(self):
+        """
+        Particle velocities.
+
+        With the momentum state, these are calculated from `u` and the cached
+        Lorentz factors and returned read-only, so velocities can only be
+        changed by assigning whole arrays, e.g. `species.v = v`, which sets
+        `u` through the setter. Writing into `species.v[:, 0]` raises.
+        Hot paths use `velocity_state` and `gamma_cache` instead, as this
+        allocates a new array on every access.
+
+        Returns
+        -------
+        v: numpy.ndarray
+        """
+        if self.momentum:
+            v = self.u / self.gamma_cache[:, np.newaxis]
+            v.flags.writeable = False
+            return v
+        return self._v
+
+    @v.setter
+    def v(self, v):
+        self.chunk_sums_current = False
+        if self.momentum:
+            v = np.asarray(v, dtype=np.float64)
+            gamma = gamma_from_v(v, self.c)
+            self.u = (v * gamma).astype(self.dtype)
+            self.gamma_cache = gamma[:, 0].astype(self.dtype)
+        else:
+            self._v = v
+
+    @property
+    def velocity_state(self):
+        """The array the pushers update: `u` with the momentum state, `v` otherwise."""
+        return self.u if self.momentum else self._v
+
     @property
     def gamma(self):
         """
@@ -141,6 +343,8 @@ class Species:
         -------
         gamma: numpy.ndarray
         """
+        if self.momentum:
+            return self.gamma_cache[:, np.newaxis]
         return gamma_from_v(self.v, self.c)
 
     @property
@@ -162,12 +366,149 @@ class Species:
     def kinetic_energy(self):
         return (self.gamma - 1).sum() * self.eff_m * self.c**2
 
-    def velocity_push(self, field_function, time_multiplier=1):
-        E, B = field_function(self.x)
-        self.energy = rela_boris_push(self, E, time_multiplier * self.dt, B)
+    @property
+    def velocity_moments(self):
+        """
+        Mean velocity, mean squared velocity and velocity standard deviation.
+
+        Reuses the sums left by the last push if the particles haven't
+        changed since, and otherwise sums them up in a single pass. Assigning
+        to `v` and removing particles count as changes; editing `v` in place
+        after a push doesn't.
+
+        Returns
+        -------
+        moments: numpy.ndarray
+            The three moments as rows of shape `(3, 3)`.
+        """
+        if not self.chunk_sums_current:
+            moment_sums = parallel_velocity_moment_sums if self.parallel else velocity_moment_sums
+            moment_sums(self.velocity_state, self.gamma_cache, self.momentum, self.c, self.chunk_sums)
+            self.chunk_sums_current = True
+        return velocity_moments(self.chunk_sums, self.N_alive)
+
+    def velocity_push(self, field_function=None, time_multiplier=1):
+        """
+        Pushes particle velocities through a timestep.
+
+        Parameters
+        ----------
+        field_function : function, optional
+            Returns `E, B` at given particle positions. If `None`, fields are
+            gathered directly from `self.grid` inside the compiled pusher.
+            Subcycled species average their fields over the grid's iterations,
+            so they don't take one.
+        time_multiplier : float
+            Fraction of the timestep to push by, e.g. `-0.5` for initialization.
+            Subcycled species only skip iterations on full pushes.
+        """
+        if field_function is not None and self.subcycling > 1:
+            raise ValueError("Subcycled species gather their fields from the grid and can't take a field_function.")
+        dt = time_multiplier * self.dt * self.subcycling
+        if field_function is None:
+            if self.subcycling > 1 and time_multiplier == 1:
+                self.pushed = self.accumulate_subcycle_fields()
+                if self.pushed:
+                    self.energy = self.pusher.gather_push(self, self.subcycle_electric_field, dt,
+                                                          self.subcycle_magnetic_field)
+                    self.chunk_sums_current = True
+                    self.subcycle_electric_field[...] = 0
+                    self.subcycle_magnetic_field[...] = 0
+            else:
+                self.energy = self.pusher.gather_push(self, self.grid.electric_field, dt,
+                                                      self.grid.magnetic_field)
+                self.chunk_sums_current = True
+        else:
+            E, B = field_function(self.x)
+            self.energy = self.pusher.push(self, E, dt, B)
+            self.chunk_sums_current = True
+        if self.nonrelativistic_threshold is not None and self.chunk_sums_current:
+            self.pushes_since_check += 1
+            if self.pushes_since_check >= self.nonrelativistic_check_interval:
+                self.pushes_since_check = 0
+                self.check_nonrelativistic()
+
+    def check_nonrelativistic(self):
+        """
+        Selects the nonrelativistic Boris pusher if the last push left all
+        particles slower than `nonrelativistic_threshold` times the speed of
+        light, and the species' own pusher otherwise.
+        """
+        if max_speed(self.chunk_sums) < self.nonrelativistic_threshold * self.c:
+            self.pusher = pushers["boris"]
+        else:
+            self.pusher = self.relativistic_pusher
+
+    def accumulate_subcycle_fields(self):
+        """
+        Adds the current grid fields to the running sums of a subcycled species.
+
+        Returns
+        -------
+        bool
+            `True` once `subcycling` iterations have been summed. The sums then
+            hold time averaged fields and the species should be pushed.
+        """
+        self.subcycle_electric_field += self.grid.electric_field
+        self.subcycle_magnetic_field += self.grid.magnetic_field
+        self.subcycled_steps += 1
+        if self.subcycled_steps < self.subcycling:
+            return False
+        self.subcycle_electric_field /= self.subcycling
+        self.subcycle_magnetic_field /= self.subcycling
+        self.subcycled_steps = 0
+        return True
 
     def position_push(self):
-        self.x += self.v[:, 0] * self.dt
+        if not self.pushed:
+            return
+        self.cell_cache_current = False
+        self.pushes_since_sort += 1
+        dt = self.dt * self.subcycling
+        if self.single_precision:
+            if self.momentum:
+                push = parallel_momentum_cell_position_push if self.parallel else momentum_cell_position_push
+                push(self.cell, self.cell_fraction, self.u, self.gamma_cache, dt / self.grid.dx)
+            else:
+                push = parallel_cell_position_push if self.parallel else cell_position_push
+                push(self.cell, self.cell_fraction, self.v, dt / self.grid.dx)
+        elif self.momentum:
+            push = parallel_momentum_position_push if self.parallel else momentum_position_push
+            push(self.x, self.u, self.gamma_cache, dt)
+        elif self.parallel:
+            parallel_position_push(self.x, self.v, dt)
+        else:
+            position_push(self.x, self.v, dt)
+
+    def sort_if_due(self):
+        """Sorts the particles by cell if `sort_interval` position pushes have passed since the last sort."""
+        if self.sort_interval and self.pushes_since_sort >= self.sort_interval:
+            self.sort_by_cell()
+            self.pushes_since_sort = 0
+
+    def sort_by_cell(self):
+        """
+        Reorders the particles, along with their velocities or momenta and
+        cached cell indices, by cell, in place. The permutation and scratch
+        arrays are kept for the next sort.
+        """
+        cell, cell_fraction = self.cell_indices()
+        N = cell.size
+        if self.sort_permutation.size < N:
+            self.sort_permutation = np.empty(N, dtype=np.int64)
+        permutation = self.sort_permutation[:N]
+        counting_sort_permutation(cell, self.grid.NG, self.sort_counts, permutation)
+        arrays = [cell, cell_fraction, self.velocity_state]
+        if not self.single_precision:
+            arrays.append(self._x)
+        if self.momentum:
+            arrays.append(self.gamma_cache)
+        for array in arrays:
+            rows = array if array.ndim == 2 else array[:, np.newaxis]
+            scratch = self.sort_buffers.get(array.dtype)
+            if scratch is None or scratch.shape[0] < N:
+                scratch = self.sort_buffers[array.dtype] = np.empty((N, 3), dtype=array.dtype)
+            apply_permutation(rows, permutation, scratch)
 
     def gather_density(self):
         """A wrapper function to facilitate gathering particle density onto the grid.
@@ -239,9 +580,11 @@ class Species:
         directions_y = np.sin(random_theta) * np.sin(random_phi)
         directions_z = np.cos(random_phi)
         amplitudes = maxwell.rvs(size=self.N, loc=amplitude)
-        self.v[:,0] += amplitudes * directions_x
-        self.v[:,1] += amplitudes * directions_y
-        self.v[:,2] += amplitudes * directions_z
+        v = self.v.copy()
+        v[:,0] += amplitudes * directions_x
+        v[:,1] += amplitudes * directions_y
+        v[:,2] += amplitudes * directions_z
+        self.v = v
 
 
     """VELOCITY INITIALIZATION"""
@@ -259,7 +602,9 @@ class Species:
 
 
         """
-        self.v[:, axis] += amplitude * np.cos(2 * mode * np.pi * self.x / self.grid.L)
+        v = self.v.copy()
+        v[:, axis] += amplitude * np.cos(2 * mode * np.pi * self.x / self.grid.L)
+        self.v = v
 
     def random_velocity_perturbation(self, axis: int, std: float):
         """
@@ -274,7 +619,9 @@ class Species:
 
 
         """
-        self.v[:, axis] += np.random.normal(scale=std, size=self.N)
+        v = self.v.copy()
+        v[:, axis] += np.random.normal(scale=std, size=self.N)
+        self.v = v
 
     # def init_velocity_maxwellian(self, T, resolution_increase = 1000):
     #     thermal_velocity = 1
@@ -294,7 +641,7 @@ class Species:
         ----------
         i : int
         """
-        N_alive = self.x.size
+        N_alive = self.N_alive
         self.density_history[i] = self.gathered_density[:-1]
         if self.individual_diagnostics and is_this_saved_iteration(i, self.save_every_n_iterations):
             save_every_n_particle, saved_particles = n_saved_particles(N_alive, self.saved_particles)
@@ -305,13 +652,12 @@ class Species:
                 self.position_history[index, :saved_particles] = self.x[::save_every_n_particle]
                 self.velocity_history[index, :saved_particles] = self.v[::save_every_n_particle]
             except ValueError:
-                data = N_alive, save_every_n_particle, saved_particles, self.N, self.x.size
+                data = N_alive, save_every_n_particle, saved_particles, self.N
                 raise ValueError(data)
         self.N_alive_history[i] = N_alive
         if N_alive > 0:
-            self.velocity_mean_history[i] = self.v.mean(axis=0)
-            self.velocity_squared_mean_history[i] = (self.v**2).mean(axis=0)
-            self.velocity_std_history[i] = self.v.std(axis=0)
+            self.velocity_mean_history[i], self.velocity_squared_mean_history[i], self.velocity_std_history[i] = \
+                self.velocity_moments
         self.kinetic_energy_history[i] = self.energy
 
 
@@ -358,9 +704,17 @@ def load_species(f, grid):
         q = species_data.attrs['q']
         m = species_data.attrs['m']
         scaling = species_data.attrs['scaling']
+        subcycling = species_data.attrs.get('subcycling', 1)
+        pusher = species_data.attrs.get('pusher', "rela_boris")
+        dtype = species_data.attrs.get('dtype', "float64")
+        momentum = bool(species_data.attrs.get('momentum', False))
+        nonrelativistic_threshold = species_data.attrs.get('nonrelativistic_threshold', None)
+        sort_interval = species_data.attrs.get('sort_interval', 0)
         postprocessed = species_data.attrs['postprocessed']
 
-        species = Species(q, m, N, grid, name, scaling, individual_diagnostics=False)
+        species = Species(q, m, N, grid, name, scaling, individual_diagnostics=False,
+                          subcycling=subcycling, pusher=pusher, dtype=dtype, momentum=momentum,
+                          nonrelativistic_threshold=nonrelativistic_threshold, sort_interval=sort_interval)
         species.velocity_mean_history = species_data["v_mean"]
         species.velocity_squared_mean_history = species_data["v2_mean"]
         species.velocity_std_history = species_data["v_std"]
@@ -420,16 +774,17 @@ class Particle(TestSpecies):
         name of group
     scaling : float
         number of particles per macroparticle
-    pusher : function
-        particle push algorithm
+    pusher : str
+        particle push algorithm, see `Species`
+    momentum : bool
+        whether to keep momentum as the particle state, see `Species`
     """
-    def __init__(self, grid, x, vx, vy=0, vz=0, q=1, m=1, name="Test particle", scaling=1):
+    def __init__(self, grid, x, vx, vy=0, vz=0, q=1, m=1, name="Test particle", scaling=1,
+                 pusher="rela_boris", momentum=False):
         # noinspection PyArgumentEqualDefault
         super().__init__(q, m, 1, grid, name, scaling = scaling,
-                         individual_diagnostics=True)
+                         individual_diagnostics=True, pusher=pusher, momentum=momentum)
         self.x[:] = x
-        self.v[:, 0] = vx
-        self.v[:, 1] = vy
-        self.v[:, 2] = vz
+        self.v = np.array([[vx, vy, vz]], dtype=float)
 
 
@@ -65,8 +65,10 @@ class initial(Simulation):
         # q_protons = -total_negative_charge/N_protons
         # proton_mass = 1e16
         beam, plasma = self.list_species
-        beam.v[:, 0] = self.v0
-        plasma.v[:, 0] = 0
+        for species, v0 in ((beam, self.v0), (plasma, 0)):
+            v = species.v.copy()
+            v[:, 0] = v0
+            species.v = v
         # background = Species(q_protons, proton_mass, N_protons, "protons", NT, scaling(N_plasma))
         # background.v[:,:] = 0
         for i, species in enumerate(self.list_species):
@@ -16,6 +16,8 @@ total_time = 2e-13 # seconds
 spatial_step = 7.7325e-9 # meters
 number_cells = 1378
 
+# the field boundaries absorb outgoing radiation by themselves (see
+# NonperiodicGrid), so the moat only sets when the pulse reaches the target
 moat_length_left_side = 3.093e-6 # meters
 # linear preplasma
 preplasma_length = 7.73e-7 # meters
@@ -44,7 +46,9 @@ class initial(Simulation):
                  laser_intensity,
                  perturbation_amplitude,
                  laser_polarization="Ez",
-                 individual_diagnostics=False):
+                 individual_diagnostics=False,
+                 ion_subcycling=1,
+                 shape="linear"):
         """
         A simulation of laser-hydrogen shield interaction.
 
@@ -61,6 +65,11 @@ class initial(Simulation):
             Laser impulse intensity, in W/m^2. A good default is 1e21.
         perturbation_amplitude : float
             Amplitude of the initial position perturbation.
+        ion_subcycling : int
+            Push protons only every this many iterations. See `Species`.
+        shape : str
+            Particle shape, see `Grid`. Smoother shapes need fewer
+            macroparticles for the same noise level.
         """
         if laser_intensity:
             bc_laser = BoundaryCondition.bcs[laser_polarization](laser_intensity=laser_intensity,
@@ -75,7 +84,8 @@ class initial(Simulation):
             bc = bc_laser
         else:
             bc = BoundaryCondition.BC()
-        grid = NonperiodicGrid(T=total_time, L=length, NG=n_cells, c =lightspeed, epsilon_0 =epsilon_zero, bc=bc)
+        grid = NonperiodicGrid(T=total_time, L=length, NG=n_cells, c =lightspeed, epsilon_0 =epsilon_zero, bc=bc,
+                               shape=shape)
 
         cells_per_wl = laser_wavelength / grid.dx
         print(f"{cells_per_wl:.1f} grid cells per laser wavelength.")
@@ -88,7 +98,8 @@ class initial(Simulation):
                                 individual_diagnostics=individual_diagnostics)
             protons = Species(electric_charge, proton_mass, n_macroparticles,
                               grid, "protons", scaling,
-                              individual_diagnostics=individual_diagnostics)
+                              individual_diagnostics=individual_diagnostics,
+                              subcycling=ion_subcycling)
             list_species = [electrons, protons]
         else:
             list_species = []
@@ -56,8 +56,10 @@ class initial(Simulation):
         electrons2 = Species(species_2_sign * particle_charge, particle_mass,
                              N_electrons, grid, "beam2", scaling=scaling,
                              individual_diagnostics=individual_diagnostics)
-        electrons1.v[:, 0] = v0
-        electrons2.v[:, 0] = -v0
+        for species, species_v0 in ((electrons1, v0), (electrons2, -v0)):
+            v = species.v.copy()
+            v[:, 0] = species_v0
+            species.v = v
         list_species = [electrons1, electrons2]
         description = f"Two stream instability - two beams counterstreaming with $v_0$ {v0:.2f}"
         if vrandom:
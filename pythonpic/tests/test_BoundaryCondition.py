@@ -1,8 +1,10 @@
 # coding=utf-8
 
 import numpy as np
+import pytest
 
 from pythonpic.algorithms import BoundaryCondition
+from pythonpic.classes import NonperiodicTestGrid
 
 laser = BoundaryCondition.LaserCircular(1, 1)
 t = np.linspace(0, 10, 1000)
@@ -17,3 +19,23 @@ def test_field():
     assert np.any(Ey < 0)
     assert np.any(Ez > 0)
     assert np.any(Ez < 0)
+
+
+@pytest.mark.parametrize("kind", ["Ey", "Ez", "Circular"])
+def test_precomputed_table(kind):
+    """A tabulated laser applies the same fields at step times, and evaluates them between steps."""
+    bc_type = BoundaryCondition.bcs[kind]
+    g = NonperiodicTestGrid(T=10, L=3, NG=64, bc=bc_type(1, 1, envelope_center_t=2, precompute=True))
+    reference = bc_type(1, 1, envelope_center_t=2)
+    assert g.bc.E_table.shape == g.bc.B_table.shape == (g.NT, 3)
+    E, B = np.zeros((2, 2, 3))
+    for i in range(g.NT):
+        g.apply_bc(i)
+        reference.apply(E, B, i * g.dt)
+        assert np.allclose(g.electric_field[0], E[0], rtol=1e-13, atol=1e-15)
+        assert np.allclose(g.magnetic_field[0], B[0], rtol=1e-13, atol=1e-15)
+    g.bc.apply(g.electric_field, g.magnetic_field, 2.5 * g.dt)
+    reference.apply(E, B, 2.5 * g.dt)
+    assert np.array_equal(g.electric_field[0], E[0])
+    for values, expected in zip(g.bc.step_values(5, 20, g.dt), reference.field_values(np.arange(5, 20) * g.dt)):
+        assert np.array_equal(values, expected)
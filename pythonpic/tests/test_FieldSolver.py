@@ -3,6 +3,8 @@ import matplotlib.pyplot as plt
 import numpy as np
 import pytest
 
+from ..algorithms import BoundaryCondition
+from ..algorithms.FieldSolver import BunemanTransversalSolver, PSATDTransversalSolver, psatd_factors
 from ..classes import Simulation, PeriodicTestGrid, NonperiodicTestGrid
 from ..visualization.time_snapshots import FieldPlot, CurrentPlot
 
@@ -260,3 +262,140 @@ def test_BunemanSolver_charge(__t, _NG, _L, _test_charge_density):
     assert np.allclose(g.electric_field[1:-1,0], -v * _test_charge_density * g.dt / g.epsilon_0), plot()
 
 
+
+
+@pytest.mark.parametrize("NG", [63, 64])
+def test_real_fourier_solver(NG):
+    g = PeriodicTestGrid(1, 2 * np.pi, NG, poisson_solver="real_fourier")
+    np.random.seed(0)
+    g.charge_density[:-1] = np.random.normal(size=NG)
+    g.init_solve()
+    fourier = PeriodicTestGrid(1, 2 * np.pi, NG, poisson_solver="fourier")
+    fourier.charge_density[...] = g.charge_density
+    fourier.init_solve()
+    assert np.allclose(g.electric_field, fourier.electric_field)
+
+
+def test_direct_solver(_NG, _L):
+    """Gauss's law holds across the grid for a charged slab, whose field points away from it on both ends."""
+    g = NonperiodicTestGrid(1, _L, _NG)
+    slab = (_L * 3 / 8 < g.x) & (g.x < _L * 5 / 8)
+    g.charge_density[:-1][slab] = 1
+    g.init_solve()
+    field = g.electric_field[1:-1, 0]
+    rho = g.charge_density[:-1]
+    assert np.allclose(np.diff(field) / g.dx, 0.5 * (rho[1:] + rho[:-1]) / g.epsilon_0)
+    assert np.isclose(field[0], -field[-1])
+    assert np.isclose(field[-1] - field[0], rho.sum() * g.dx / g.epsilon_0)
+
+
+def test_direct_solver_matches_fourier_for_neutral_plasma():
+    """The field of a neutral plasma vanishes outside of it, while the
+    periodic Fourier solver can only find it up to its mean."""
+    g = NonperiodicTestGrid(1, 2 * np.pi, 256)
+    plasma = (np.pi / 2 < g.x) & (g.x < 3 * np.pi / 2)
+    g.charge_density[:-1][plasma] = np.sin(4 * (g.x[plasma] - np.pi / 2))
+    g.init_solve()
+    fourier = NonperiodicTestGrid(1, 2 * np.pi, 256, poisson_solver="fourier")
+    fourier.charge_density[...] = g.charge_density
+    fourier.init_solve()
+    field = g.electric_field[1:-1, 0]
+    assert np.allclose(field[~plasma], 0, atol=1e-12)
+    assert np.allclose(field - field.mean(), fourier.electric_field[1:-1, 0], atol=1e-2)
+
+
+def test_unknown_poisson_solver():
+    with pytest.raises(ValueError):
+        PeriodicTestGrid(1, 1, 32, poisson_solver="multigrid")
+
+
+def test_BunemanTransversalSolver_characteristics():
+    """The in place solver moves the characteristics `F+-` and `G+-` by a cell each, as array shifts would."""
+    np.random.seed(0)
+    electric_field, magnetic_field = np.random.normal(size=(2, 34, 3))
+    current_yz = np.random.normal(size=(36, 2))
+    dt, c, epsilon_0 = 0.1, 3.0, 0.7
+    Fplus = 0.5 * (electric_field[:, 1] + c * magnetic_field[:, 2])
+    Fminus = 0.5 * (electric_field[:, 1] - c * magnetic_field[:, 2])
+    Gplus = 0.5 * (electric_field[:, 2] + c * magnetic_field[:, 1])
+    Gminus = 0.5 * (electric_field[:, 2] - c * magnetic_field[:, 1])
+    Fplus[1:] = Fplus[:-1] - 0.5 * dt * current_yz[2:-1, 0] / epsilon_0
+    Gplus[1:] = Gplus[:-1] - 0.5 * dt * current_yz[2:-1, 1] / epsilon_0
+    Fminus[:-1] = Fminus[1:] - 0.5 * dt * current_yz[1:-2, 0] / epsilon_0
+    Gminus[:-1] = Gminus[1:] - 0.5 * dt * current_yz[1:-2, 1] / epsilon_0
+    longitudinal = electric_field[:, 0].copy(), magnetic_field[:, 0].copy()
+
+    BunemanTransversalSolver(electric_field, magnetic_field, current_yz, dt, c, epsilon_0)
+    assert np.allclose(electric_field[:, 1], Fplus + Fminus)
+    assert np.allclose(electric_field[:, 2], Gplus + Gminus)
+    assert np.allclose(magnetic_field[:, 1], (Gplus - Gminus) / c)
+    assert np.allclose(magnetic_field[:, 2], (Fplus - Fminus) / c)
+    assert np.array_equal(electric_field[:, 0], longitudinal[0])
+    assert np.array_equal(magnetic_field[:, 0], longitudinal[1])
+
+
+def test_psatd_matches_buneman_in_vacuum():
+    """At the Buneman timestep, a pulse well within the grid moves by a cell per step with either solver."""
+    grids = [PeriodicTestGrid(1, 1, 128, field_solver=solver) for solver in ("buneman", "psatd")]
+    x = grids[0].x
+    for g in grids:
+        g.electric_field[1:-1, 1] = np.exp(-((x - 0.4) / 0.05) ** 2)
+        g.electric_field[1:-1, 2] = np.exp(-((x - 0.6) / 0.05) ** 2)
+        g.magnetic_field[1:-1, 2] = 0.3 * g.electric_field[1:-1, 1] / g.c
+        for i in range(10):
+            g.solve()
+    assert np.allclose(grids[0].electric_field, grids[1].electric_field, atol=1e-12)
+    assert np.allclose(grids[0].magnetic_field, grids[1].magnetic_field, atol=1e-12)
+
+
+@pytest.mark.parametrize("dt_over_dx", [0.3, 1, 7.3])
+def test_psatd_is_dispersion_free(dt_over_dx):
+    """A forward wave of any wavelength moves at exactly c, whatever the timestep."""
+    NG, L, c = 64, 2 * np.pi, 1
+    g = PeriodicTestGrid(1, L, NG, c=c, field_solver="psatd", dt=dt_over_dx * L / NG / c)
+    modes = np.array([1, 5, 31])[:, np.newaxis]
+    wave = lambda t: np.cos(modes * (g.x - c * t)).sum(axis=0)
+    g.electric_field[1:-1, 1] = wave(0)
+    g.magnetic_field[1:-1, 2] = wave(0) / c
+    for i in range(20):
+        g.solve()
+    assert np.allclose(g.electric_field[1:-1, 1], wave(20 * g.dt), atol=1e-10)
+    assert np.allclose(g.magnetic_field[1:-1, 2], wave(20 * g.dt) / c, atol=1e-10)
+
+
+def test_psatd_uniform_current():
+    """A uniform current drains the electric field at any timestep, as Ampere's law with no curl says."""
+    np.random.seed(0)
+    electric_field, magnetic_field = np.zeros((2, 34, 3))
+    current_yz = np.zeros((36, 2))
+    current_yz[2:-2] = [0.5, -2]
+    dt, c, epsilon_0 = 2.3, 3.0, 0.7
+    PSATDTransversalSolver(electric_field, magnetic_field, current_yz, c, epsilon_0, psatd_factors(32, 0.1, dt, c))
+    assert np.allclose(electric_field[1:-1, 1:], [-0.5 * dt / epsilon_0, 2 * dt / epsilon_0])
+    assert np.allclose(magnetic_field, 0)
+    assert np.array_equal(electric_field[[0, -1]], np.zeros((2, 3)))
+
+
+def test_field_solver_options():
+    with pytest.raises(ValueError):
+        PeriodicTestGrid(1, 1, 32, field_solver="yee")
+    with pytest.raises(ValueError):
+        PeriodicTestGrid(1, 1, 32, dt=0.01)
+    with pytest.raises(ValueError):
+        NonperiodicTestGrid(1, 1, 32, field_solver="psatd")
+    g = PeriodicTestGrid(1, 1, 32, field_solver="psatd", dt=0.1)
+    assert g.dt == 0.1
+
+
+@pytest.mark.parametrize("bc", [BoundaryCondition.BC(), BoundaryCondition.LaserEz(1, 0.1, envelope_center_t=0.2)])
+def test_nonperiodic_boundaries_absorb(bc):
+    """Pulses running out of either end of a nonperiodic grid, and a laser pulse crossing it, leave no field behind."""
+    g = NonperiodicTestGrid(3, 1, 128, bc=bc)
+    g.electric_field[1:-1, 1] = np.exp(-((g.x - 0.3) / 0.05) ** 2)
+    g.electric_field[1:-1, 2] = np.exp(-((g.x - 0.7) / 0.05) ** 2)
+    g.magnetic_field[1:-1, 1] = 0.5 * g.electric_field[1:-1, 2] / g.c
+    for i in range(g.NT):
+        g.apply_bc(i)
+        g.solve()
+    assert np.abs(g.bc.field_values(g.NT * g.dt)).max() < 1e-12
+    assert np.allclose(g.fields, 0, atol=1e-12)
@@ -4,7 +4,7 @@ import pandas as pd
 import pytest
 from matplotlib import pyplot as plt
 
-from pythonpic.algorithms.current_deposition import current_deposition
+from pythonpic.algorithms.current_deposition import current_deposition, particle_current_deposition
 from pythonpic.classes import Particle, PeriodicTestGrid, NonperiodicTestGrid
 from pythonpic.classes import TestSpecies as Species
 from pythonpic.configs.run_laser import initial, npic, number_cells
@@ -255,6 +255,86 @@ def test_many_particles_periodic_deposition(N, _velocity):
     assert np.allclose(transversal_collected_weights, 1), ("Transversal weights don't match!", plot())
 
 
+@pytest.mark.parametrize("cells_per_step", [0.1, 0.5, 1.7])
+def test_particle_current_deposition_matches_current_deposition(cells_per_step):
+    np.random.seed(0)
+    NG, dx, dt, q = 32, 0.5, 0.25, 0.1
+    N = 10000
+    x = np.random.uniform(3 * dx, (NG - 3) * dx, N)
+    v = np.random.uniform(-1, 1, (N, 3)) * cells_per_step * dx / dt
+    v[:N // 10, 0] = 0
+    v[:N // 20] = 0
+    j_x, j_yz = np.zeros(NG + 3), np.zeros((NG + 4, 2))
+    current_deposition(j_x, j_yz, v, x, dx, dt, q)
+    compiled_j_x, compiled_j_yz = np.zeros_like(j_x), np.zeros_like(j_yz)
+    particle_current_deposition(compiled_j_x, compiled_j_yz, v, np.ones(0), False, x, dx, dt, q)
+    assert np.allclose(j_x, compiled_j_x, rtol=1e-12, atol=1e-14)
+    assert np.allclose(j_yz, compiled_j_yz, rtol=1e-12, atol=1e-14)
+
+
+@pytest.mark.parametrize("grid_type", [PeriodicTestGrid, NonperiodicTestGrid])
+@pytest.mark.parametrize("deterministic", [True, False])
+def test_parallel_deposition(grid_type, deterministic):
+    np.random.seed(0)
+    g = grid_type(T=1, L=10, NG=64, deterministic_deposition=deterministic)
+    serial, parallel = [Species(0.01, 1, 10000, g, parallel=p) for p in (False, True)]
+    serial.x = np.random.uniform(g.dx, g.L - g.dx, serial.N)
+    serial.v = np.random.uniform(-0.5, 0.5, (serial.N, 3))
+    parallel.x, parallel.v = serial.x, serial.v
+    densities = []
+    for s in [serial, parallel]:
+        g.gather_charge([s])
+        g.gather_current([s])
+        densities.append([g.charge_density.copy(), g.current_density_x.copy(), g.current_density_yz.copy()])
+    for serial_density, parallel_density in zip(*densities):
+        assert np.allclose(serial_density, parallel_density, rtol=1e-12, atol=1e-14)
+    assert g.private_grids("current_density_yz").shape[1:] == g.current_density_yz.shape
+
+
+@pytest.mark.parametrize("grid_type", [PeriodicTestGrid, NonperiodicTestGrid])
+@pytest.mark.parametrize("parallel", [False, True])
+@pytest.mark.parametrize("subcycled_pushed", [False, True])
+def test_deposit_matches_gather(grid_type, parallel, subcycled_pushed):
+    np.random.seed(0)
+    g = grid_type(T=1, L=10, NG=64)
+    list_species = [Species(0.01, 1, 10000, g, parallel=parallel),
+                    Species(-0.02, 1, 5000, g, parallel=parallel, subcycling=3)]
+    for s in list_species:
+        s.x = np.random.uniform(g.dx, g.L - g.dx, s.N)
+        s.v = np.random.uniform(-0.5, 0.5, (s.N, 3))
+    list_species[1].pushed = subcycled_pushed
+    g.gather_charge(list_species)
+    g.gather_current(list_species)
+    gathered = [g.charge_density.copy(), g.current_density_x.copy(), g.current_density_yz.copy()]
+    g.deposit(list_species)
+    deposited = [g.charge_density, g.current_density_x, g.current_density_yz]
+    for gathered_density, deposited_density in zip(gathered, deposited):
+        assert np.allclose(gathered_density, deposited_density, rtol=1e-12, atol=1e-14)
+
+
+@pytest.mark.parametrize("grid_type", [PeriodicTestGrid, NonperiodicTestGrid])
+@pytest.mark.parametrize("parallel", [False, True])
+@pytest.mark.parametrize("shape", ["linear", "quadratic"])
+def test_momentum_deposition_matches_velocity_deposition(grid_type, parallel, shape):
+    """Depositing from momenta and cached Lorentz factors gives the same
+    densities as depositing from velocities."""
+    np.random.seed(0)
+    g = grid_type(T=1, L=10, NG=64, shape=shape)
+    velocity, momentum = [Species(0.01, 1, 10000, g, parallel=parallel, momentum=m) for m in (False, True)]
+    velocity.x = np.random.uniform(g.dx, g.L - g.dx, velocity.N)
+    velocity.v = np.random.uniform(-0.5, 0.5, (velocity.N, 3))
+    momentum.x, momentum.v = velocity.x, velocity.v
+    densities = []
+    for s in [velocity, momentum]:
+        g.gather_current([s])
+        current = [g.current_density_x.copy(), g.current_density_yz.copy()]
+        g.deposit([s])
+        densities.append(current + [g.charge_density.copy(), g.current_density_x.copy(),
+                                    g.current_density_yz.copy()])
+    for velocity_density, momentum_density in zip(*densities):
+        assert np.allclose(velocity_density, momentum_density, rtol=1e-12, atol=1e-14)
+
+
 if __name__ == '__main__':
     test_single_particle_transversal_deposition(3.01, 1)
 
@@ -4,7 +4,7 @@ import pytest
 import matplotlib.pyplot as plt
 from pythonpic.classes import Species
 from pythonpic.classes import TestSpecies as Species
-from pythonpic.classes import NonperiodicTestGrid
+from pythonpic.classes import NonperiodicTestGrid, PeriodicTestGrid
 
 
 @pytest.mark.parametrize('func', [lambda x: x + 3, lambda x: x**2, lambda x: np.sin(2*np.pi*x)])
@@ -28,3 +28,19 @@ def test_interpolation(func):
         plt.show()
     assert np.allclose(expected_field, interpolated_field), plot()
 
+
+
+@pytest.mark.parametrize('field_solver', ["buneman", "psatd"])
+def test_fields_share_buffer(field_solver):
+    """The solvers update both fields in place within `Grid.fields`, which `field_function` interpolates."""
+    g = PeriodicTestGrid(1, 1, 32, field_solver=field_solver)
+    np.random.seed(0)
+    g.current_density_yz[...] = np.random.normal(size=g.current_density_yz.shape)
+    g.magnetic_field[:, 2] = np.random.normal(size=g.NG + 2)
+    g.solve()
+    assert np.shares_memory(g.electric_field, g.fields) and np.shares_memory(g.magnetic_field, g.fields)
+    assert np.array_equal(g.fields, np.hstack((g.electric_field, g.magnetic_field)))
+    x = np.linspace(0, g.L, 100, endpoint=False)
+    E, B = g.field_function(x)
+    assert np.allclose(E, g.interpolator(x, g.electric_field.copy(), g.dx))
+    assert np.allclose(B, g.interpolator(x, g.magnetic_field.copy(), g.dx))
@@ -0,0 +1,57 @@
+# coding=utf-8
+import numpy as np
+import pytest
+
+from ..algorithms.filters import binomial_filter
+from ..classes import PeriodicTestGrid, NonperiodicTestGrid
+from ..classes import TestSpecies as Species
+
+
+@pytest.mark.parametrize("passes", [1, 2, 4])
+@pytest.mark.parametrize("compensate", [False, True])
+@pytest.mark.parametrize("mode", [1, 5, 16])
+def test_transfer_function(passes, compensate, mode):
+    NG = 32
+    theta = 2 * np.pi * mode / NG
+    array = np.zeros(NG + 3)
+    array[1:NG + 1] = np.cos(theta * np.arange(NG))
+    filtered = array.copy()
+    binomial_filter(filtered, 1, NG + 1, True, passes, compensate)
+    transfer = np.cos(theta / 2) ** (2 * passes)
+    if compensate:
+        transfer *= 1 + passes * np.sin(theta / 2) ** 2
+    assert np.allclose(filtered[1:NG + 1], transfer * array[1:NG + 1])
+    assert (filtered[[0, -2, -1]] == 0).all()
+
+
+def test_compensation_flattens_passband():
+    k_dx = np.linspace(0, np.pi / 4, 10)
+    u = np.sin(k_dx / 2) ** 2
+    plain = (1 - u) ** 4
+    compensated = plain * (1 + 4 * u)
+    assert (np.abs(1 - compensated) <= np.abs(1 - plain)).all()
+
+
+@pytest.mark.parametrize("periodic", [True, False])
+def test_filter_conserves_total(periodic):
+    np.random.seed(0)
+    array = np.zeros(40)
+    array[8:32] = np.random.normal(size=24)
+    filtered = array.copy()
+    binomial_filter(filtered, 2, 38, periodic, 3, True)
+    # nonperiodic filters only leak what reaches the edges, which four passes don't
+    assert np.isclose(filtered.sum(), array.sum())
+
+
+@pytest.mark.parametrize("grid_type", [PeriodicTestGrid, NonperiodicTestGrid])
+def test_filter_reduces_deposition_noise(grid_type):
+    np.random.seed(0)
+    noise = []
+    for passes in [0, 2]:
+        g = grid_type(T=1, L=16, NG=32, filter_passes=passes, filter_compensation=True)
+        s = Species(1, 1, 5000, g)
+        s.x = np.random.uniform(4 * g.dx, g.L - 4 * g.dx, s.N)
+        s.v = np.random.normal(0, 0.1, (s.N, 3))
+        g.deposit([s])
+        noise.append([g.charge_density[8:24].std(), g.current_density_yz[10:26].std()])
+    assert (np.array(noise[1]) < 0.8 * np.array(noise[0])).all()
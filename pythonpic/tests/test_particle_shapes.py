@@ -0,0 +1,116 @@
+# coding=utf-8
+import numpy as np
+import pytest
+
+from ..algorithms.charge_deposition import charge_deposition
+from ..algorithms.current_deposition import particle_current_deposition
+from ..algorithms.field_interpolation import PeriodicInterpolateField, AperiodicInterpolateField
+from ..algorithms.particle_shapes import shapes, shape_weights, shape_charge_deposition, \
+    shape_current_deposition, shape_interpolate_fields
+from ..classes import PeriodicTestGrid, NonperiodicTestGrid, Simulation
+from ..classes import TestSpecies as Species
+
+NG, dx, dt, q = 32, 0.5, 0.25, 0.1
+
+
+def random_particles(N=2000, cells_per_step=1.7):
+    np.random.seed(0)
+    x = np.random.uniform(4 * dx, (NG - 4) * dx, N)
+    v = np.random.uniform(-1, 1, (N, 3)) * cells_per_step * dx / dt
+    v[:N // 10, 0] = 0
+    return x, v
+
+
+@pytest.mark.parametrize("order", range(4))
+def test_shape_weights_partition_unity(order):
+    np.random.seed(0)
+    for x in np.random.uniform(0, 10, 100):
+        first, *weights = shape_weights(x, order)
+        weights = np.array(weights)
+        assert np.isclose(weights.sum(), 1)
+        assert (weights >= 0).all()
+        assert (weights[order + 1:] == 0).all()
+        if order > 0:
+            # first moment: the shape is centered on the particle
+            assert np.isclose((weights * (first + np.arange(4))).sum(), x)
+
+
+@pytest.mark.parametrize("periodic", [True, False])
+def test_linear_shape_matches_linear_routines(periodic):
+    x, v = random_particles()
+    charge, shape_charge = np.zeros(NG + 1), np.zeros(NG + 1)
+    charge_deposition(charge, x, dx, q)
+    shape_charge_deposition(shape_charge, x, dx, q, periodic, 1)
+    assert np.allclose(charge, shape_charge)
+
+    j_x, j_yz = np.zeros(NG + 3), np.zeros((NG + 4, 2))
+    shape_j_x, shape_j_yz = np.zeros_like(j_x), np.zeros_like(j_yz)
+    particle_current_deposition(j_x, j_yz, v, np.ones(0), False, x, dx, dt, q)
+    shape_current_deposition(shape_j_x, shape_j_yz, v, np.ones(0), False, x, dx, dt, q, periodic, 1)
+    assert np.allclose(j_x, shape_j_x, atol=1e-12)
+    assert np.allclose(j_yz, shape_j_yz, atol=1e-12)
+
+    electric_field, magnetic_field = np.random.normal(size=(2, NG + 2, 3))
+    interpolator = PeriodicInterpolateField if periodic else AperiodicInterpolateField
+    E, B = np.empty((x.size, 3)), np.empty((x.size, 3))
+    shape_interpolate_fields(x, electric_field, magnetic_field, dx, periodic, 1, E, B)
+    assert np.allclose(E, interpolator(x, electric_field, dx))
+    assert np.allclose(B, interpolator(x, magnetic_field, dx))
+
+
+@pytest.mark.parametrize("order", [1, 2, 3])
+@pytest.mark.parametrize("cells_per_step", [0.3, 1.7])
+def test_charge_conservation(order, cells_per_step):
+    """The longitudinal current satisfies the continuity equation for the
+    charge on cell centers, which keeps Gauss's law with the Buneman solver."""
+    x, v = random_particles(cells_per_step=cells_per_step)
+    j_x, j_yz = np.zeros(NG + 3), np.zeros((NG + 4, 2))
+    shape_current_deposition(j_x, j_yz, v, np.ones(0), False, x, dx, dt, q, True, order)
+    charge_before, charge_after = np.zeros(NG + 1), np.zeros(NG + 1)
+    shape_charge_deposition(charge_before, x - dx / 2, dx, q, True, order)
+    shape_charge_deposition(charge_after, x + v[:, 0] * dt - dx / 2, dx, q, True, order)
+    current_on_nodes = j_x[1:NG + 1]
+    current_divergence = (np.roll(current_on_nodes, -1) - current_on_nodes) / dx
+    assert np.allclose((charge_after - charge_before)[:NG], -dt * current_divergence, atol=1e-12)
+    assert np.isclose(j_yz.sum(axis=0), q * v[:, 1:].sum(axis=0)).all()
+
+
+@pytest.mark.parametrize("order", [1, 2, 3])
+@pytest.mark.parametrize("periodic", [True, False])
+def test_gather_is_adjoint_of_deposition(order, periodic):
+    """Deposition and gather use the same shape, so there is no self-force."""
+    x, v = random_particles()
+    charge = np.zeros(NG + 1)
+    shape_charge_deposition(charge, x, dx, q, periodic, order)
+    electric_field, magnetic_field = np.random.normal(size=(2, NG + 2, 3))
+    E, B = np.empty((x.size, 3)), np.empty((x.size, 3))
+    shape_interpolate_fields(x, electric_field, magnetic_field, dx, periodic, order, E, B)
+    assert np.isclose(q * E[:, 0].sum(), (charge[:NG] * electric_field[1:-1, 0]).sum())
+
+
+def test_smoother_shapes_are_less_noisy():
+    np.random.seed(0)
+    x = np.random.uniform(0, NG * dx, 10000)
+    noise = []
+    for shape in shapes:
+        g = PeriodicTestGrid(T=1, L=NG * dx, NG=NG, shape=shape)
+        s = Species(1, 1, x.size, g)
+        s.x = x
+        noise.append(g.gather_density(s)[:NG].std())
+    assert noise[0] > noise[1] > noise[2]
+
+
+@pytest.mark.parametrize("grid_type", [PeriodicTestGrid, NonperiodicTestGrid])
+@pytest.mark.parametrize("shape", ["quadratic", "cubic"])
+def test_simulation_with_shape(grid_type, shape):
+    np.random.seed(0)
+    g = grid_type(T=5, L=2 * np.pi, NG=32, shape=shape)
+    s = Species(-1, 1, 2000, g, scaling=2 * np.pi / 2000)
+    s.distribute_uniformly(g.L, start_moat=0 if g.periodic else 2 * g.dx, end_moat=0 if g.periodic else 2 * g.dx)
+    s.sinusoidal_position_perturbation(0.01, 1)
+    S = Simulation(g, [s])
+    S.run_lite()
+    assert np.isfinite(g.electric_field).all()
+    assert s.N_alive > 0
+    with pytest.raises(ValueError):
+        S.run_lite(compiled_steps=10)
@@ -2,6 +2,7 @@
 import matplotlib.pyplot as plt
 import numpy as np
 import pytest
+import tracemalloc
 
 from pythonpic.classes import PeriodicTestGrid, NonperiodicTestGrid
 from pythonpic.classes import TestSpecies as Species
@@ -26,6 +27,11 @@ def _v0(request):
     return request.param
 
 
+@pytest.fixture(params=["rela_boris", "vay", "higuera_cary"])
+def _pusher(request):
+    return request.param
+
+
 @pytest.fixture()
 def g():
     T = 10
@@ -62,10 +68,10 @@ def plot(t, analytical_result, simulation_result,
     plt.show()
     return message
 
-def test_relativistic_constant_field(g, _n_particles):
+def test_relativistic_constant_field(g, _n_particles, _pusher):
     """Tests relativistic movement in constant electric field along the
     direction of motion."""
-    s = Species(1, 1, _n_particles, g, individual_diagnostics=True)
+    s = Species(1, 1, _n_particles, g, individual_diagnostics=True, pusher=_pusher)
     t = np.arange(0, g.T, g.dt * s.save_every_n_iterations) - g.dt / 2
 
     def uniform_field(*args, **kwargs):
@@ -86,13 +92,13 @@ def test_relativistic_constant_field(g, _n_particles):
     return Simulation(g, [s])
 
 
-def test_relativistic_magnetic_field(g, _n_particles, _v0):
+def test_relativistic_magnetic_field(g, _n_particles, _v0, _pusher):
     """Tests movement in uniform magnetic field in the z direction. The
     particle should move in a uniform circle. This also covers the
     non-relativistic case at small velocities.
     """
     B0 = 1
-    s = Species(1, 1, _n_particles, g, individual_diagnostics=True)
+    s = Species(1, 1, _n_particles, g, individual_diagnostics=True, pusher=_pusher)
     t = np.arange(0, g.T, g.dt * s.save_every_n_iterations) - g.dt / 2
     s.v[:, 1] = _v0
 
@@ -290,3 +296,262 @@ def test_laser_pusher():
     #       f"vz:{c:.9e}\n"
     #       f"KE:{e:.9e}\n")
     assert np.allclose(expected_v, p.v, atol=1e-1, rtol=1e-2)
+
+@pytest.mark.parametrize("periodic", [True, False])
+def test_gather_push_matches_field_function(periodic):
+    """Tests the fused gather-push kernel against interpolating fields first."""
+    grid_type = PeriodicTestGrid if periodic else NonperiodicTestGrid
+    g = grid_type(T=1, L=1, NG=32)
+    np.random.seed(0)
+    g.electric_field[...] = np.random.normal(size=g.electric_field.shape)
+    g.magnetic_field[...] = np.random.normal(size=g.magnetic_field.shape)
+    fused = Species(1, 1, 1000, g)
+    reference = Species(1, 1, 1000, g)
+    for s in [fused, reference]:
+        s.distribute_uniformly(g.L)
+        s.v[:] = 0
+        s.random_velocity_perturbation(0, 0.1)
+    reference.v[:] = fused.v
+
+    fused.velocity_push()
+    reference.velocity_push(g.field_function)
+    assert np.allclose(fused.v, reference.v, atol=1e-12, rtol=1e-10)
+    assert np.isclose(fused.energy, reference.energy)
+
+@pytest.mark.parametrize("periodic", [True, False])
+def test_parallel_push_is_bitwise_identical(periodic):
+    """Tests that the multithreaded push reproduces the serial one exactly."""
+    grid_type = PeriodicTestGrid if periodic else NonperiodicTestGrid
+    g = grid_type(T=1, L=1, NG=32)
+    np.random.seed(0)
+    g.electric_field[...] = np.random.normal(size=g.electric_field.shape)
+    g.magnetic_field[...] = np.random.normal(size=g.magnetic_field.shape)
+    serial = Species(1, 1, 10001, g)
+    parallel = Species(1, 1, 10001, g, parallel=True)
+    for s in [serial, parallel]:
+        s.distribute_uniformly(g.L)
+        s.v[:] = 0
+        s.random_velocity_perturbation(0, 0.1)
+    parallel.v[:] = serial.v
+
+    for s in [serial, parallel]:
+        s.velocity_push()
+        s.position_push()
+    assert (serial.x == parallel.x).all()
+    assert (serial.v == parallel.v).all()
+    assert serial.energy == parallel.energy
+
+@pytest.mark.parametrize("momentum", [False, True])
+@pytest.mark.parametrize("parallel", [False, True])
+def test_push_does_not_allocate(g, parallel, momentum):
+    """Tests that a steady-state push reuses the species' own memory."""
+    s = Species(1, 1, 100000, g, parallel=parallel, momentum=momentum)
+    s.distribute_uniformly(g.L)
+    s.random_velocity_perturbation(0, 0.1)
+    s.velocity_push()
+    s.position_push()
+
+    tracemalloc.start()
+    for i in range(3):
+        s.velocity_push()
+        s.position_push()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    assert peak < 1024, f"Pushing allocated {peak} bytes."
+
+@pytest.mark.parametrize("periodic", [True, False])
+def test_momentum_state_matches_velocity_state(_pusher, periodic):
+    """Tests that keeping u = gamma v as the particle state gives the same
+    trajectories as keeping velocities."""
+    grid_type = PeriodicTestGrid if periodic else NonperiodicTestGrid
+    g = grid_type(T=1, L=1, NG=32)
+    np.random.seed(0)
+    g.electric_field[...] = np.random.normal(size=g.electric_field.shape)
+    g.magnetic_field[...] = np.random.normal(size=g.magnetic_field.shape)
+    velocity = Species(1, 1, 1000, g, pusher=_pusher)
+    momentum = Species(1, 1, 1000, g, pusher=_pusher, momentum=True)
+    velocity.distribute_uniformly(g.L)
+    velocity.random_velocity_perturbation(0, 0.3)
+    momentum.x = velocity.x.copy()
+    momentum.v = velocity.v
+    assert np.allclose(momentum.v, velocity.v, rtol=1e-14, atol=1e-15)
+
+    for i in range(10):
+        for s in [velocity, momentum]:
+            s.velocity_push()
+            s.position_push()
+            g.apply_particle_bc(s)
+    assert np.allclose(momentum.x, velocity.x, rtol=1e-12, atol=1e-12)
+    assert np.allclose(momentum.v, velocity.v, rtol=1e-12, atol=1e-12)
+    assert np.allclose(momentum.gamma, velocity.gamma, rtol=1e-12)
+    assert np.isclose(momentum.energy, velocity.energy, rtol=1e-12)
+
+
+def test_momentum_state_needs_relativistic_pusher(g):
+    with pytest.raises(ValueError):
+        Species(1, 1, 10, g, pusher="boris", momentum=True)
+
+
+def test_momentum_state_velocity_is_read_only(g):
+    s = Species(1, 1, 10, g, momentum=True)
+    with pytest.raises(ValueError):
+        s.v[:, 0] = 0.5
+
+
+@pytest.mark.parametrize("interval", [1, 5])
+def test_nonrelativistic_switch(g, interval):
+    """Tests that slow species switch to the nonrelativistic pusher and back
+    once accelerated past the threshold."""
+    s = Species(1, 1, 100, g, nonrelativistic_threshold=0.01, nonrelativistic_check_interval=interval)
+    s.distribute_uniformly(g.L)
+    s.random_velocity_perturbation(0, 1e-4)
+    field = lambda x: (np.array([[1e-3 / g.dt, 0, 0]]), np.array([[0, 0, 0.]]))
+    pushers = []
+    for i in range(20):
+        s.velocity_push(field)
+        pushers.append(s.pusher)
+    assert pushers[interval - 1] is particle_push.pushers["boris"]
+    assert pushers[-1] is particle_push.pushers["rela_boris"]
+    assert s.relativistic_pusher is particle_push.pushers["rela_boris"]
+    switch_back = pushers.index(particle_push.pushers["rela_boris"], interval)
+    assert switch_back % interval == interval - 1
+
+
+def test_nonrelativistic_switch_matches_relativistic(g):
+    """Tests that a slow species pushed nonrelativistically stays close to the relativistic result."""
+    g.electric_field[...] = np.random.normal(scale=1e-3, size=g.electric_field.shape)
+    g.magnetic_field[...] = np.random.normal(size=g.magnetic_field.shape)
+    fast_path = Species(1, 1, 1000, g, nonrelativistic_threshold=0.01)
+    reference = Species(1, 1, 1000, g)
+    for s in [fast_path, reference]:
+        s.distribute_uniformly(g.L)
+        s.v = np.ones((s.N, 3)) * 1e-3
+    for i in range(50):
+        for s in [fast_path, reference]:
+            s.velocity_push()
+            s.position_push()
+            g.apply_particle_bc(s)
+    assert fast_path.pusher is particle_push.pushers["boris"]
+    assert np.allclose(fast_path.v, reference.v, atol=1e-4 * np.abs(reference.v).max())
+    assert np.allclose(fast_path.x, reference.x, atol=1e-4 * g.dx)
+
+
+@pytest.mark.parametrize("subcycling", [2, 5])
+def test_subcycling_uniform_field(g, subcycling):
+    """Tests that a subcycled species in a uniform electric field moves like
+    one pushed with a longer timestep, reaching the same velocity as a
+    regular species."""
+    g.electric_field[:, 0] = 0.1
+    regular = Species(1, 1, 10, g)
+    subcycled = Species(1, 1, 10, g, subcycling=subcycling)
+    long_step = Species(1, 1, 10, g)
+    long_step.dt = g.dt * subcycling
+    for s in [regular, subcycled, long_step]:
+        s.distribute_uniformly(g.L)
+    pushes = 0
+    for i in range(4 * subcycling):
+        for s in [regular, subcycled]:
+            s.velocity_push()
+            s.position_push()
+        pushes += subcycled.pushed
+    for i in range(4):
+        long_step.velocity_push()
+        long_step.position_push()
+    assert pushes == 4
+    assert np.allclose(regular.v, subcycled.v)
+    assert np.allclose(long_step.v, subcycled.v)
+    assert np.allclose(long_step.x, subcycled.x)
+
+
+def test_subcycled_current_is_held(g):
+    """Tests that a subcycled species' current persists between its pushes."""
+    subcycling = 3
+    s = Species(1, 1, 100, g, subcycling=subcycling)
+    s.distribute_uniformly(g.L)
+    s.v[:, :] = 0.1
+    s.velocity_push(time_multiplier=-0.5)
+    currents, pushes = [], []
+    for i in range(2 * subcycling):
+        g.gather_current([s])
+        currents.append(g.current_density_x[1:-2].sum())
+        pushes.append(s.pushed)
+        s.position_push()
+        s.velocity_push()
+    assert pushes == [True, False, False] * 2
+    assert np.allclose(currents, currents[0])
+    assert np.isclose(currents[0], s.N * s.eff_q * 0.1)
+
+
+def test_subcycled_field_function_raises(g):
+    """Tests that subcycled species refuse fields that bypass their averaging."""
+    s = Species(1, 1, 100, g, subcycling=3)
+    with pytest.raises(ValueError):
+        s.velocity_push(no_field)
+
+
+@pytest.mark.parametrize(["pusher", "rtol"], [
+    ["vay", 1e-12],
+    ["higuera_cary", 1e-2],
+    ])
+@pytest.mark.parametrize("drift", [0.5, 0.9, 0.99])
+def test_ExB_drift(g, pusher, rtol, drift):
+    """Tests that a particle moving at the E x B drift velocity is not
+    deflected by perpendicular fields. Boris fails this at relativistic
+    velocities."""
+    B0 = 10
+    s = Particle(g, 0, drift, pusher=pusher)
+    field = lambda x: (np.array([[0, drift * B0, 0]], dtype=float), np.array([[0, 0, B0]], dtype=float))
+    for i in range(g.NT):
+        s.velocity_push(field)
+    assert np.allclose(s.v[0], [drift, 0, 0], rtol=rtol, atol=rtol)
+
+
+def test_ExB_drift_boris_is_off(g):
+    """Documents the relativistic Boris E x B drift error that the Vay and
+    Higuera-Cary pushers avoid."""
+    B0 = 10
+    drift = 0.99
+    s = Particle(g, 0, drift)
+    field = lambda x: (np.array([[0, drift * B0, 0]], dtype=float), np.array([[0, 0, B0]], dtype=float))
+    for i in range(g.NT):
+        s.velocity_push(field)
+    assert not np.allclose(s.v[0], [drift, 0, 0], rtol=1e-4, atol=1e-4)
+
+
+@pytest.mark.parametrize("pusher", ["boris", "rela_boris", "vay", "higuera_cary"])
+def test_pushers_nonrelativistic_limit(g, pusher):
+    """Tests that all pushers agree on a slow particle gyrating in a magnetic field."""
+    v0 = 1e-4
+    reference = Particle(g, 0, 0, v0, pusher="boris")
+    s = Particle(g, 0, 0, v0, pusher=pusher)
+    field = lambda x: (np.array([[0, 0, 0]], dtype=float), np.array([[0, 0, 1]], dtype=float))
+    for i in range(g.NT):
+        reference.velocity_push(field)
+        s.velocity_push(field)
+    assert np.allclose(s.v, reference.v, rtol=1e-6, atol=v0 * 1e-6)
+
+
+@pytest.mark.parametrize(["pusher", "momentum"], [("boris", False), ("rela_boris", False), ("vay", False),
+                                                  ("higuera_cary", False), ("rela_boris", True), ("vay", True)])
+@pytest.mark.parametrize("periodic", [True, False])
+def test_electrostatic_push_matches_longitudinal_field(pusher, momentum, periodic):
+    """Tests the electrostatic kernels against the full ones in a purely longitudinal electric field."""
+    grid_type = PeriodicTestGrid if periodic else NonperiodicTestGrid
+    g = grid_type(T=1, L=1, NG=32)
+    g_electrostatic = grid_type(T=1, L=1, NG=32, electrostatic=True)
+    np.random.seed(0)
+    g.electric_field[:, 0] = np.random.normal(size=g.electric_field.shape[0])
+    g_electrostatic.electric_field[...] = np.random.normal(size=g.electric_field.shape)
+    g_electrostatic.electric_field[:, 0] = g.electric_field[:, 0]
+    g_electrostatic.magnetic_field[...] = np.random.normal(size=g.magnetic_field.shape)
+    reference = Species(1, 1, 1000, g, pusher=pusher, momentum=momentum)
+    electrostatic = Species(1, 1, 1000, g_electrostatic, pusher=pusher, momentum=momentum)
+    reference.distribute_uniformly(g.L)
+    reference.v = np.random.uniform(-0.5, 0.5, size=(1000, 3))
+    electrostatic.x = reference.x.copy()
+    electrostatic.v = reference.v.copy()
+
+    for s in [reference, electrostatic]:
+        s.velocity_push()
+    assert np.allclose(electrostatic.v, reference.v, rtol=1e-12, atol=1e-14)
+    assert np.isclose(electrostatic.energy, reference.energy, rtol=1e-12)
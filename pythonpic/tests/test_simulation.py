@@ -0,0 +1,215 @@
+# coding=utf-8
+import numba
+import numpy as np
+import pytest
+
+from ..algorithms import BoundaryCondition
+from ..algorithms.particle_push import pushers
+from ..classes import PeriodicTestGrid, NonperiodicTestGrid, Simulation
+from ..classes import TestSpecies as Species
+
+
+def twostream(grid_type=PeriodicTestGrid, N=1000, individual_diagnostics=False, subcycling=1, merge_species=False,
+              threads=None, **kwargs):
+    np.random.seed(0)
+    grid = grid_type(T=20, L=2 * np.pi, NG=32, **kwargs)
+    beams = []
+    for i, v0 in enumerate([0.1, -0.1]):
+        beam = Species(-1, 1, N, grid, f"beam{i}", scaling=2 * np.pi / N,
+                       individual_diagnostics=individual_diagnostics, subcycling=subcycling)
+        beam.distribute_uniformly(grid.L, 0.5 * grid.dx * i)
+        beam.sinusoidal_position_perturbation(0.001, 1)
+        beam.v = np.zeros((N, 3))
+        beam.random_velocity_perturbation(0, 0.01)
+        beam.random_velocity_perturbation(1, 0.01)
+        beam.v = beam.v + [v0, 0, 0]
+        grid.apply_particle_bc(beam)
+        beams.append(beam)
+    return Simulation(grid, beams, merge_species=merge_species, threads=threads)
+
+
+def laser(ions=False, merge_species=False, threads=None):
+    np.random.seed(0)
+    bc = BoundaryCondition.LaserEy(1, 1, envelope_center_t=2, envelope_width=1)
+    grid = NonperiodicTestGrid(T=10, L=3, NG=64, bc=bc)
+    electrons = Species(-1, 1, 1000, grid, "electrons", scaling=0.001)
+    electrons.distribute_uniformly(grid.L, start_moat=1, end_moat=1)
+    electrons.v = np.zeros((electrons.N, 3))
+    electrons.random_velocity_perturbation(0, 0.3)
+    list_species = [electrons]
+    if ions:
+        protons = Species(1, 100, 500, grid, "protons", scaling=0.002)
+        protons.distribute_uniformly(grid.L, start_moat=1, end_moat=1)
+        protons.v = np.zeros((protons.N, 3))
+        protons.random_velocity_perturbation(0, 0.05)
+        list_species.append(protons)
+    return Simulation(grid, list_species, merge_species=merge_species, threads=threads)
+
+
+@pytest.fixture
+def restore_threads():
+    """Restores numba's thread count after tests running on several threads."""
+    threads = numba.get_num_threads()
+    yield
+    numba.set_num_threads(threads)
+
+
+def compare(reference, compiled):
+    grid, compiled_grid = reference.grid, compiled.grid
+    for name in ["charge_density", "current_density_x", "current_density_yz", "electric_field", "magnetic_field",
+                 "charge_density_history", "current_density_history", "electric_field_history",
+                 "magnetic_field_history", "laser_energy_history"]:
+        assert np.allclose(getattr(grid, name), getattr(compiled_grid, name), rtol=1e-8, atol=1e-10), name
+    for species, compiled_species in zip(reference.list_species, compiled.list_species):
+        assert np.allclose(species.x, compiled_species.x, rtol=1e-8, atol=1e-10)
+        assert np.allclose(species.v, compiled_species.v, rtol=1e-8, atol=1e-10)
+        assert (species.N_alive_history == compiled_species.N_alive_history).all()
+        for name in ["velocity_mean_history", "velocity_squared_mean_history", "velocity_std_history",
+                     "kinetic_energy_history", "density_history"]:
+            assert np.allclose(getattr(species, name), getattr(compiled_species, name), rtol=1e-8,
+                               atol=1e-10), name
+        if species.individual_diagnostics:
+            assert np.allclose(species.position_history, compiled_species.position_history, rtol=1e-8, atol=1e-10)
+            assert np.allclose(species.velocity_history, compiled_species.velocity_history, rtol=1e-8, atol=1e-10)
+
+
+@pytest.mark.parametrize("compiled_steps", [1, 7, 1000])
+@pytest.mark.parametrize("individual_diagnostics", [False, True])
+def test_compiled_iterations_periodic(compiled_steps, individual_diagnostics):
+    reference, compiled = [twostream(individual_diagnostics=individual_diagnostics) for i in range(2)]
+    for S, steps in [(reference, None), (compiled, compiled_steps)]:
+        S.grid_species_initialization()
+        S.run_iterations(steps)
+    compare(reference, compiled)
+
+
+@pytest.mark.parametrize("compensation", [False, True])
+def test_compiled_iterations_filtered(compensation):
+    reference, compiled = [twostream(filter_passes=2, filter_compensation=compensation) for i in range(2)]
+    for S, steps in [(reference, None), (compiled, 50)]:
+        S.grid_species_initialization()
+        S.run_iterations(steps)
+    compare(reference, compiled)
+
+
+@pytest.mark.parametrize("compiled_steps", [1, 13, 1000])
+def test_compiled_iterations_nonperiodic_laser(compiled_steps):
+    reference, compiled = laser(), laser()
+    for S, steps in [(reference, None), (compiled, compiled_steps)]:
+        S.grid_species_initialization()
+        S.run_iterations(steps)
+    assert compiled.list_species[0].N_alive < compiled.list_species[0].N
+    assert np.abs(compiled.grid.electric_field_history[..., 1]).max() > 0
+    compare(reference, compiled)
+
+
+def test_compiled_iterations_lite():
+    reference, compiled = twostream(), twostream()
+    reference.run_lite()
+    compiled.run_lite(compiled_steps=50)
+    for species, compiled_species in zip(reference.list_species, compiled.list_species):
+        assert np.allclose(species.x, compiled_species.x, rtol=1e-8, atol=1e-10)
+        assert np.allclose(species.v, compiled_species.v, rtol=1e-8, atol=1e-10)
+
+
+def test_compiled_iterations_unsupported():
+    S = twostream()
+    S.list_species[1].pusher = pushers["vay"]
+    with pytest.raises(ValueError):
+        S.run_lite(compiled_steps=10)
+    S = twostream(subcycling=2)
+    with pytest.raises(ValueError):
+        S.run_lite(compiled_steps=10)
+
+
+@pytest.mark.parametrize("threads", [None, 2])
+@pytest.mark.parametrize("individual_diagnostics", [False, True])
+def test_merged_species_periodic(individual_diagnostics, threads, restore_threads):
+    reference = twostream(individual_diagnostics=individual_diagnostics)
+    merged = twostream(individual_diagnostics=individual_diagnostics, merge_species=True, threads=threads)
+    for S in [reference, merged]:
+        S.grid_species_initialization()
+        S.run_iterations()
+    assert merged.particles is not None
+    assert merged.particles.parallel == (threads is not None)
+    compare(reference, merged)
+
+
+@pytest.mark.parametrize("threads", [None, 2])
+@pytest.mark.parametrize("compiled_steps", [None, 13])
+def test_merged_species_nonperiodic(compiled_steps, threads, restore_threads):
+    reference, merged = laser(ions=True), laser(ions=True, merge_species=True, threads=threads)
+    for S in [reference, merged]:
+        S.grid_species_initialization()
+        S.run_iterations(compiled_steps)
+    particles = merged.particles
+    assert particles.x.size == sum(species.N_alive for species in merged.list_species) < 1500
+    assert (np.diff(particles.species_index) >= 0).all()
+    compare(reference, merged)
+
+
+def test_merged_species_unsupported():
+    S = twostream(subcycling=2, merge_species=True)
+    with pytest.raises(ValueError):
+        S.grid_species_initialization()
+
+
+def cold_plasma(N=2048, **kwargs):
+    grid = PeriodicTestGrid(T=40, L=2 * np.pi, NG=32, **kwargs)
+    electrons = Species(-1, 1, N, grid, "electrons", scaling=2 * np.pi / N)
+    electrons.distribute_uniformly(grid.L)
+    electrons.sinusoidal_velocity_perturbation(0, 0.001, 1)
+    return Simulation(grid, [electrons])
+
+
+def field_at_origin(S):
+    S.grid_species_initialization()
+    field = np.zeros(S.grid.NT)
+    for i in range(S.grid.NT):
+        S.iteration_lite(i)
+        field[i] = S.grid.electric_field[1, 0]
+    return np.arange(S.grid.NT) * S.grid.dt, field
+
+
+@pytest.mark.parametrize("dt", [None, 0.25])
+def test_electrostatic_matches_electromagnetic(dt):
+    """Tests that a cold plasma oscillation on an electrostatic grid, even at
+    a larger timestep, follows that on an electromagnetic one."""
+    t, field = field_at_origin(cold_plasma())
+    t_electrostatic, field_electrostatic = field_at_origin(cold_plasma(electrostatic=True, dt=dt))
+    assert np.allclose(np.interp(t, t_electrostatic, field_electrostatic), field,
+                       atol=0.1 * np.abs(field).max())
+
+
+def test_electrostatic_unsupported():
+    with pytest.raises(ValueError):
+        PeriodicTestGrid(T=1, L=1, NG=32, dt=0.01)
+    S = cold_plasma(electrostatic=True)
+    with pytest.raises(ValueError):
+        S.run_lite(compiled_steps=10)
+    with pytest.raises(ValueError):
+        Simulation(S.grid, S.list_species, merge_species=True).grid_species_initialization()
+
+
+@pytest.mark.parametrize("dt", [None, 0.25])
+def test_psatd_matches_buneman(dt):
+    """Tests that a cold plasma oscillation with the spectral field solver,
+    even at a larger timestep, follows that with the Buneman one."""
+    t, field = field_at_origin(cold_plasma())
+    t_psatd, field_psatd = field_at_origin(cold_plasma(field_solver="psatd", dt=dt))
+    assert np.allclose(np.interp(t, t_psatd, field_psatd), field, atol=0.1 * np.abs(field).max())
+
+
+def test_psatd_compiled_iterations_unsupported():
+    S = cold_plasma(field_solver="psatd")
+    S.grid_species_initialization()
+    with pytest.raises(ValueError):
+        S.run_lite(compiled_steps=10)
+
+
+def test_threads_capped_by_numba(restore_threads):
+    """Asking for more threads than numba can launch uses all it can."""
+    grid = PeriodicTestGrid(T=1, L=1, NG=8)
+    sim = Simulation(grid, [Species(1, 1, 10, grid)], threads=numba.config.NUMBA_NUM_THREADS + 1)
+    assert sim.threads == numba.get_num_threads() == numba.config.NUMBA_NUM_THREADS
+    assert sim.list_species[0].parallel
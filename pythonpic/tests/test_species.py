@@ -2,7 +2,7 @@
 import pytest
 import numpy as np
 from ..classes.species import n_saved_particles
-from pythonpic.classes import Species, PeriodicTestGrid
+from pythonpic.classes import Species, Simulation, PeriodicTestGrid, NonperiodicTestGrid
 from pythonpic.helper_functions.physics import electric_charge, electron_rest_mass, lightspeed, epsilon_zero
 
 @pytest.fixture(params=np.logspace(0, 6, 12, dtype=int))
@@ -28,4 +28,123 @@ def test_species(scaling):
     species = Species(electric_charge, electron_rest_mass, 1, g, scaling=scaling)
     species.v[:, 0] = 10
     kinetic_energy_single_electron = 4.554692e-29
-    assert np.isclose(species.kinetic_energy, kinetic_energy_single_electron*scaling)
\ No newline at end of file
+    assert np.isclose(species.kinetic_energy, kinetic_energy_single_electron*scaling)
+@pytest.mark.parametrize("periodic", [True, False])
+def test_single_precision(periodic):
+    """Tests that a single precision species follows a double precision one."""
+    grid_type = PeriodicTestGrid if periodic else NonperiodicTestGrid
+    results = []
+    for dtype in [np.float64, np.float32]:
+        g = grid_type(10, 2 * np.pi, 32)
+        species = Species(-1, 1, 1024, g, scaling=2 * np.pi / 1024, dtype=dtype)
+        species.distribute_uniformly(g.L, start_moat=g.L / 4, end_moat=g.L / 4)
+        species.sinusoidal_velocity_perturbation(0, 0.05, 1)
+        Simulation(g, [species]).run_lite()
+        assert species.v.dtype == dtype
+        results.append((species.x, species.v, g.electric_field))
+    (x64, v64, E64), (x32, v32, E32) = results
+    assert np.allclose(x32, x64, atol=1e-5 * g.dx)
+    assert np.allclose(v32, v64, atol=1e-5)
+    assert np.allclose(E32, E64, atol=1e-4 * np.abs(E64).max())
+
+
+@pytest.mark.parametrize("momentum", [False, True])
+@pytest.mark.parametrize("N", [1, 100, 10001])
+def test_velocity_moments(momentum, N):
+    """Tests the velocity moments summed up in the push, and without one,
+    against numpy, on velocities with a large mean relative to their spread."""
+    g = PeriodicTestGrid(1, 1, 32)
+    np.random.seed(0)
+    g.electric_field[...] = np.random.normal(scale=1e-6, size=g.electric_field.shape)
+    species = Species(1, 1, N, g, momentum=momentum)
+    species.distribute_uniformly(g.L)
+    species.v = np.random.normal(loc=[0.5, -0.3, 0.1], scale=1e-7, size=(N, 3))
+
+    for pushed in [False, True]:
+        if pushed:
+            species.velocity_push()
+        assert species.chunk_sums_current == pushed
+        mean, mean_square, std = species.velocity_moments
+        v = species.v
+        assert np.allclose(mean, v.mean(axis=0), rtol=1e-14, atol=0)
+        assert np.allclose(mean_square, (v ** 2).mean(axis=0), rtol=1e-14, atol=0)
+        assert np.allclose(std, v.std(axis=0), rtol=1e-6, atol=1e-22)
+
+
+@pytest.mark.parametrize("momentum", [False, True])
+@pytest.mark.parametrize("particles_leave", [False, True])
+def test_velocity_moments_after_boundary(momentum, particles_leave):
+    """The moments summed in the push are kept through a nonperiodic boundary
+    pass that removes no particles, and summed anew over the survivors if it does."""
+    g = NonperiodicTestGrid(1, 1, 32)
+    species = Species(1, 1, 1000, g, momentum=momentum)
+    np.random.seed(0)
+    species.x = np.random.uniform(0.25, 0.75, species.N)
+    if particles_leave:
+        species.x[:10] = g.L + 0.1
+    species.v = np.random.uniform(-0.5, 0.5, size=(species.N, 3))
+    species.velocity_push()
+    g.apply_particle_bc(species)
+    assert species.chunk_sums_current != particles_leave
+    assert species.N_alive == species.N - 10 * particles_leave
+    mean, mean_square, std = species.velocity_moments
+    v = species.v
+    assert np.allclose(mean, v.mean(axis=0), rtol=1e-12, atol=0)
+    assert np.allclose(mean_square, (v ** 2).mean(axis=0), rtol=1e-12, atol=0)
+
+
+@pytest.mark.parametrize("periodic", [True, False])
+def test_cell_indices_follow_positions(periodic):
+    """The cached cell indices are kept up to date through pushes, boundary conditions and assignments."""
+    g = (PeriodicTestGrid if periodic else NonperiodicTestGrid)(1, 2 * np.pi, 32)
+    species = Species(1, 1, 1000, g)
+    np.random.seed(0)
+    species.x = np.random.uniform(0, g.L, species.N)
+    species.v = np.random.normal(scale=0.5, size=(species.N, 3))
+    for step in range(4):
+        cell, cell_fraction = species.cell_indices()
+        assert np.array_equal(cell, (species.x / g.dx).astype(int))
+        assert np.array_equal(cell_fraction, species.x / g.dx - cell)
+        species.position_push()
+        g.apply_particle_bc(species)
+    assert periodic == (species.N_alive == species.N)
+    species.x = species.x[::2]
+    assert np.array_equal(species.cell_indices()[0], (species.x / g.dx).astype(int))
+
+
+@pytest.mark.parametrize(["dtype", "momentum"], [(np.float64, False), (np.float64, True), (np.float32, False)])
+def test_sort_by_cell(dtype, momentum):
+    g = PeriodicTestGrid(1, 2 * np.pi, 32)
+    species = Species(1, 1, 1000, g, dtype=dtype, momentum=momentum, sort_interval=1)
+    np.random.seed(0)
+    species.x = np.random.uniform(0, g.L, species.N)
+    species.v = np.random.uniform(-0.5, 0.5, size=(species.N, 3))
+    before = np.column_stack((species.x, species.v))
+    species.sort_by_cell()
+    cell, cell_fraction = species.cell_indices()
+    assert (np.diff(cell) >= 0).all()
+    assert np.array_equal(cell, np.floor(species.x / g.dx + 1e-6).astype(int))
+    after = np.column_stack((species.x, species.v))
+    assert np.allclose(before[np.lexsort(before.T)], after[np.lexsort(after.T)])
+
+
+@pytest.mark.parametrize("grid_type", [PeriodicTestGrid, NonperiodicTestGrid])
+def test_sorted_simulation(grid_type):
+    """Sorting only changes the order in which particles are summed up."""
+    results = []
+    for sort_interval in [0, 3]:
+        g = grid_type(10, 2 * np.pi, 32)
+        species = Species(-1, 1, 2048, g, scaling=2 * np.pi / 2048, sort_interval=sort_interval)
+        np.random.seed(0)
+        species.distribute_uniformly(g.L, start_moat=g.L / 8, end_moat=g.L / 8)
+        species.random_velocity_perturbation(0, 0.05)
+        Simulation(g, [species]).run_lite()
+        results.append((np.sort(species.x), g.electric_field.copy()))
+    (x_unsorted, E_unsorted), (x_sorted, E_sorted) = results
+    assert np.allclose(x_unsorted, x_sorted)
+    assert np.allclose(E_unsorted, E_sorted, atol=1e-8 * np.abs(E_unsorted).max())
+
+
+def test_sort_individual_diagnostics():
+    with pytest.raises(ValueError):
+        Species(1, 1, 100, PeriodicTestGrid(1, 1, 32), individual_diagnostics=True, sort_interval=1)